@@ -0,0 +1,132 @@
+#!/usr/bin/env python3
+"""
+Import-time and cold-start benchmark for the Lambda handlers.
+
+Every sample runs in a fresh Python process, like a new Lambda container. It measures the import
+time of lambda_handler, the first (cold) getCars invocation and the following (warm) invocations
+against moto. It also compares what every invocation used to pay to set up DynamoDB (a new
+boto3 resource and Table) with the shared resource of aws_clients. Run from the repository root:
+python benchmarks/cold_start.py --samples 10
+"""
+
+# Standard library imports
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+# Related third party imports
+# -
+
+# Local application/library specific imports
+# -
+
+PLAYGROUND_API_PATH = os.path.join(os.path.dirname(os.path.realpath(__file__)), '..', 'playground_api')
+
+GET_CARS_EVENT = {
+    'arguments': {'limit': 10},
+    'selectionSetList': ['items', 'items/id', 'items/make', 'nextToken'],
+}
+
+
+def measure_container(warm_invocations: int) -> dict:
+    """Measure a single container. This runs in the child process."""
+    started_at = time.perf_counter()
+    import lambda_handler  # pylint: disable=import-outside-toplevel
+    import_time = time.perf_counter() - started_at
+
+    # moto is imported after the handler, so its import time isn't part of the measurement
+    import boto3  # pylint: disable=import-outside-toplevel
+    try:
+        from moto import mock_aws  # pylint: disable=import-outside-toplevel
+    except ImportError:
+        # moto < 5
+        from moto import mock_dynamodb2 as mock_aws  # pylint: disable=import-outside-toplevel
+
+    with mock_aws():
+        boto3.client('dynamodb').create_table(
+            TableName=os.environ['INVENTORY_TABLE'],
+            KeySchema=[
+                {'AttributeName': 'PK', 'KeyType': 'HASH'},
+                {'AttributeName': 'SK', 'KeyType': 'RANGE'},
+            ],
+            AttributeDefinitions=[
+                {'AttributeName': 'PK', 'AttributeType': 'S'},
+                {'AttributeName': 'SK', 'AttributeType': 'S'},
+            ],
+            BillingMode='PAY_PER_REQUEST',
+        )
+
+        started_at = time.perf_counter()
+        lambda_handler.handle_get_cars(GET_CARS_EVENT, None)
+        cold_invocation = time.perf_counter() - started_at
+
+        warm_invocation_times = []
+        for _ in range(warm_invocations):
+            started_at = time.perf_counter()
+            lambda_handler.handle_get_cars(GET_CARS_EVENT, None)
+            warm_invocation_times.append(time.perf_counter() - started_at)
+
+        # What every invocation used to do before it could call DynamoDB
+        started_at = time.perf_counter()
+        boto3.resource('dynamodb').Table(os.environ['INVENTORY_TABLE'])
+        per_invocation_resource = time.perf_counter() - started_at
+
+        from controllers.inventory_controller import InventoryController  # pylint: disable=import-outside-toplevel
+        started_at = time.perf_counter()
+        InventoryController()
+        shared_resource = time.perf_counter() - started_at
+
+    return {
+        'import_ms': import_time * 1000,
+        'cold_invocation_ms': cold_invocation * 1000,
+        'warm_invocation_ms': statistics.median(warm_invocation_times) * 1000,
+        'per_invocation_resource_ms': per_invocation_resource * 1000,
+        'shared_resource_ms': shared_resource * 1000,
+    }
+
+
+def main():
+    """Measure fresh containers and print the median of every measurement."""
+    parser = argparse.ArgumentParser(description=__doc__.split('\n', maxsplit=2)[1])
+    parser.add_argument('--samples', type=int, default=10, help='the number of fresh processes')
+    parser.add_argument('--warm-invocations', type=int, default=20)
+    parser.add_argument('--child', action='store_true', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        print(json.dumps(measure_container(args.warm_invocations)))
+        return
+
+    child_environment = {
+        **os.environ,
+        'PYTHONPATH': PLAYGROUND_API_PATH,
+        'AWS_DEFAULT_REGION': os.environ.get('AWS_DEFAULT_REGION', 'eu-west-1'),
+        'AWS_ACCESS_KEY_ID': 'testing',
+        'AWS_SECRET_ACCESS_KEY': 'testing',
+        'INVENTORY_TABLE': 'cold-start-benchmark',
+        'INVENTORY_METRICS': 'false',
+        # Every invocation should reach DynamoDB
+        'INVENTORY_RESULT_CACHE_SIZE': '0',
+    }
+    samples = [
+        json.loads(subprocess.run(
+            [sys.executable, __file__, '--child', '--warm-invocations', str(args.warm_invocations)],
+            env=child_environment, check=True, capture_output=True, text=True,
+        ).stdout.strip().splitlines()[-1])
+        for _ in range(args.samples)
+    ]
+
+    for measurement in samples[0]:
+        values = [sample[measurement] for sample in samples]
+        print(f'{measurement:<28} median {statistics.median(values):>9.2f} ms   max {max(values):>9.2f} ms')
+    per_invocation = statistics.median(sample['per_invocation_resource_ms'] for sample in samples)
+    shared = statistics.median(sample['shared_resource_ms'] for sample in samples)
+    print(f'Saved per warm invocation by sharing the resource: {per_invocation - shared:.2f} ms')
+
+
+if __name__ == '__main__':
+    main()
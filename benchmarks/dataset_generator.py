@@ -0,0 +1,170 @@
+#!/usr/bin/env python3
+"""
+Deterministic generator of synthetic cars and books.
+
+The values of make, color and author follow a Zipf distribution, like in a real inventory: a few
+makes and authors are very common and most are rare. The same seed always generates the same
+records. The records match the AddCarInput and AddBookInput types, so they can be loaded with the
+InventoryImporter. Run from the repository root:
+python benchmarks/dataset_generator.py cars.jsonl.gz --item-type car --count 100000 --seed 42
+"""
+
+# Standard library imports
+import argparse
+import gzip
+import itertools
+import json
+import random
+
+# Related third party imports
+# -
+
+# Local application/library specific imports
+# -
+
+# The makes with their country and continent of origin, from common to rare
+CAR_MAKES = [
+    ('Volkswagen', 'Germany', 'EUROPE'),
+    ('Toyota', 'Japan', 'ASIA'),
+    ('Ford', 'United States', 'NORTHAMERICA'),
+    ('Renault', 'France', 'EUROPE'),
+    ('Peugeot', 'France', 'EUROPE'),
+    ('BMW', 'Germany', 'EUROPE'),
+    ('Kia', 'South Korea', 'ASIA'),
+    ('Hyundai', 'South Korea', 'ASIA'),
+    ('Opel', 'Germany', 'EUROPE'),
+    ('Mercedes-Benz', 'Germany', 'EUROPE'),
+    ('Tesla', 'United States', 'NORTHAMERICA'),
+    ('Volvo', 'Sweden', 'EUROPE'),
+    ('Skoda', 'Czech Republic', 'EUROPE'),
+    ('Audi', 'Germany', 'EUROPE'),
+    ('Nissan', 'Japan', 'ASIA'),
+    ('Fiat', 'Italy', 'EUROPE'),
+    ('Mazda', 'Japan', 'ASIA'),
+    ('Honda', 'Japan', 'ASIA'),
+    ('Chevrolet', 'United States', 'NORTHAMERICA'),
+    ('Holden', 'Australia', 'AUSTRALIA'),
+    ('Citroen', 'France', 'EUROPE'),
+    ('Seat', 'Spain', 'EUROPE'),
+    ('Mitsubishi', 'Japan', 'ASIA'),
+    ('Chery', 'China', 'ASIA'),
+    ('Troller', 'Brazil', 'SOUTHAMERICA'),
+    ('Laraki', 'Morocco', 'AFRICA'),
+]
+CAR_COLORS = [
+    'white', 'black', 'grey', 'silver', 'blue', 'red', 'brown', 'green', 'beige', 'orange', 'yellow', 'purple', 'gold',
+]
+MODEL_NAMES = ['Model', 'Sport', 'City', 'Cross', 'Tour', 'Line', 'Star', 'Wave', 'Edge', 'Flex']
+FIRST_NAMES = [
+    'Ann', 'Frank', 'Ursula', 'Iain', 'Liu', 'Octavia', 'Isaac', 'Arthur', 'Ted', 'Becky', 'Martha', 'Kim', 'Ray',
+    'Connie', 'Neal', 'Jo', 'Nnedi', 'Philip', 'Lois', 'China',
+]
+LAST_NAMES = [
+    'Leckie', 'Herbert', 'Le Guin', 'Banks', 'Cixin', 'Butler', 'Asimov', 'Clarke', 'Chiang', 'Chambers', 'Wells',
+    'Stanley Robinson', 'Bradbury', 'Willis', 'Stephenson', 'Walton', 'Okorafor', 'Dick', 'Bujold', 'Mieville',
+]
+TITLE_WORDS = [
+    'Dune', 'Left', 'Hand', 'Darkness', 'Ancillary', 'Justice', 'Player', 'Games', 'Three', 'Body', 'Problem',
+    'Foundation', 'Childhood', 'End', 'Stories', 'Your', 'Life', 'Long', 'Way', 'Small', 'Angry', 'Planet',
+    'Red', 'Mars', 'Fahrenheit', 'Doomsday', 'Book', 'Snow', 'Crash', 'Among', 'Others', 'Binti', 'Ubik',
+]
+
+
+class DatasetGenerator:
+    """
+    The DatasetGenerator yields synthetic AddCarInput and AddBookInput records.
+
+    `skews` holds the Zipf exponent of make, color and author. An exponent of 0 is a uniform
+    distribution, higher exponents concentrate the values on the most common ones.
+    """
+
+    DEFAULT_SKEWS = {
+        'make': 1.1,
+        'color': 1.3,
+        'author': 1.0,
+    }
+
+    def __init__(self, seed: int = 42, skews: dict = None) -> None:
+        """Initialize the DatasetGenerator Class."""
+        self.seed = seed
+        self.skews = {**self.DEFAULT_SKEWS, **(skews or {})}
+        self.authors = [f'{first_name} {last_name}' for first_name in FIRST_NAMES for last_name in LAST_NAMES]
+        # Shuffle the authors with a fixed seed, so the most common author isn't always the first combination
+        random.Random(0).shuffle(self.authors)
+
+    def cars(self):
+        """Yield an endless, reproducible stream of cars."""
+        rng = random.Random(f'{self.seed}-car')
+        make_weights = self._zipf_cum_weights(len(CAR_MAKES), self.skews['make'])
+        color_weights = self._zipf_cum_weights(len(CAR_COLORS), self.skews['color'])
+        while True:
+            make, country, continent = rng.choices(CAR_MAKES, cum_weights=make_weights)[0]
+            car = {
+                'make': make,
+                'model': f'{rng.choice(MODEL_NAMES)} {rng.randint(1, 9)}{rng.choice("0XSE")}',
+                'color': rng.choices(CAR_COLORS, cum_weights=color_weights)[0],
+                'continentOfOrigin': continent,
+                'countryOfOrigin': country,
+                'licensePlate': f'{rng.randint(1, 99):02d}-{"".join(rng.choices("BDFGHJKLNPRSTXZ", k=3))}-'
+                                f'{rng.randint(1, 9)}',
+            }
+            # Not every car has every optional field
+            if rng.random() < 0.1:
+                del car['color']
+            yield car
+
+    def books(self):
+        """Yield an endless, reproducible stream of books."""
+        rng = random.Random(f'{self.seed}-book')
+        author_weights = self._zipf_cum_weights(len(self.authors), self.skews['author'])
+        while True:
+            yield {
+                'title': ' '.join(rng.sample(TITLE_WORDS, k=rng.randint(1, 4))),
+                'author': rng.choices(self.authors, cum_weights=author_weights)[0],
+                'yearReleased': rng.randint(1900, 2021),
+            }
+
+    def records(self, item_type: str, count: int):
+        """Yield `count` records of the given item type."""
+        return itertools.islice(self.cars() if item_type == 'car' else self.books(), count)
+
+    def json_lines(self, item_type: str, count: int):
+        """Yield `count` records of the given item type as lines of JSON."""
+        for record in self.records(item_type, count):
+            yield json.dumps(record, separators=(',', ':')) + '\n'
+
+    def most_common(self, attribute: str) -> list:
+        """Return the values of make, color or author, from the most to the least common."""
+        if attribute == 'make':
+            return [make for make, _country, _continent in CAR_MAKES]
+        if attribute == 'color':
+            return list(CAR_COLORS)
+        return list(self.authors)
+
+    @staticmethod
+    def _zipf_cum_weights(size: int, exponent: float) -> list:
+        """Return the cumulative Zipf weights of `size` ranks, for random.choices()."""
+        return list(itertools.accumulate(1 / rank ** exponent for rank in range(1, size + 1)))
+
+
+def main():
+    """Write a gzip-compressed JSONL file of synthetic cars or books."""
+    parser = argparse.ArgumentParser(description=__doc__.split('\n', maxsplit=2)[1])
+    parser.add_argument('output_path')
+    parser.add_argument('--item-type', required=True, choices=['car', 'book'])
+    parser.add_argument('--count', type=int, default=10000)
+    parser.add_argument('--seed', type=int, default=42)
+    for attribute, skew in DatasetGenerator.DEFAULT_SKEWS.items():
+        parser.add_argument(f'--{attribute}-skew', type=float, default=skew, help=f'the Zipf exponent of {attribute}')
+    args = parser.parse_args()
+
+    generator = DatasetGenerator(
+        seed=args.seed,
+        skews={attribute: getattr(args, f'{attribute}_skew') for attribute in DatasetGenerator.DEFAULT_SKEWS},
+    )
+    with gzip.open(args.output_path, 'wt', encoding='utf-8') as output_file:
+        output_file.writelines(generator.json_lines(args.item_type, args.count))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,88 @@
+#!/usr/bin/env python3
+"""
+Microbenchmark for the filter and projection expression builders.
+
+Compares the boto3 Attr-tree path (expression_compiler.build_filter_condition plus the
+serialization boto3 does before sending a Query) with the expression compiler, both uncached and
+memoized. Run from the repository root:
+python benchmarks/filter_expressions.py --iterations 20000
+"""
+
+# Standard library imports
+import argparse
+import os
+import sys
+import timeit
+
+# Related third party imports
+from boto3.dynamodb.conditions import ConditionExpressionBuilder
+
+# Local application/library specific imports
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.realpath(__file__)), '..', 'playground_api'))
+from controllers import expression_compiler  # noqa: E402 pylint: disable=wrong-import-position
+
+# A few filter shapes our dashboards send, from simple to complex
+FILTERS = {
+    'equals': {
+        'make': {'equalsOr': ['Tesla']},
+    },
+    'contains': {
+        'make': {'containsOr': ['esla', 'olksw']},
+        'model': {'notContains': ['Mach']},
+    },
+    'complex': {
+        'make': {'containsOr': ['esla', 'olksw'], 'notEquals': ['Ford']},
+        'model': {'containsAnd': ['Mod', 'el'], 'notContains': ['Mach-E']},
+        'color': {'equalsOr': ['white', 'black', 'red']},
+        'continentOfOrigin': {'equalsOr': ['EUROPE', 'NORTHAMERICA']},
+    },
+}
+
+SELECTION_SET = ['id', 'make', 'model', 'color', 'continentOfOrigin', 'countryOfOrigin', 'SK']
+
+
+def main():
+    """Run the benchmark and print the time per call for every filter shape."""
+    parser = argparse.ArgumentParser(description=__doc__.split('\n', maxsplit=1)[0])
+    parser.add_argument('--iterations', type=int, default=20000)
+    args = parser.parse_args()
+
+    builder = ConditionExpressionBuilder()
+
+    def attr_tree_path(filter_dict):
+        # Build the Attr tree, then let boto3 serialize it the way it does for every Query
+        return builder.build_expression(expression_compiler.build_filter_condition(filter_dict))
+
+    def uncached_compiler_path(filter_dict):
+        canonical_key = expression_compiler.canonical_filter_key(filter_dict)
+        return expression_compiler._compile_canonical_filter.__wrapped__(  # pylint: disable=protected-access
+            canonical_key
+        )
+
+    print(f'{"filter":<10} {"attr tree":>12} {"compiled":>12} {"memoized":>12} {"speedup":>8}')
+    for name, filter_dict in FILTERS.items():
+        timings = [
+            timeit.timeit(lambda path=path: path(filter_dict), number=args.iterations) / args.iterations
+            for path in (attr_tree_path, uncached_compiler_path, expression_compiler.compile_filter_expression)
+        ]
+        print(
+            f'{name:<10} ' + ' '.join(f'{timing * 1e6:>10.2f}us' for timing in timings) +
+            f' {timings[0] / timings[2]:>7.1f}x'
+        )
+
+    uncached_projection = expression_compiler._compile_projection.__wrapped__  # pylint: disable=protected-access
+    projection_timings = [
+        timeit.timeit(lambda path=path: path(SELECTION_SET), number=args.iterations) / args.iterations
+        for path in (
+            lambda selection_set: uncached_projection(tuple(selection_set)),
+            expression_compiler.compile_projection_expression,
+        )
+    ]
+    print(
+        f'{"projection":<10} {"":>12} ' + ' '.join(f'{timing * 1e6:>10.2f}us' for timing in projection_timings)
+    )
+    print(f'cache: {expression_compiler.cache_info()}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,101 @@
+#!/usr/bin/env python3
+"""
+Deserialization benchmark for the read engines of the InventoryController.
+
+It decodes large synthetic query pages in the DynamoDB JSON format like the two read engines do:
+the Table resource with the boto3 TypeDeserializer, followed by the conversion of its Decimals
+into JSON for AppSync, and the ClientTable with its projection-aware deserializer. Run from the
+repository root: python benchmarks/read_engines.py --page-size 1000 --pages 20
+"""
+
+# Standard library imports
+import argparse
+import json
+import os
+import random
+import statistics
+import sys
+import time
+
+# Related third party imports
+from boto3.dynamodb.types import TypeDeserializer
+
+# Local application/library specific imports
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.realpath(__file__)), '..', 'playground_api'))
+from controllers.client_engine import deserialize_item  # noqa: E402 pylint: disable=wrong-import-position
+
+# The attributes the resolvers ask for most, e.g. items/id, items/title and items/yearReleased
+DEFAULT_PROJECTION = ['PK', 'SK', 'id', 'title', 'author', 'yearReleased']
+
+
+def raw_page(rng: random.Random, page_size: int) -> list:
+    """Return a page of book items in the DynamoDB JSON format, as the low-level client returns them."""
+    return [
+        {
+            'PK': {'S': f'ITEM#{rng.randint(0, 3)}'},
+            'SK': {'S': f'BOOK#{rng.getrandbits(64):016x}'},
+            'id': {'S': f'{rng.getrandbits(64):016x}'},
+            'type': {'S': 'book'},
+            'title': {'S': f'Book {rng.randint(1, 10000)}'},
+            'author': {'S': rng.choice(['Tolkien', 'Pratchett', 'Le Guin', 'Herbert'])},
+            'yearReleased': {'N': str(rng.randint(1950, 2021))},
+            'dateAdded': {'S': '2021-05-01T12:00:00.000000'},
+            'itemCount': {'N': str(rng.randint(0, 100))},
+        }
+        for _ in range(page_size)
+    ]
+
+
+def resource_engine(page: list, projection: set) -> str:
+    """Decode a page like the Table resource, and serialize it to JSON like the handlers."""
+    deserializer = TypeDeserializer()
+    items = [
+        {attribute: deserializer.deserialize(typed_value) for attribute, typed_value in raw_item.items()}
+        for raw_item in page
+    ]
+    # Without a ProjectionExpression the resource decodes every attribute, and the handler prunes them
+    items = [{attribute: item[attribute] for attribute in projection if attribute in item} for item in items]
+    return json.dumps(items, default=_decimal_default)
+
+
+def client_engine(page: list, projection: set) -> str:
+    """Decode a page like the ClientTable, and serialize it to JSON like the handlers."""
+    return json.dumps([deserialize_item(raw_item, projection) for raw_item in page])
+
+
+def _decimal_default(value):
+    """Convert the Decimals of the TypeDeserializer into JSON numbers."""
+    return int(value) if value == value.to_integral_value() else float(value)
+
+
+def main():
+    """Time both engines on the same pages and print the median time per page."""
+    parser = argparse.ArgumentParser(description=__doc__.split('\n', maxsplit=2)[1])
+    parser.add_argument('--page-size', type=int, default=1000, help='the number of items per page')
+    parser.add_argument('--pages', type=int, default=20, help='the number of pages to decode')
+    parser.add_argument('--projection', default=','.join(DEFAULT_PROJECTION), help='the attributes to decode')
+    parser.add_argument('--seed', type=int, default=42)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    projection = set(args.projection.split(','))
+    pages = [raw_page(rng, args.page_size) for _ in range(args.pages)]
+
+    # Both engines have to produce the same JSON
+    if json.loads(resource_engine(pages[0], projection)) != json.loads(client_engine(pages[0], projection)):
+        raise SystemExit('The read engines decoded the page differently')
+
+    results = {}
+    for engine_name, engine in (('resource', resource_engine), ('client', client_engine)):
+        page_times = []
+        for page in pages:
+            started_at = time.perf_counter()
+            engine(page, projection)
+            page_times.append((time.perf_counter() - started_at) * 1000)
+        results[engine_name] = statistics.median(page_times)
+        print(f'{engine_name:<10} median {results[engine_name]:>8.2f} ms per page of {args.page_size} items')
+    print(f'Speedup of the client engine: {results["resource"] / results["client"]:.1f}x')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,369 @@
+#!/usr/bin/env python3
+"""
+Replay benchmark for the Lambda resolvers.
+
+Replays recorded AppSync resolver events through the handlers in lambda_handler.py against moto
+(the default) or DynamoDB Local (--endpoint-url), and reports the latency percentiles, the items
+read vs. returned and the consumed capacity per query shape. Run from the repository root:
+python benchmarks/replay.py run benchmarks/replay_events.jsonl --output current.json
+python benchmarks/replay.py compare baseline.json current.json --threshold 10
+
+Every line of the events file is a resolver event with a fieldName, e.g.:
+{"fieldName": "getCars", "arguments": {"limit": 10}, "selectionSetList": ["items", "items/id"]}
+"""
+
+# Standard library imports
+import argparse
+import json
+import os
+import random
+import statistics
+import sys
+import threading
+import time
+
+# Related third party imports
+import boto3
+
+# Local application/library specific imports
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.realpath(__file__)), '..', 'playground_api'))
+os.environ.setdefault('AWS_DEFAULT_REGION', 'eu-west-1')
+os.environ.setdefault('INVENTORY_TABLE', 'benchmark')
+os.environ.setdefault('INVENTORY_SHARD_COUNT', '4')
+os.environ.setdefault('INVENTORY_INDEXED_ATTRIBUTES', 'make,model,color,author')
+os.environ.setdefault('INVENTORY_NGRAM_INDEX', 'true')
+os.environ.setdefault('INVENTORY_NGRAM_INDEX_READS', 'true')
+# Every replayed event should reach DynamoDB, unless the result cache is what's being measured
+os.environ.setdefault('INVENTORY_RESULT_CACHE_SIZE', '0')
+# The replay reports its own metrics, so the handlers shouldn't log theirs
+os.environ.setdefault('INVENTORY_METRICS', 'false')
+from controllers.aws_clients import (  # noqa: E402 pylint: disable=wrong-import-position
+    dynamodb_client,
+    dynamodb_resource,
+)
+from controllers.instrumentation import filter_shape  # noqa: E402 pylint: disable=wrong-import-position
+
+# The handler for every field of the schema
+HANDLERS = {
+    'getCars': 'handle_get_cars',
+    'getBooks': 'handle_get_books',
+    'addCar': 'handle_add_car',
+    'addBook': 'handle_add_book',
+}
+
+# The metrics compared between runs. For all of them, a higher value is worse.
+COMPARED_METRICS = ['p50_ms', 'p95_ms', 'p99_ms', 'items_read', 'read_capacity', 'write_capacity']
+
+CAR_MAKES = ['Tesla', 'Volkswagen', 'Ford', 'Toyota', 'BMW', 'Renault', 'Kia', 'Volvo']
+CAR_COLORS = ['white', 'black', 'red', 'blue', 'silver', 'green']
+CONTINENTS = ['EUROPE', 'ASIA', 'NORTHAMERICA']
+BOOK_AUTHORS = ['Frank Herbert', 'Ursula K. Le Guin', 'Iain M. Banks', 'Ann Leckie', 'Liu Cixin']
+
+
+class DynamoDBCallRecorder:
+    """
+    The DynamoDBCallRecorder records the consumed capacity and item counts of all DynamoDB calls.
+
+    It hooks into the events of the DynamoDB clients shared by the handlers. ReturnConsumedCapacity
+    is requested for every operation that supports it.
+    """
+
+    def __init__(self) -> None:
+        """Initialize the DynamoDBCallRecorder Class."""
+        self._lock = threading.Lock()
+        self.reset()
+        # The resource handles the writes, the low-level client the reads with INVENTORY_READ_ENGINE=client
+        for client in (dynamodb_resource().meta.client, dynamodb_client()):
+            client.meta.events.register('before-parameter-build.dynamodb', self._request_consumed_capacity)
+            client.meta.events.register('after-call.dynamodb', self._record_call)
+
+    def reset(self) -> None:
+        """Start recording a new event."""
+        with self._lock:
+            self.calls = 0
+            self.items_read = 0
+            self.read_capacity = 0.0
+            self.write_capacity = 0.0
+
+    @staticmethod
+    def _request_consumed_capacity(params, model, **_kwargs):
+        if 'ReturnConsumedCapacity' in model.input_shape.members:
+            params.setdefault('ReturnConsumedCapacity', 'TOTAL')
+
+    def _record_call(self, parsed, model, **_kwargs):
+        consumed_capacity = parsed.get('ConsumedCapacity') or []
+        # Single-table operations return one ConsumedCapacity, batch operations a list
+        if isinstance(consumed_capacity, dict):
+            consumed_capacity = [consumed_capacity]
+        capacity_units = sum(capacity.get('CapacityUnits', 0.0) for capacity in consumed_capacity)
+
+        with self._lock:
+            self.calls += 1
+            if model.name in ('Query', 'Scan'):
+                self.items_read += parsed.get('ScannedCount', 0)
+            elif model.name == 'BatchGetItem':
+                self.items_read += sum(len(items) for items in parsed.get('Responses', {}).values())
+            elif model.name == 'GetItem':
+                self.items_read += 1 if parsed.get('Item') else 0
+
+            if model.name in ('PutItem', 'UpdateItem', 'DeleteItem', 'BatchWriteItem', 'TransactWriteItems'):
+                self.write_capacity += capacity_units
+            else:
+                self.read_capacity += capacity_units
+
+
+def query_shape(event: dict) -> str:
+    """
+    Return the shape of an event: its field name and the filter operations per attribute.
+
+    Events with the same shape hit DynamoDB the same way, regardless of the filter values.
+    """
+    return f'{event["fieldName"]}({filter_shape(event.get("arguments", {}).get("filter"))})'
+
+
+def returned_items(response) -> int:
+    """Return the number of items in a handler response."""
+    if isinstance(response, list):
+        return sum(returned_items(batch_response) for batch_response in response)
+    if 'items' in response:
+        return len(response['items'])
+    return 1 if response.get('success') else 0
+
+
+def percentile(values: list, fraction: float) -> float:
+    """Return a percentile of the values, with linear interpolation between the closest ranks."""
+    ordered_values = sorted(values)
+    rank = (len(ordered_values) - 1) * fraction
+    lower = int(rank)
+    upper = min(lower + 1, len(ordered_values) - 1)
+    return ordered_values[lower] + (ordered_values[upper] - ordered_values[lower]) * (rank - lower)
+
+
+def start_stand_in(endpoint_url: str = None):
+    """
+    Point the InventoryController to DynamoDB Local, or start moto if no endpoint is provided.
+
+    Returns the started moto mock, or None when DynamoDB Local is used.
+    """
+    if endpoint_url:
+        os.environ['INVENTORY_DYNAMODB_ENDPOINT'] = endpoint_url
+        return None
+
+    # moto is only needed when no DynamoDB Local endpoint is provided
+    os.environ.setdefault('AWS_ACCESS_KEY_ID', 'testing')
+    os.environ.setdefault('AWS_SECRET_ACCESS_KEY', 'testing')
+    try:
+        from moto import mock_aws  # pylint: disable=import-outside-toplevel
+    except ImportError:
+        # moto < 5
+        from moto import mock_dynamodb2 as mock_aws  # pylint: disable=import-outside-toplevel
+    mock = mock_aws()
+    mock.start()
+    return mock
+
+
+def create_table(endpoint_url: str = None) -> None:
+    """Create the inventory table like the GraphQLPlaygroundStack does, if it doesn't exist yet."""
+    client = boto3.client('dynamodb', endpoint_url=endpoint_url)
+    table_name = os.environ['INVENTORY_TABLE']
+    if table_name in client.list_tables()['TableNames']:
+        return
+
+    indexed_attributes = [
+        attribute for attribute in os.environ['INVENTORY_INDEXED_ATTRIBUTES'].split(',') if attribute
+    ]
+    params = {
+        'TableName': table_name,
+        'KeySchema': [
+            {'AttributeName': 'PK', 'KeyType': 'HASH'},
+            {'AttributeName': 'SK', 'KeyType': 'RANGE'},
+        ],
+        'AttributeDefinitions': [
+            {'AttributeName': attribute, 'AttributeType': 'S'} for attribute in ['PK', 'SK'] + indexed_attributes
+        ],
+        'BillingMode': 'PAY_PER_REQUEST',
+    }
+    if indexed_attributes:
+        params['GlobalSecondaryIndexes'] = [
+            {
+                'IndexName': f'{attribute}-index',
+                'KeySchema': [
+                    {'AttributeName': attribute, 'KeyType': 'HASH'},
+                    {'AttributeName': 'SK', 'KeyType': 'RANGE'},
+                ],
+                'Projection': {'ProjectionType': 'ALL'},
+            }
+            for attribute in indexed_attributes
+        ]
+    client.create_table(**params)
+    client.get_waiter('table_exists').wait(TableName=table_name)
+
+
+def seed_inventory(cars: int, books: int, seed: int) -> None:
+    """Add a deterministic set of cars and books to the inventory."""
+    from controllers.inventory_controller import InventoryController  # pylint: disable=import-outside-toplevel
+
+    rng = random.Random(seed)
+    inventory_controller = InventoryController()
+    inventory_controller.add_items('car', [
+        {
+            'make': rng.choice(CAR_MAKES),
+            'model': f'Model {rng.randint(1, 50)}',
+            'color': rng.choice(CAR_COLORS),
+            'continentOfOrigin': rng.choice(CONTINENTS),
+        }
+        for _ in range(cars)
+    ])
+    inventory_controller.add_items('book', [
+        {
+            'title': f'Book {rng.randint(1, 10000)}',
+            'author': rng.choice(BOOK_AUTHORS),
+            'yearReleased': rng.randint(1950, 2021),
+        }
+        for _ in range(books)
+    ])
+
+
+def replay(events: list, iterations: int, warmup: int, recorder: DynamoDBCallRecorder = None) -> dict:
+    """
+    Replay the events and return the metrics per query shape.
+
+    Pass a `recorder` when replaying more than once, to avoid registering a new one every time.
+    """
+    import lambda_handler  # pylint: disable=import-outside-toplevel
+
+    recorder = recorder or DynamoDBCallRecorder()
+    samples = {}
+    for iteration in range(warmup + iterations):
+        for event in events:
+            handler = getattr(lambda_handler, HANDLERS[event['fieldName']])
+            recorder.reset()
+            started_at = time.perf_counter()
+            response = handler(event, None)
+            latency = time.perf_counter() - started_at
+            if iteration < warmup:
+                continue
+
+            shape_samples = samples.setdefault(query_shape(event), {
+                'latencies': [],
+                'items_read': 0,
+                'items_returned': 0,
+                'calls': 0,
+                'read_capacity': 0.0,
+                'write_capacity': 0.0,
+            })
+            shape_samples['latencies'].append(latency * 1000)
+            shape_samples['items_read'] += recorder.items_read
+            shape_samples['items_returned'] += returned_items(response)
+            shape_samples['calls'] += recorder.calls
+            shape_samples['read_capacity'] += recorder.read_capacity
+            shape_samples['write_capacity'] += recorder.write_capacity
+
+    # Report the DynamoDB metrics per replayed event
+    results = {}
+    for shape, shape_samples in samples.items():
+        replayed_events = len(shape_samples['latencies'])
+        results[shape] = {
+            'events': replayed_events,
+            'p50_ms': round(percentile(shape_samples['latencies'], 0.50), 3),
+            'p95_ms': round(percentile(shape_samples['latencies'], 0.95), 3),
+            'p99_ms': round(percentile(shape_samples['latencies'], 0.99), 3),
+            'mean_ms': round(statistics.mean(shape_samples['latencies']), 3),
+            'dynamodb_calls': round(shape_samples['calls'] / replayed_events, 2),
+            'items_read': round(shape_samples['items_read'] / replayed_events, 2),
+            'items_returned': round(shape_samples['items_returned'] / replayed_events, 2),
+            'read_capacity': round(shape_samples['read_capacity'] / replayed_events, 3),
+            'write_capacity': round(shape_samples['write_capacity'] / replayed_events, 3),
+        }
+    return results
+
+
+def print_results(results: dict) -> None:
+    """Print the metrics per query shape as a table."""
+    print(
+        f'{"shape":<48} {"p50 ms":>9} {"p95 ms":>9} {"p99 ms":>9} {"read":>8} {"returned":>9} {"RCU":>8} {"WCU":>8}'
+    )
+    for shape, metrics in sorted(results.items()):
+        print(
+            f'{shape:<48} {metrics["p50_ms"]:>9.2f} {metrics["p95_ms"]:>9.2f} {metrics["p99_ms"]:>9.2f} '
+            f'{metrics["items_read"]:>8.1f} {metrics["items_returned"]:>9.1f} '
+            f'{metrics["read_capacity"]:>8.2f} {metrics["write_capacity"]:>8.2f}'
+        )
+
+
+def compare_runs(baseline: dict, current: dict, threshold: float) -> list:
+    """
+    Print the change of every metric per query shape and return the regressions.
+
+    A regression is a metric that's more than `threshold` percent higher in the current run.
+    """
+    regressions = []
+    print(f'{"shape":<48} {"metric":<15} {"baseline":>10} {"current":>10} {"change":>8}')
+    for shape in sorted(set(baseline) & set(current)):
+        for metric in COMPARED_METRICS:
+            baseline_value = baseline[shape][metric]
+            current_value = current[shape][metric]
+            if baseline_value:
+                change = (current_value - baseline_value) / baseline_value * 100
+            else:
+                change = 0.0 if not current_value else float('inf')
+            marker = ''
+            if change > threshold:
+                regressions.append((shape, metric, change))
+                marker = ' !'
+            print(f'{shape:<48} {metric:<15} {baseline_value:>10.2f} {current_value:>10.2f} {change:>7.1f}%{marker}')
+
+    for shape in sorted(set(baseline) ^ set(current)):
+        print(f'{shape:<48} only in {"the baseline" if shape in baseline else "the current run"}')
+    return regressions
+
+
+def main():
+    """Run or compare replay benchmarks."""
+    parser = argparse.ArgumentParser(description=__doc__.split('\n', maxsplit=2)[1])
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    run_parser = subparsers.add_parser('run', help='replay events and report the metrics per query shape')
+    run_parser.add_argument('events_path', help='a JSONL file of resolver events')
+    run_parser.add_argument('--output', help='store the results as JSON, to compare them later')
+    run_parser.add_argument('--iterations', type=int, default=20, help='the number of times every event is replayed')
+    run_parser.add_argument('--warmup', type=int, default=2, help='the number of unmeasured replays first')
+    run_parser.add_argument('--endpoint-url', help='e.g. http://localhost:8000 for DynamoDB Local (default: moto)')
+    run_parser.add_argument('--cars', type=int, default=1000, help='the number of cars to seed the table with')
+    run_parser.add_argument('--books', type=int, default=1000, help='the number of books to seed the table with')
+    run_parser.add_argument('--seed', type=int, default=42)
+
+    compare_parser = subparsers.add_parser('compare', help='compare two runs and fail on regressions')
+    compare_parser.add_argument('baseline_path')
+    compare_parser.add_argument('current_path')
+    compare_parser.add_argument('--threshold', type=float, default=10.0, help='the allowed increase in percent')
+    args = parser.parse_args()
+
+    if args.command == 'compare':
+        with open(args.baseline_path, 'r') as baseline_file, open(args.current_path, 'r') as current_file:
+            regressions = compare_runs(json.load(baseline_file), json.load(current_file), args.threshold)
+        if regressions:
+            print(f'{len(regressions)} metrics regressed by more than {args.threshold}%')
+            sys.exit(1)
+        return
+
+    with open(args.events_path, 'r') as events_file:
+        events = [json.loads(line) for line in events_file if line.strip()]
+
+    mock = start_stand_in(args.endpoint_url)
+    try:
+        create_table(args.endpoint_url)
+        seed_inventory(args.cars, args.books, args.seed)
+        results = replay(events, args.iterations, args.warmup)
+    finally:
+        if mock:
+            mock.stop()
+
+    print_results(results)
+    if args.output:
+        with open(args.output, 'w') as output_file:
+            json.dump(results, output_file, indent=2, sort_keys=True)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,151 @@
+#!/usr/bin/env python3
+"""
+Scaling-curve benchmark for get_items.
+
+Loads growing synthetic datasets (see dataset_generator.py) into moto or DynamoDB Local with the
+InventoryImporter, and measures the latency and read amplification (items read per item returned)
+of every filter operator at every dataset size. Every size adds to the dataset of the previous
+size. moto is slow to load; use DynamoDB Local (--endpoint-url) for a million items per type.
+Run from the repository root:
+python benchmarks/scaling.py --sizes 10000 100000 1000000 --endpoint-url http://localhost:8000 --plot scaling.png
+"""
+
+# Standard library imports
+import argparse
+import itertools
+import json
+
+# Related third party imports
+# -
+
+# Local application/library specific imports
+# replay sets up the environment of the InventoryController, so it's imported first
+import replay
+from dataset_generator import DatasetGenerator
+from controllers.inventory_importer import InventoryImporter  # pylint: disable=wrong-import-order
+
+# The attribute the filter operators are applied to, per GraphQL field
+FILTERED_ATTRIBUTES = {
+    'getCars': 'make',
+    'getBooks': 'author',
+}
+
+
+def operator_events(generator: DatasetGenerator, limit: int) -> list:
+    """Return a getCars and getBooks event for every filter operator, and one without a filter."""
+    events = []
+    for field_name, attribute in FILTERED_ATTRIBUTES.items():
+        values = generator.most_common(attribute)
+        filters = [
+            {},
+            {attribute: {'equalsOr': [values[1]]}},
+            {attribute: {'notEquals': [values[0]]}},
+            {attribute: {'containsOr': [values[2][1:4]]}},
+            {attribute: {'containsAnd': [values[3][:3], values[3][-3:]]}},
+            {attribute: {'notContains': [values[0][1:4]]}},
+        ]
+        for filter_dict in filters:
+            events.append({
+                'fieldName': field_name,
+                'arguments': {'limit': limit, 'filter': filter_dict},
+                'selectionSetList': ['items', 'items/id', f'items/{attribute}', 'nextToken'],
+            })
+    return events
+
+
+def run(sizes: list, generator: DatasetGenerator, args) -> dict:
+    """Load every dataset size and return the replay metrics per query shape, per size."""
+    importer = InventoryImporter(max_workers=args.max_workers)
+    record_streams = {
+        'car': generator.cars(),
+        'book': generator.books(),
+    }
+    events = operator_events(generator, args.limit)
+    recorder = replay.DynamoDBCallRecorder()
+
+    results = {}
+    loaded = 0
+    for size in sorted(sizes):
+        for item_type, record_stream in record_streams.items():
+            json_lines = (json.dumps(record) for record in itertools.islice(record_stream, size - loaded))
+            import_stats = importer.import_records(json_lines, item_type)
+            print(f'Loaded {import_stats["written"]} {item_type}s at {import_stats["items_per_second"]} items/s')
+        loaded = size
+
+        size_results = replay.replay(events, args.iterations, args.warmup, recorder)
+        for metrics in size_results.values():
+            metrics['read_amplification'] = round(
+                metrics['items_read'] / metrics['items_returned'], 2
+            ) if metrics['items_returned'] else None
+        results[size] = size_results
+        print(f'\n{size} items per type')
+        replay.print_results(size_results)
+    return results
+
+
+def plot(results: dict, plot_path: str) -> None:
+    """Plot the p50 latency and the read amplification of every query shape against the dataset size."""
+    try:
+        # matplotlib is only needed for plotting, it's not a dependency of the project
+        from matplotlib import pyplot  # pylint: disable=import-outside-toplevel
+    except ImportError:
+        print('Install matplotlib to plot the results')
+        return
+
+    sizes = sorted(results)
+    shapes = sorted({shape for size_results in results.values() for shape in size_results})
+    figure, (latency_axes, amplification_axes) = pyplot.subplots(1, 2, figsize=(16, 6))
+    for shape in shapes:
+        latency_axes.plot(
+            sizes, [results[size].get(shape, {}).get('p50_ms') for size in sizes], marker='o', label=shape
+        )
+        amplification_axes.plot(
+            sizes, [results[size].get(shape, {}).get('read_amplification') for size in sizes], marker='o', label=shape
+        )
+    for axes, label in ((latency_axes, 'p50 latency (ms)'), (amplification_axes, 'items read per item returned')):
+        axes.set_xscale('log')
+        axes.set_xlabel('items per type')
+        axes.set_ylabel(label)
+        axes.grid(True)
+    amplification_axes.legend(fontsize='small')
+    figure.tight_layout()
+    figure.savefig(plot_path)
+
+
+def main():
+    """Run the scaling benchmark."""
+    parser = argparse.ArgumentParser(description=__doc__.split('\n', maxsplit=2)[1])
+    parser.add_argument('--sizes', type=int, nargs='+', default=[10000, 100000, 1000000], help='items per type')
+    parser.add_argument('--seed', type=int, default=42)
+    for attribute, skew in DatasetGenerator.DEFAULT_SKEWS.items():
+        parser.add_argument(f'--{attribute}-skew', type=float, default=skew, help=f'the Zipf exponent of {attribute}')
+    parser.add_argument('--limit', type=int, default=20, help='the page size of the measured queries')
+    parser.add_argument('--iterations', type=int, default=10)
+    parser.add_argument('--warmup', type=int, default=1)
+    parser.add_argument('--max-workers', type=int, default=16, help='the maximum number of import batches in flight')
+    parser.add_argument('--endpoint-url', help='e.g. http://localhost:8000 for DynamoDB Local (default: moto)')
+    parser.add_argument('--output', help='store the results as JSON')
+    parser.add_argument('--plot', help='store a plot of the results, e.g. scaling.png')
+    args = parser.parse_args()
+
+    generator = DatasetGenerator(
+        seed=args.seed,
+        skews={attribute: getattr(args, f'{attribute}_skew') for attribute in DatasetGenerator.DEFAULT_SKEWS},
+    )
+    mock = replay.start_stand_in(args.endpoint_url)
+    try:
+        replay.create_table(args.endpoint_url)
+        results = run(args.sizes, generator, args)
+    finally:
+        if mock:
+            mock.stop()
+
+    if args.output:
+        with open(args.output, 'w') as output_file:
+            json.dump(results, output_file, indent=2, sort_keys=True)
+    if args.plot:
+        plot(results, args.plot)
+
+
+if __name__ == '__main__':
+    main()
@@ -6,11 +6,23 @@ import os
 # Related third party imports
 from aws_cdk import (
     aws_appsync as appsync,
+    aws_iam as iam,
     core,
 )
 
 # Local application/library specific imports
+from custom_constructs.appsync.dynamodb_resolver_data_source import DynamoDbResolverDataSource
 from custom_constructs.appsync.lambda_resolver_data_source import LambdaResolverDataSource
+from custom_constructs.appsync.lambda_router import LambdaRouter
+
+# The attributes of the items of every connection field, see the Car and Book types in the schema
+CONNECTION_ITEM_ATTRIBUTES = {
+    'getCars': ['id', 'itemType', 'dateAdded', 'make', 'model', 'color', 'continentOfOrigin', 'countryOfOrigin',
+                'licensePlate'],
+    'getBooks': ['id', 'itemType', 'dateAdded', 'title', 'author', 'yearReleased'],
+}
+# The arguments of every connection field, which are all caching keys
+CONNECTION_ARGUMENTS = ['limit', 'nextToken', 'filter', 'countBudget', 'addedAfter', 'addedBefore', 'newestFirst']
 
 
 class AppSyncDataSources(core.Construct):
@@ -48,6 +60,102 @@ class AppSyncDataSources(core.Construct):
             ),
         )
 
+        # The environment shared by all functions that access the inventory table
+        inventory_environment = {
+            'INVENTORY_TABLE': params['inventory_ddb_table'].table_name,
+            # Items are spread over this many partition keys (ITEM#0 .. ITEM#n-1). Don't lower this
+            # value after deploying, items in the higher shards would no longer be read.
+            'INVENTORY_SHARD_COUNT': str(params.get('inventory_shard_count', 4)),
+            # Keep reading the unsharded 'ITEM' partition until all items have been migrated
+            # with controllers/inventory_migrations.py
+            'INVENTORY_LEGACY_PARTITION': 'true',
+            # Keep querying until a filtered page is full, or until this many items or
+            # read capacity units have been read for a single request.
+            'INVENTORY_FILL_READ_BUDGET_ITEMS': '1000',
+            'INVENTORY_FILL_READ_BUDGET_RCU': '50',
+            # The attributes with a '<attribute>-index' global secondary index
+            'INVENTORY_INDEXED_ATTRIBUTES': ','.join(params.get('inventory_indexed_attributes', [])),
+            # Maintain an inverted index of trigrams for the containsAnd / containsOr filters. Existing
+            # items are added to the index with controllers/inventory_migrations.py; until then, items
+            # without index entries aren't found through it. Only enable the reads after that backfill.
+            'INVENTORY_NGRAM_INDEX': 'true',
+            'INVENTORY_NGRAM_INDEX_READS': 'false',
+            # Keep up to this many getCars / getBooks results per Lambda container, for at most
+            # this many seconds. Adding items invalidates the cached results immediately.
+            'INVENTORY_RESULT_CACHE_SIZE': '128',
+            'INVENTORY_RESULT_CACHE_TTL': '60',
+            # Read with the low-level DynamoDB client, which only decodes the projected attributes
+            'INVENTORY_READ_ENGINE': 'client',
+            # Give new items a time-ordered id (a ULID), so the items added in a time range are a range
+            # of sort keys (addedAfter / addedBefore / newestFirst). Items added before get a new id
+            # with controllers/inventory_migrations.py
+            'INVENTORY_TIME_ORDERED_IDS': 'true',
+        }
+
+        # The AppSync API cache (an appsync.CfnApiCache), and the TTL in seconds of the fields that
+        # are cached in it, e.g. {'getCars': {'ttl': 60}}
+        api_cache = params.get('api_cache')
+        cached_fields = params.get('cached_fields', {}) if api_cache else {}
+        if api_cache:
+            # Adding items flushes the API cache, see controllers/api_cache.py
+            inventory_environment['INVENTORY_API_CACHE_API_ID'] = params['graphql_api'].api_id
+
+        def caching(field_name: str) -> dict:
+            """Return the caching config of a connection field, or None if it isn't cached."""
+            if field_name not in cached_fields:
+                return None
+            # A cached result has to answer every query of the field, so it contains all attributes
+            # of the items. The diagnostics describe a single request, so they're never cached.
+            # Note: a cached field always reads items. A query without items (only resultCount)
+            # gets the resultCount of a page then, instead of counting up to its countBudget.
+            # Adding items flushes the cache, so cached results never hide the added items.
+            return {
+                'ttl': cached_fields[field_name]['ttl'],
+                'arguments': CONNECTION_ARGUMENTS,
+                'selection_set': ['items'] + [
+                    f'items/{attribute}' for attribute in CONNECTION_ITEM_ATTRIBUTES[field_name]
+                ] + ['resultCount', 'nextToken', 'totalCount'],
+                'api_cache': api_cache,
+            }
+
+        def grant_flush_api_cache(function) -> None:
+            """Allow a function that adds items to flush the API cache."""
+            if api_cache:
+                function.add_to_role_policy(iam.PolicyStatement(
+                    actions=['appsync:FlushApiCache'],
+                    resources=[params['graphql_api'].arn],
+                ))
+
+        # The memory size, provisioned concurrency and maximum batch size of the function of a field,
+        # e.g. {'getCars': {'memory_size': 512, 'provisioned_concurrency': 2}}
+        function_settings = params.get('function_settings', {})
+
+        router = None
+        if params.get('lambda_router'):
+            # Resolve all fields with a single function. Its warm containers, result caches and
+            # DynamoDB connections are shared by all fields, instead of every field having its own.
+            # It gets the largest memory size and the provisioned concurrency of all fields combined,
+            # so the settings of a field no longer apply to that field alone. The maximum batch
+            # size is a setting of the resolver, so it still applies per field.
+            router = LambdaRouter(
+                scope=self,
+                construct_id='playground_router',
+                params={
+                    'api': params['graphql_api'],
+                    'environment': inventory_environment,
+                    'memory_size': max(
+                        (
+                            settings['memory_size'] for settings in function_settings.values()
+                            if 'memory_size' in settings
+                        ),
+                        default=None,
+                    ),
+                    'provisioned_concurrency': sum(
+                        settings.get('provisioned_concurrency', 0) for settings in function_settings.values()
+                    ),
+                }
+            )
+
         playground_get_inventory = LambdaResolverDataSource(
             scope=self,
             construct_id='playground_get_inventory',
@@ -59,14 +167,71 @@ class AppSyncDataSources(core.Construct):
                 'required_scopes': [
                     'scopes/items:read',
                 ],
-                'environment': {
-                    'INVENTORY_TABLE': params['inventory_ddb_table'].table_name,
-                },
+                'environment': inventory_environment,
+                'router': router,
+                'function_settings': function_settings.get('getInventory'),
             }
         )
         # Give this function access read access to the Items Table
         params['inventory_ddb_table'].grant_read_data(playground_get_inventory.function)
 
+        playground_get_cars_by_ids = LambdaResolverDataSource(
+            scope=self,
+            construct_id='playground_get_cars_by_ids',
+            params={
+                'api': params['graphql_api'],
+                'type_name': 'Query',
+                'field_name': 'getCarsByIds',
+                'lambda_handler': 'handle_get_cars_by_ids',
+                'required_scopes': [
+                    'scopes/items:read',
+                ],
+                'environment': inventory_environment,
+                'router': router,
+                'function_settings': function_settings.get('getCarsByIds'),
+            }
+        )
+        # Give this function access read access to the Items Table
+        params['inventory_ddb_table'].grant_read_data(playground_get_cars_by_ids.function)
+
+        playground_get_books_by_ids = LambdaResolverDataSource(
+            scope=self,
+            construct_id='playground_get_books_by_ids',
+            params={
+                'api': params['graphql_api'],
+                'type_name': 'Query',
+                'field_name': 'getBooksByIds',
+                'lambda_handler': 'handle_get_books_by_ids',
+                'required_scopes': [
+                    'scopes/items:read',
+                ],
+                'environment': inventory_environment,
+                'router': router,
+                'function_settings': function_settings.get('getBooksByIds'),
+            }
+        )
+        # Give this function access read access to the Items Table
+        params['inventory_ddb_table'].grant_read_data(playground_get_books_by_ids.function)
+
+        playground_item = LambdaResolverDataSource(
+            scope=self,
+            construct_id='playground_item',
+            params={
+                'api': params['graphql_api'],
+                'type_name': 'Query',
+                'field_name': 'item',
+                'lambda_handler': 'handle_item',
+                'required_scopes': [
+                    'scopes/items:read',
+                ],
+                'environment': inventory_environment,
+                'router': router,
+                'function_settings': function_settings.get('item'),
+            }
+        )
+        # Give this function access read access to the Items Table
+        params['inventory_ddb_table'].grant_read_data(playground_item.function)
+
         playground_add_car = LambdaResolverDataSource(
             scope=self,
             construct_id='playground_add_car',
@@ -78,13 +243,14 @@ class AppSyncDataSources(core.Construct):
                 'required_scopes': [
                     'scopes/items:write',
                 ],
-                'environment': {
-                    'INVENTORY_TABLE': params['inventory_ddb_table'].table_name,
-                },
+                'environment': inventory_environment,
+                'router': router,
+                'function_settings': function_settings.get('addCar'),
             }
         )
         # Give this function access write access to the Items Table
         params['inventory_ddb_table'].grant_write_data(playground_add_car.function)
+        grant_flush_api_cache(playground_add_car.function)
 
         playground_add_book = LambdaResolverDataSource(
             scope=self,
@@ -97,48 +263,133 @@ class AppSyncDataSources(core.Construct):
                 'required_scopes': [
                     'scopes/items:write',
                 ],
-                'environment': {
-                    'INVENTORY_TABLE': params['inventory_ddb_table'].table_name,
-                },
+                'environment': inventory_environment,
+                'router': router,
+                'function_settings': function_settings.get('addBook'),
             }
         )
         # Give this function access write access to the Items Table
         params['inventory_ddb_table'].grant_write_data(playground_add_book.function)
+        grant_flush_api_cache(playground_add_book.function)
 
-        playground_get_books = LambdaResolverDataSource(
+        playground_add_cars = LambdaResolverDataSource(
             scope=self,
-            construct_id='playground_get_books',
+            construct_id='playground_add_cars',
             params={
                 'api': params['graphql_api'],
-                'type_name': 'Query',
-                'field_name': 'getBooks',
-                'lambda_handler': 'handle_get_books',
+                'type_name': 'Mutation',
+                'field_name': 'addCars',
+                'lambda_handler': 'handle_add_cars',
                 'required_scopes': [
-                    'scopes/items:read',
+                    'scopes/items:write',
                 ],
-                'environment': {
-                    'INVENTORY_TABLE': params['inventory_ddb_table'].table_name,
-                },
+                'environment': inventory_environment,
+                'router': router,
+                'function_settings': function_settings.get('addCars'),
             }
         )
         # Give this function access write access to the Items Table
-        params['inventory_ddb_table'].grant_read_data(playground_get_books.function)
+        params['inventory_ddb_table'].grant_write_data(playground_add_cars.function)
+        grant_flush_api_cache(playground_add_cars.function)
 
-        playground_get_cars = LambdaResolverDataSource(
+        playground_add_books = LambdaResolverDataSource(
             scope=self,
-            construct_id='playground_get_cars',
+            construct_id='playground_add_books',
             params={
                 'api': params['graphql_api'],
-                'type_name': 'Query',
-                'field_name': 'getCars',
-                'lambda_handler': 'handle_get_cars',
+                'type_name': 'Mutation',
+                'field_name': 'addBooks',
+                'lambda_handler': 'handle_add_books',
                 'required_scopes': [
-                    'scopes/items:read',
+                    'scopes/items:write',
                 ],
-                'environment': {
-                    'INVENTORY_TABLE': params['inventory_ddb_table'].table_name,
-                },
+                'environment': inventory_environment,
+                'router': router,
+                'function_settings': function_settings.get('addBooks'),
             }
         )
         # Give this function access write access to the Items Table
-        params['inventory_ddb_table'].grant_read_data(playground_get_cars.function)
+        params['inventory_ddb_table'].grant_write_data(playground_add_books.function)
+        grant_flush_api_cache(playground_add_books.function)
+
+        # The fields resolved directly from the table by a pipeline resolver instead of a Lambda
+        # function, e.g. ['getCars', 'getBooks']. See tools/vtl_generator.py for the differences
+        # with the Lambda path.
+        direct_resolvers = params.get('direct_resolvers', [])
+        direct_resolver_data_source = None
+        if direct_resolvers:
+            # The streams the InventoryController reads: the shards, and the legacy partition
+            stream_keys = [
+                f'ITEM#{shard}' for shard in range(int(inventory_environment['INVENTORY_SHARD_COUNT']))
+            ]
+            if inventory_environment['INVENTORY_LEGACY_PARTITION'] == 'true':
+                stream_keys.append('ITEM')
+            direct_resolver_data_source = DynamoDbResolverDataSource(
+                scope=self,
+                construct_id='playground_direct',
+                params={
+                    'api': params['graphql_api'],
+                    'table': params['inventory_ddb_table'],
+                    'stream_keys': stream_keys,
+                }
+            )
+
+        if 'getBooks' in direct_resolvers:
+            direct_resolver_data_source.create_resolver(
+                type_name='Query',
+                field_name='getBooks',
+                item_type='book',
+                required_scopes=[
+                    'scopes/items:read',
+                ],
+            )
+        else:
+            playground_get_books = LambdaResolverDataSource(
+                scope=self,
+                construct_id='playground_get_books',
+                params={
+                    'api': params['graphql_api'],
+                    'type_name': 'Query',
+                    'field_name': 'getBooks',
+                    'lambda_handler': 'handle_get_books',
+                    'required_scopes': [
+                        'scopes/items:read',
+                    ],
+                    'environment': inventory_environment,
+                    'router': router,
+                    'function_settings': function_settings.get('getBooks'),
+                    'caching': caching('getBooks'),
+                }
+            )
+            # Give this function access write access to the Items Table
+            params['inventory_ddb_table'].grant_read_data(playground_get_books.function)
+
+        if 'getCars' in direct_resolvers:
+            direct_resolver_data_source.create_resolver(
+                type_name='Query',
+                field_name='getCars',
+                item_type='car',
+                required_scopes=[
+                    'scopes/items:read',
+                ],
+            )
+        else:
+            playground_get_cars = LambdaResolverDataSource(
+                scope=self,
+                construct_id='playground_get_cars',
+                params={
+                    'api': params['graphql_api'],
+                    'type_name': 'Query',
+                    'field_name': 'getCars',
+                    'lambda_handler': 'handle_get_cars',
+                    'required_scopes': [
+                        'scopes/items:read',
+                    ],
+                    'environment': inventory_environment,
+                    'router': router,
+                    'function_settings': function_settings.get('getCars'),
+                    'caching': caching('getCars'),
+                }
+            )
+            # Give this function access write access to the Items Table
+            params['inventory_ddb_table'].grant_read_data(playground_get_cars.function)
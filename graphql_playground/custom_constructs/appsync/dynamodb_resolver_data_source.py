@@ -0,0 +1,103 @@
+"""DynamoDbResolverDataSource module."""
+
+# Standard library imports
+import json
+import os
+
+# Related third party imports
+from aws_cdk import (
+    aws_appsync as appsync,
+    core,
+)
+
+# Local application/library specific imports
+# -
+
+
+def _load_template(file_name: str, placeholders: dict) -> appsync.MappingTemplate:
+    """Load a generated mapping template and fill in the placeholders of the deployment."""
+    with open(file_name) as template_file:
+        template = template_file.read()
+    for placeholder, value in placeholders.items():
+        template = template.replace(placeholder, value)
+    return appsync.MappingTemplate.from_string(template=template)
+
+
+class DynamoDbResolverDataSource(core.Construct):
+    """
+    Construct for direct DynamoDB pipeline resolvers of the inventory, without a Lambda function.
+
+    The mapping templates are generated by tools/vtl_generator.py. Every stream (a shard of the
+    table) is queried by its own pipeline function, which all direct resolvers share. The
+    resolver of a field is added with `create_resolver()`.
+    """
+
+    def __init__(
+        self,
+        scope: core.Construct,
+        construct_id: str,
+        params,
+    ) -> None:
+        """Initialize DynamoDbResolverDataSource Class."""
+        super().__init__(scope, construct_id)
+
+        file_path = os.path.dirname(os.path.realpath(__file__))
+        self.request_templates_path = f'{file_path}/../../../graphql/request_mapping_templates'
+        self.response_templates_path = f'{file_path}/../../../graphql/response_mapping_templates'
+        self.api = params['api']
+        self.stream_keys = params['stream_keys']
+
+        # The templates only query the table, so the data source only needs read access
+        self.data_source = appsync.DynamoDbDataSource(
+            scope=self,
+            id=f'{construct_id}_data_source'.replace('-', '_'),  # No dashes allowed
+            api=self.api,
+            table=params['table'],
+            read_only_access=True,
+        )
+
+        # One function per stream, in the order of the streams. The stream functions store their
+        # response in the stash, the response template of the resolver merges them.
+        self.stream_functions = [
+            appsync.AppsyncFunction(
+                scope=self,
+                id=f'{construct_id}_query_{stream_key}'.replace('-', '_').replace('#', '_'),
+                name=f'{construct_id}_query_{stream_key}'.replace('-', '_').replace('#', '_'),
+                api=self.api,
+                data_source=self.data_source,
+                request_mapping_template=_load_template(
+                    f'{self.request_templates_path}/query_stream_direct.vtl', {'{stream_key}': stream_key}
+                ),
+                response_mapping_template=_load_template(
+                    f'{self.response_templates_path}/query_stream_direct.vtl', {'{stream_key}': stream_key}
+                ),
+            )
+            for stream_key in self.stream_keys
+        ]
+
+    def create_resolver(
+        self,
+        type_name: str,
+        field_name: str,
+        item_type: str,
+        required_scopes: list,
+    ) -> appsync.Resolver:
+        """Attach a pipeline resolver for the items of the given type to a field in the GraphQL Schema."""
+        return appsync.Resolver(
+            scope=self,
+            id=f'{field_name}_resolver',
+            api=self.api,
+            type_name=type_name,
+            field_name=field_name,
+            pipeline_config=self.stream_functions,
+            request_mapping_template=_load_template(
+                f'{self.request_templates_path}/get_{item_type}s_direct.vtl',
+                {
+                    '{required_scopes}': "', '".join(required_scopes),
+                    '{stream_keys}': ', '.join(json.dumps(stream_key) for stream_key in self.stream_keys),
+                },
+            ),
+            response_mapping_template=_load_template(
+                f'{self.response_templates_path}/get_items_direct.vtl', {}
+            ),
+        )
@@ -1,6 +1,7 @@
 """LambdaResolverDataSource module."""
 
 # Standard library imports
+import json
 import textwrap
 
 # Related third party imports
@@ -14,6 +15,45 @@ from aws_cdk import (
 # -
 
 
+def create_resolver_function(  # pylint: disable=too-many-arguments
+    scope: core.Construct,
+    construct_id: str,
+    handler: str,
+    environment: dict,
+    memory_size: int = None,
+    provisioned_concurrency: int = None,
+):
+    """
+    Create a Lambda Function for resolvers, and return it with the function AppSync should invoke.
+
+    With provisioned concurrency AppSync invokes an alias of the latest version of the function,
+    because only versions and aliases can have provisioned concurrency. Otherwise it invokes the
+    function itself.
+    """
+    function = lambda_.Function(
+        scope=scope,
+        id=f'{construct_id}-function',
+        function_name=construct_id,
+        runtime=lambda_.Runtime.PYTHON_3_8,
+        code=lambda_.Code.asset('playground_api'),
+        handler=f'lambda_handler.{handler}',
+        environment=environment or {},
+        # The default memory size (128 MB) if none is provided
+        memory_size=memory_size,
+    )
+    if not provisioned_concurrency:
+        return function, function
+
+    alias = lambda_.Alias(
+        scope=scope,
+        id=f'{construct_id}-alias',
+        alias_name='live',
+        version=function.current_version,
+        provisioned_concurrent_executions=provisioned_concurrency,
+    )
+    return function, alias
+
+
 class LambdaResolverDataSource(core.Construct):
     """Construct for a Lambda Resolver and Data Source."""
 
@@ -26,24 +66,32 @@ class LambdaResolverDataSource(core.Construct):
         """Initialize LambdaResolverDataSource Class."""
         super().__init__(scope, construct_id)
 
-        # Create the Lambda Function
-        self.function = lambda_.Function(
-            scope=self,
-            id=f'{construct_id}-function',
-            function_name=construct_id,
-            runtime=lambda_.Runtime.PYTHON_3_8,
-            code=lambda_.Code.asset('playground_api'),
-            handler=f"lambda_handler.{params['lambda_handler']}",
-            environment=params['environment'] or {},
-        )
+        # The settings of the function of this field, e.g. {'memory_size': 512, 'max_batch_size': 10}
+        function_settings = params.get('function_settings') or {}
+        router = params.get('router')
+        if router:
+            # Resolve this field with the shared function of a LambdaRouter, which
+            # routes the request to the handler of the field based on its info.fieldName
+            self.function = router.function
+            data_source = router.data_source
+        else:
+            # Create the Lambda Function
+            self.function, invoked_function = create_resolver_function(
+                scope=self,
+                construct_id=construct_id,
+                handler=params['lambda_handler'],
+                environment=params['environment'],
+                memory_size=function_settings.get('memory_size'),
+                provisioned_concurrency=function_settings.get('provisioned_concurrency'),
+            )
 
-        # Create a Data Source for this function
-        data_source = appsync.LambdaDataSource(
-            scope=self,
-            id=f'{construct_id}_data_source'.replace('-', '_'),  # No dashes allowed
-            lambda_function=self.function,
-            api=params['api'],
-        )
+            # Create a Data Source for this function
+            data_source = appsync.LambdaDataSource(
+                scope=self,
+                id=f'{construct_id}_data_source'.replace('-', '_'),  # No dashes allowed
+                lambda_function=invoked_function,
+                api=params['api'],
+            )
 
         # Create the request mapping template with the provided scopes
         required_scopes = "', '".join(params['required_scopes'])
@@ -59,21 +107,63 @@ class LambdaResolverDataSource(core.Construct):
                 #end
                 {
                     "version" : "2017-02-28",
-                    "operation": "Invoke",
+                    "operation": "{operation}",
                     "payload": {
                         "arguments": $util.toJson($context.args),
-                        "selectionSetList": $utils.toJson($context.info.selectionSetList)
+                        "selectionSetList": {selection_set_list},
+                        "info": {
+                            "fieldName": $util.toJson($context.info.fieldName),
+                            "parentTypeName": $util.toJson($context.info.parentTypeName)
+                        }
                     }
                 }
             """
         ).replace('{required_scopes}', required_scopes)
 
+        # With `caching`, AppSync caches the results of the resolver in the API cache, e.g.
+        # {'ttl': 60, 'arguments': ['limit', 'nextToken', 'filter'], 'selection_set': [...]}.
+        # An entry is shared by all requests with the same values of the caching keys: every
+        # argument of the field, and the scope claim of the identity. A cache hit skips the
+        # request mapping template, so the scope claim keeps clients without the required scopes
+        # from reading entries cached for other clients.
+        # The selection set isn't a caching key, so a cached result has to answer every query of the
+        # field. The function then resolves the given `selection_set` (e.g. all attributes of the
+        # items) instead of the selectionSetList of the client, and AppSync prunes the response.
+        caching = params.get('caching')
+        selection_set_list = '$utils.toJson($context.info.selectionSetList)'
+        if caching and caching.get('selection_set') is not None:
+            selection_set_list = json.dumps(caching['selection_set'])
+        scope_check_template = scope_check_template.replace('{selection_set_list}', selection_set_list)
+
+        # With a `max_batch_size`, AppSync batches the invocations for a field resolved in
+        # a list (e.g. a field of every item in a connection) into BatchInvoke requests.
+        # The Lambda function then receives a list of events and returns a list of results.
+        max_batch_size = function_settings.get('max_batch_size')
+        scope_check_template = scope_check_template.replace(
+            '{operation}', 'BatchInvoke' if max_batch_size else 'Invoke'
+        )
+
         # Bring it all together in a resolver. This will attach the Lambda Data Source
         # and Request Template to the given field in the GraphQL Schema.
-        data_source.create_resolver(
+        resolver = data_source.create_resolver(
             type_name=params['type_name'],
             field_name=params['field_name'],
             request_mapping_template=appsync.MappingTemplate.from_string(
                 template=scope_check_template
             )
         )
+
+        if max_batch_size:
+            # The L2 Resolver doesn't support MaxBatchSize yet, so set it on the L1 construct
+            resolver.node.default_child.add_property_override('MaxBatchSize', max_batch_size)
+
+        if caching:
+            # The L2 Resolver doesn't support CachingConfig yet, so set it on the L1 construct
+            resolver.node.default_child.add_property_override('CachingConfig', {
+                'Ttl': caching['ttl'],
+                'CachingKeys': [
+                    f'$context.arguments.{argument}' for argument in caching.get('arguments', [])
+                ] + ['$context.identity.claims.scope'],
+            })
+            # A resolver can only be cached once the API cache exists
+            resolver.node.add_dependency(params['api_cache'])
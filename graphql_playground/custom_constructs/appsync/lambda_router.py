@@ -0,0 +1,50 @@
+"""LambdaRouter module."""
+
+# Standard library imports
+# -
+
+# Related third party imports
+from aws_cdk import (
+    aws_appsync as appsync,
+    core,
+)
+
+# Local application/library specific imports
+from custom_constructs.appsync.lambda_resolver_data_source import create_resolver_function
+
+
+class LambdaRouter(core.Construct):
+    """
+    Construct for a single Lambda Function and Data Source that resolves multiple fields.
+
+    The function (lambda_handler.handle_request) routes every request to the handler of its field,
+    based on the info.fieldName in the payload. Pass it to a LambdaResolverDataSource as `router`
+    to resolve a field with it. The scope checks stay in the request mapping templates of the fields.
+    """
+
+    def __init__(
+        self,
+        scope: core.Construct,
+        construct_id: str,
+        params,
+    ) -> None:
+        """Initialize LambdaRouter Class."""
+        super().__init__(scope, construct_id)
+
+        # Create the Lambda Function
+        self.function, invoked_function = create_resolver_function(
+            scope=self,
+            construct_id=construct_id,
+            handler='handle_request',
+            environment=params['environment'],
+            memory_size=params.get('memory_size'),
+            provisioned_concurrency=params.get('provisioned_concurrency'),
+        )
+
+        # Create a single Data Source for all fields
+        self.data_source = appsync.LambdaDataSource(
+            scope=self,
+            id=f'{construct_id}_data_source'.replace('-', '_'),  # No dashes allowed
+            lambda_function=invoked_function,
+            api=params['api'],
+        )
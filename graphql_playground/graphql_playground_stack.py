@@ -14,6 +14,39 @@ from aws_cdk import (
 from custom_constructs.appsync.data_sources import AppSyncDataSources
 from custom_constructs.cognito.user_pool import UserPool
 
+# The item attributes with a global secondary index. The InventoryController uses these indexes
+# to resolve equalsOr filters with key conditions instead of a FilterExpression.
+# DynamoDB creates (and backfills) only one index per table update, so add the attributes one
+# deployment at a time, and wait for each deployment to finish before adding the next one. The
+# candidates, in the order of their benefit for the filters of the recorded queries, are:
+# 'make', 'model', 'color' and 'author'.
+INDEXED_ATTRIBUTES = []
+
+# The AppSync API cache is opt-in: set API_CACHE_INSTANCE_TYPE to an instance type (e.g. 'SMALL')
+# to deploy one, which is billed per hour. Every repeated page of a cached field is then answered
+# from the cache for API_CACHE_TTL seconds, without invoking Lambda. Note that:
+# - adding items flushes the whole cache, so a cached page never hides the added items,
+# - a cached field resolves all attributes of its items, whatever the client selected. A query
+#   without items (only resultCount) counts the items of a page, and ignores its countBudget,
+# - the diagnostics of a cached field are null.
+API_CACHE_INSTANCE_TYPE = None
+API_CACHE_TTL = 60
+CACHED_FIELDS = {
+    'getCars': {'ttl': API_CACHE_TTL},
+    'getBooks': {'ttl': API_CACHE_TTL},
+}
+
+# The settings of the Lambda function of a field: its memory size, its provisioned concurrency
+# and the maximum number of invocations AppSync batches into a BatchInvoke request, e.g.
+# {'getCars': {'memory_size': 512, 'provisioned_concurrency': 2}, 'item': {'max_batch_size': 10}}
+FUNCTION_SETTINGS = {}
+
+# Resolve all fields with a single Lambda function, which routes on the field name. The fields then
+# share its warm containers, result caches and DynamoDB connections. Note that the router gets the
+# largest memory size of all fields and their provisioned concurrency summed up: every field is
+# billed for the largest memory size, and a single field can use the concurrency of all of them.
+LAMBDA_ROUTER = False
+
 
 class GraphqlPlaygroundStack(core.Stack):
     """The GraphqlPlaygroundStack class contains all CFN resources for the playground."""
@@ -41,6 +74,22 @@ class GraphqlPlaygroundStack(core.Stack):
             ),
         )
 
+        # Create an index for every indexed attribute, named '<attribute>-index'. The indexes use
+        # the same sort key as the table, so their results are sorted the same way.
+        for attribute in INDEXED_ATTRIBUTES:
+            inventory_table.add_global_secondary_index(
+                index_name=f'{attribute}-index',
+                partition_key=dynamodb.Attribute(
+                    name=attribute,
+                    type=dynamodb.AttributeType.STRING
+                ),
+                sort_key=dynamodb.Attribute(
+                    name='SK',
+                    type=dynamodb.AttributeType.STRING
+                ),
+                projection_type=dynamodb.ProjectionType.ALL,
+            )
+
         # Define where the GraphQL schema is stored
         file_path = os.path.dirname(os.path.realpath(__file__))
         schema_file_path = f'{file_path}/../graphql/schema.graphql'
@@ -64,11 +113,32 @@ class GraphqlPlaygroundStack(core.Stack):
             )
         )
 
+        api_cache = None
+        if API_CACHE_INSTANCE_TYPE:
+            # Only the resolvers with a CachingConfig are cached (per-resolver caching)
+            api_cache = appsync.CfnApiCache(
+                scope=self,
+                id='playground-api-cache',
+                api_id=graphql_api.api_id,
+                api_caching_behavior='PER_RESOLVER_CACHING',
+                type=API_CACHE_INSTANCE_TYPE,
+                ttl=API_CACHE_TTL,
+                at_rest_encryption_enabled=True,
+                transit_encryption_enabled=True,
+            )
+
         AppSyncDataSources(
             scope=self,
             construct_id='appsync-datasources',
             params={
                 'graphql_api': graphql_api,
                 'inventory_ddb_table': inventory_table,
+                'inventory_indexed_attributes': INDEXED_ATTRIBUTES,
+                'function_settings': FUNCTION_SETTINGS,
+                'lambda_router': LAMBDA_ROUTER,
+                # Resolve these fields directly from the table with VTL instead, e.g. ['getCars', 'getBooks']
+                'direct_resolvers': [],
+                'api_cache': api_cache,
+                'cached_fields': CACHED_FIELDS,
             }
         )
@@ -0,0 +1,36 @@
+"""
+The api_cache module flushes the AppSync API cache of the GraphQL API.
+
+With an API cache, AppSync answers repeated getCars and getBooks queries from the cache without
+invoking Lambda. A cached page would hide the items added after it was cached, so the mutations
+flush the cache. AppSync can also evict a single entry ($extensions.evictFromApiCache), but only
+given the values of all its caching keys: every argument of the field, and the scope claim. The
+cached pages, filters and scopes can't be listed, so the whole cache is flushed instead.
+"""
+# Standard library imports
+import os
+
+# Related third party imports
+from botocore.exceptions import BotoCoreError, ClientError
+
+# Local application/library specific imports
+from controllers.aws_clients import appsync_client
+
+
+def flush_api_cache() -> bool:
+    """
+    Flush the API cache of the GraphQL API in INVENTORY_API_CACHE_API_ID, if the API has a cache.
+
+    The items have been written at this point, so a failed flush doesn't fail the mutation (a retry
+    would add the items again): the cached results then expire after their TTL. Returns whether the
+    cache was flushed.
+    """
+    api_id = os.environ.get('INVENTORY_API_CACHE_API_ID')
+    if not api_id:
+        return False
+    try:
+        appsync_client().flush_api_cache(apiId=api_id)
+    except (BotoCoreError, ClientError) as exc:
+        print(f'Failed to flush the API cache of {api_id}: {exc}')
+        return False
+    return True
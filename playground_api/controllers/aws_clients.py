@@ -0,0 +1,85 @@
+"""
+The aws_clients module holds the AWS clients shared by all invocations of a Lambda container.
+
+Creating a boto3 resource loads the service and resource models, resolves the endpoint and sets
+up a connection pool. The handlers used to do that on every invocation. Now the resource is
+created on first use and reused by every later (warm) invocation, which also reuses its open
+connections. The endpoint (INVENTORY_DYNAMODB_ENDPOINT) is read when the resource is created.
+The functions are cached with lru_cache, so tests can create new clients with cache_clear().
+"""
+# Standard library imports
+import os
+import threading
+from functools import lru_cache
+
+# Related third party imports
+import boto3
+from botocore.config import Config
+
+# Local application/library specific imports
+from controllers.instrumentation import instrument_client
+
+# Resolvers have to answer within the AppSync timeout, so fail fast and retry in the standard
+# retry mode (exponential backoff with a retry quota) instead of the legacy mode's 10 attempts
+# for DynamoDB. The connection pool is large enough for the parallel stream queries of the
+# InventoryController and the batch workers of the importer, so connections are never discarded.
+DYNAMODB_CONFIG = Config(
+    connect_timeout=float(os.environ.get('INVENTORY_DYNAMODB_CONNECT_TIMEOUT', '1')),
+    read_timeout=float(os.environ.get('INVENTORY_DYNAMODB_READ_TIMEOUT', '5')),
+    max_pool_connections=int(os.environ.get('INVENTORY_DYNAMODB_MAX_POOL_CONNECTIONS', '32')),
+    retries={
+        'mode': 'standard',
+        'max_attempts': int(os.environ.get('INVENTORY_DYNAMODB_MAX_ATTEMPTS', '3')),
+    },
+    # Keep idle connections open between invocations (older botocore versions don't support this)
+    **({'tcp_keepalive': True} if 'tcp_keepalive' in Config.OPTION_DEFAULTS else {}),
+)
+
+# boto3 creates clients and resources from a default session, which isn't thread safe
+CLIENT_CREATION_LOCK = threading.Lock()
+
+
+@lru_cache(maxsize=None)
+def dynamodb_resource():
+    """Return the DynamoDB resource of this container, and create it on first use."""
+    # The InventoryController can be created from multiple threads (e.g. by the importer)
+    with CLIENT_CREATION_LOCK:
+        resource = boto3.resource(
+            'dynamodb',
+            config=DYNAMODB_CONFIG,
+            endpoint_url=os.environ.get('INVENTORY_DYNAMODB_ENDPOINT'),
+        )
+    # Record the latency and consumed capacity of every DynamoDB call in the handler metrics
+    instrument_client(resource.meta.client)
+    return resource
+
+
+@lru_cache(maxsize=None)
+def dynamodb_client():
+    """
+    Return the low-level DynamoDB client of this container, and create it on first use.
+
+    This is a client of its own: the client of the resource (resource.meta.client) has the
+    handlers of the resource registered, which convert all values from and to Decimals.
+    """
+    with CLIENT_CREATION_LOCK:
+        client = boto3.client(
+            'dynamodb',
+            config=DYNAMODB_CONFIG,
+            endpoint_url=os.environ.get('INVENTORY_DYNAMODB_ENDPOINT'),
+        )
+    instrument_client(client)
+    return client
+
+
+@lru_cache(maxsize=None)
+def dynamodb_table(table_name: str):
+    """Return the Table resource of a table, and create it on first use."""
+    return dynamodb_resource().Table(table_name)
+
+
+@lru_cache(maxsize=None)
+def appsync_client():
+    """Return the AppSync client of this container, and create it on first use."""
+    with CLIENT_CREATION_LOCK:
+        return boto3.client('appsync')
@@ -0,0 +1,202 @@
+"""
+The client_engine module contains the ClientTable class, a read engine on the low-level DynamoDB client.
+
+The boto3 Table resource runs its TypeDeserializer over every attribute of every item and turns
+all numbers into Decimals, which have to be converted again before AppSync gets its JSON. The
+ClientTable calls the low-level client directly and decodes the items with a specialized
+deserializer: strings are taken as they are, numbers become int or float according to their
+type in schema.graphql, and only the projected attributes are decoded. Enable it with
+INVENTORY_READ_ENGINE=client.
+"""
+# Standard library imports
+from decimal import Decimal
+
+# Related third party imports
+from boto3.dynamodb.conditions import ConditionExpressionBuilder
+
+# Local application/library specific imports
+# -
+
+# The number attributes in schema.graphql and the Python type of their GraphQL type. Numbers
+# that aren't listed here become an int if they're integral, and a float otherwise.
+NUMBER_TYPES = {
+    'yearReleased': int,
+    'itemCount': int,
+    'version': int,
+}
+
+
+def deserialize_item(raw_item: dict, attributes: set = None) -> dict:
+    """
+    Decode an item in the DynamoDB JSON format, e.g. {"make": {"S": "Tesla"}}, in a single pass.
+
+    If `attributes` is provided, only those attributes are decoded.
+    """
+    item = {}
+    for attribute, typed_value in raw_item.items():
+        if attributes is not None and attribute not in attributes:
+            continue
+        # Every typed value has exactly one type, e.g. {"S": "Tesla"}
+        for value_type, value in typed_value.items():
+            if value_type == 'S':
+                item[attribute] = value
+            elif value_type == 'N':
+                item[attribute] = NUMBER_TYPES.get(attribute, _parse_number)(value)
+            else:
+                item[attribute] = _deserialize_value(value_type, value)
+    return item
+
+
+def serialize_value(value) -> dict:
+    """Encode a Python value in the DynamoDB JSON format."""
+    if isinstance(value, str):
+        return {'S': value}
+    # bool is a subclass of int, so it's checked first
+    if isinstance(value, bool):
+        return {'BOOL': value}
+    if isinstance(value, (int, float, Decimal)):
+        return {'N': str(value)}
+    if value is None:
+        return {'NULL': True}
+    if isinstance(value, (bytes, bytearray)):
+        return {'B': bytes(value)}
+    return _serialize_collection(value)
+
+
+def serialize_item(item: dict) -> dict:
+    """Encode a dictionary of Python values (an item or a key) in the DynamoDB JSON format."""
+    return {attribute: serialize_value(value) for attribute, value in item.items()}
+
+
+def _serialize_collection(value) -> dict:
+    """Encode a map, list or set in the DynamoDB JSON format."""
+    if isinstance(value, dict):
+        return {'M': {key: serialize_value(nested_value) for key, nested_value in value.items()}}
+    if isinstance(value, (list, tuple)):
+        return {'L': [serialize_value(nested_value) for nested_value in value]}
+    if isinstance(value, (set, frozenset)) and all(isinstance(member, str) for member in value):
+        return {'SS': sorted(value)}
+    if isinstance(value, (set, frozenset)):
+        return {'NS': sorted(str(member) for member in value)}
+    raise TypeError(f'Unsupported type {type(value).__name__} for DynamoDB')
+
+
+def _parse_number(value: str):
+    """Parse a DynamoDB number without a known type into an int or a float."""
+    if '.' in value or 'e' in value or 'E' in value:
+        return float(value)
+    return int(value)
+
+
+def _deserialize_value(value_type: str, value):
+    """Decode any typed value other than a string or a number attribute."""
+    if value_type == 'N':
+        return _parse_number(value)
+    if value_type == 'NULL':
+        return None
+    if value_type == 'M':
+        return {key: _deserialize_value(*next(iter(nested.items()))) for key, nested in value.items()}
+    if value_type == 'L':
+        return [_deserialize_value(*next(iter(nested.items()))) for nested in value]
+    if value_type in ('SS', 'NS', 'BS'):
+        # The members of a string set are strings, those of a number set are numbers, and so on
+        return {_deserialize_value(value_type[0], member) for member in value}
+    # S, BOOL and B are returned as they are
+    return value
+
+
+class ClientTable:
+    """
+    The ClientTable offers the query() and batch_get_item() calls of the InventoryController read paths.
+
+    The calls take and return the same Python values as the Table resource, except that numbers
+    are ints and floats instead of Decimals. Key and Attr conditions are serialized with the boto3
+    ConditionExpressionBuilder, string expressions are passed on as they are.
+    """
+
+    def __init__(self, client, table_name: str) -> None:
+        """Initialize the ClientTable Class."""
+        self.client = client
+        self.name = table_name
+
+    def query(self, **params) -> dict:
+        """Query the table, with the same parameters and result as the query of a Table resource."""
+        request = self._serialize_expressions(params)
+        request['TableName'] = self.name
+        if 'ExclusiveStartKey' in request:
+            request['ExclusiveStartKey'] = serialize_item(request['ExclusiveStartKey'])
+
+        ddb_response = self.client.query(**request)
+
+        attributes = self._projected_attributes(request)
+        ddb_response['Items'] = [deserialize_item(raw_item, attributes) for raw_item in ddb_response.get('Items', [])]
+        if 'LastEvaluatedKey' in ddb_response:
+            ddb_response['LastEvaluatedKey'] = deserialize_item(ddb_response['LastEvaluatedKey'])
+        return ddb_response
+
+    def batch_get_item(self, RequestItems: dict, **params) -> dict:  # pylint: disable=invalid-name
+        """Get items by their keys, with the same parameters and result as the batch_get_item of the resource."""
+        request_items = {
+            table_name: {
+                **table_request,
+                'Keys': [serialize_item(key) for key in table_request['Keys']],
+            }
+            for table_name, table_request in RequestItems.items()
+        }
+
+        ddb_response = self.client.batch_get_item(RequestItems=request_items, **params)
+
+        ddb_response['Responses'] = {
+            table_name: [
+                deserialize_item(raw_item, self._projected_attributes(request_items[table_name]))
+                for raw_item in raw_items
+            ]
+            for table_name, raw_items in ddb_response.get('Responses', {}).items()
+        }
+        # The unprocessed keys are passed to batch_get_item() again, so they're decoded as well
+        ddb_response['UnprocessedKeys'] = {
+            table_name: {
+                **table_request,
+                'Keys': [deserialize_item(key) for key in table_request['Keys']],
+            }
+            for table_name, table_request in ddb_response.get('UnprocessedKeys', {}).items()
+        }
+        return ddb_response
+
+    @staticmethod
+    def _serialize_expressions(params: dict) -> dict:
+        """Serialize the condition objects and expression values of a request."""
+        request = dict(params)
+        attribute_names = dict(request.get('ExpressionAttributeNames', {}))
+        attribute_values = dict(request.get('ExpressionAttributeValues', {}))
+
+        # One builder for all conditions of the request, so their placeholders don't overlap
+        builder = ConditionExpressionBuilder()
+        for expression_key, is_key_condition in (('KeyConditionExpression', True), ('FilterExpression', False)):
+            condition = request.get(expression_key)
+            if condition is None or isinstance(condition, str):
+                continue
+            built_expression = builder.build_expression(condition, is_key_condition=is_key_condition)
+            request[expression_key] = built_expression.condition_expression
+            attribute_names.update(built_expression.attribute_name_placeholders)
+            attribute_values.update(built_expression.attribute_value_placeholders)
+
+        if attribute_names:
+            request['ExpressionAttributeNames'] = attribute_names
+        if attribute_values:
+            request['ExpressionAttributeValues'] = {
+                placeholder: serialize_value(value) for placeholder, value in attribute_values.items()
+            }
+        return request
+
+    @staticmethod
+    def _projected_attributes(request: dict):
+        """Return the attributes of the ProjectionExpression of a request, or None if it has none."""
+        projection_expression = request.get('ProjectionExpression')
+        if not projection_expression:
+            return None
+        attribute_names = request.get('ExpressionAttributeNames', {})
+        return {
+            attribute_names.get(placeholder.strip(), placeholder.strip())
+            for placeholder in projection_expression.split(',')
+        }
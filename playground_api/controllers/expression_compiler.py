@@ -0,0 +1,303 @@
+"""
+The expression_compiler module compiles filters and selection sets into DynamoDB expressions.
+
+build_filter_condition() builds a tree of boto3 Attr conditions, which boto3 then walks again
+to serialize it. compile_filter_expression() emits the final expression strings,
+ExpressionAttributeNames and ExpressionAttributeValues directly. Because clients send the same
+filters over and over, the compiled expressions are kept in an LRU cache that lives as long
+as the Lambda container.
+"""
+# Standard library imports
+import json
+import os
+import re
+from functools import lru_cache
+
+# Related third party imports
+from boto3.dynamodb.conditions import Attr, ConditionExpressionBuilder
+
+# Local application/library specific imports
+# -
+
+# The number of compiled filter and projection expressions kept per Lambda container
+EXPRESSION_CACHE_SIZE = int(os.environ.get('INVENTORY_EXPRESSION_CACHE_SIZE', '256'))
+
+# The templates for the five filter operations, and the operator that joins their values.
+# For example, {"make": {"containsOr": ["esla", "olksw"]}} compiles to
+# (contains(#F0, :f0) OR contains(#F0, :f1))
+FILTER_OPERATIONS = {
+    'containsOr': ('contains({name}, {value})', ' OR '),
+    'containsAnd': ('contains({name}, {value})', ' AND '),
+    'notContains': ('NOT contains({name}, {value})', ' AND '),
+    'equalsOr': ('{name} = {value}', ' OR '),
+    'notEquals': ('NOT {name} = {value}', ' AND '),
+}
+
+
+def canonical_filter_key(filter_dict: dict) -> frozenset:
+    """
+    Normalize a filter into a canonical, hashable key.
+
+    Filters that only differ in the order of their keys, operations or values (or in duplicate
+    values) are semantically equal, so they get the same key. Operations without values
+    don't affect the filter and are left out.
+    """
+    if not filter_dict:
+        return frozenset()
+    return frozenset(
+        (filter_key, filter_op, frozenset(filter_op_values))
+        for filter_key, filter_values in filter_dict.items()
+        for filter_op, filter_op_values in filter_values.items()
+        if filter_op_values
+    )
+
+
+def compile_filter_expression(filter_dict: dict) -> dict:
+    """
+    Compile a filter into a FilterExpression, ExpressionAttributeNames and ExpressionAttributeValues.
+
+    Returns None if the filter doesn't filter anything. The returned dictionaries are copies, so the
+    caller can merge them into its query parameters without changing the cached expressions.
+    """
+    compiled_filter = _compile_canonical_filter(canonical_filter_key(filter_dict))
+    if compiled_filter is None:
+        return None
+    return {
+        'FilterExpression': compiled_filter['FilterExpression'],
+        'ExpressionAttributeNames': dict(compiled_filter['ExpressionAttributeNames']),
+        'ExpressionAttributeValues': dict(compiled_filter['ExpressionAttributeValues']),
+    }
+
+
+def compile_projection_expression(selection_set: list) -> dict:
+    """Compile a list of attributes into a ProjectionExpression and ExpressionAttributeNames."""
+    compiled_projection = _compile_projection(tuple(selection_set))
+    return {
+        'ProjectionExpression': compiled_projection['ProjectionExpression'],
+        'ExpressionAttributeNames': dict(compiled_projection['ExpressionAttributeNames']),
+    }
+
+
+def build_filter_condition(filter_dict):  # pylint: disable=too-many-branches,too-many-statements
+    """
+    Build a complex Query Filter Expression to limit the results returned by DynamoDB.
+
+    The filter_dict can have multiple keys, like make, model and color. Each
+    of these keys can be filtered simultaneously, e.g. "all cars with make 'Tesla' and model 'Model 3'.
+
+    The filters allow for five different operations: containsOr, containsAnd, notContains,
+    equalsOr and notEquals.
+
+    This function returns a single filter_expression, which consists of multiple key_filters (make,
+    model, and so on), each of which has zero, one or more operations (containsOr, notEquals, and
+    so on) which are defined in sub_key_filters.
+
+    Example:
+    filter_expression = (
+        (key_filter_1) AND (key_filter_2) AND ... AND (key_filter_n)
+    )
+
+    Where key_filters look like:
+    key_filter_x = (
+        (sub_key_filter_1) AND/OR (sub_key_filter_2) AND/OR ... AND/OR (sub_key_filter_n)
+    )
+
+    Whether an AND or OR is applied depends on the filter, e.g. containsOr or containsAnd.
+    """
+    if not filter_dict:
+        return None
+
+    # We start with an empty filter expression
+    filter_expression = None
+    # Then we loop over every element of the filter_dict, defined just above.
+    # This will return values like 'model', 'make', 'title' or other terms to filter on.
+    for filter_key, filter_values in filter_dict.items():
+        key_filter = None
+        for filter_op, filter_op_values in filter_values.items():
+            # e.g. filter_key = 'make', filter_op = 'containsOr', filter_op_values = ['esla', 'olksw']
+            # This would filter the 'make' by items that contain 'esla' OR 'olkswag'.
+
+            # Create a new sub filter for the multiple values for one key, for example
+            # (make.contains('esla' OR 'olkswag')).
+            sub_filter = None
+            for filter_op_value in filter_op_values:
+                if filter_op == 'containsOr':
+                    # Create a 'contains' comparison for every key, e.g. (make.contains('esla'))
+                    sub_key_filter = Attr(filter_key).contains(filter_op_value)
+
+                    # Then bind every sub_key_filter together with the OR operator. This creates a filter
+                    # like (make.contains('esla' OR 'olkswag'))
+                    sub_filter = _append_filter(sub_filter, 'OR', sub_key_filter)
+
+                elif filter_op == 'containsAnd':
+                    # Like the one above, but with an AND operator, for example (make.contains('Tes' AND 'la'))
+                    # to match Tesla and Testorilla.
+                    # Create a 'contains' comparison for every key, e.g. (make.contains('Tes'))
+                    sub_key_filter = Attr(filter_key).contains(filter_op_value)
+
+                    # Then bind every sub_key_filter together with the AND operator. This creates a filter
+                    # like (make.contains('Tes' AND 'la'))
+                    sub_filter = _append_filter(sub_filter, 'AND', sub_key_filter)
+
+                elif filter_op == 'notContains':
+                    # Like the one above, but with an Negate (~) operator, for example
+                    # (make.notContains('Tes' AND 'Volksw')).
+                    # Create a 'contains' comparison for every key, e.g. (make.contains('Tes'))
+                    sub_key_filter = ~Attr(filter_key).contains(filter_op_value)
+
+                    # Then bind every sub_key_filter together with the AND operator. This creates a filter
+                    # like (make.notContains('Tes' AND 'Volksw'))
+                    sub_filter = _append_filter(sub_filter, 'AND', sub_key_filter)
+
+                elif filter_op == 'equalsOr':
+                    # Create a 'equals' comparison for every key, e.g. (make.equals('Tesla'))
+                    sub_key_filter = Attr(filter_key).eq(filter_op_value)
+
+                    # Then bind every sub_key_filter together with the OR operator. This creates a filter
+                    # like (make.equals('Tesla' OR 'Volkswagen'))
+                    sub_filter = _append_filter(sub_filter, 'OR', sub_key_filter)
+
+                elif filter_op == 'notEquals':
+                    # Like the notContains one above, but with an equals operator, for example
+                    # (make.notEquals('Tesla' AND 'Volkswagen')).
+                    # Create a 'equals' comparison for every key, e.g. (make.notEquals('Tesla'))
+                    sub_key_filter = ~Attr(filter_key).eq(filter_op_value)
+
+                    # Then bind every sub_key_filter together with the AND operator. This creates a filter
+                    # like (make.notEquals('Tesla' AND 'Volkswagen'))
+                    sub_filter = _append_filter(sub_filter, 'AND', sub_key_filter)
+
+            # When all keywords have been combined, add it to key_filter with an AND operator.
+            # This creates a filter like
+            # "(make.notEquals('Tesla' AND 'Volkswagen')) AND (model.notEquals('Mach-E'))".
+            key_filter = _append_filter(key_filter, 'AND', sub_filter)
+
+        # Finally, bind the key_filters together into filter_expression.
+        filter_expression = _append_filter(filter_expression, 'AND', key_filter)
+
+    # Return the filter expression built after looping over the keys.
+    return filter_expression
+
+
+def render_expression(expression: str, attribute_names: dict = None, attribute_values: dict = None) -> str:
+    """
+    Render an expression in a readable form, with the placeholders replaced by their names and values.
+
+    For example "#F0 = :f0" with {"#F0": "make"} and {":f0": "Tesla"} renders as 'make = "Tesla"'.
+    """
+    if not expression:
+        return None
+    attribute_names = attribute_names or {}
+    attribute_values = attribute_values or {}
+
+    def replace_placeholder(match):
+        placeholder = match.group(0)
+        if placeholder in attribute_names:
+            return attribute_names[placeholder]
+        if placeholder in attribute_values:
+            return json.dumps(attribute_values[placeholder], default=str)
+        return placeholder
+
+    # A single pass, so names and values that look like placeholders (e.g. "ITEM#0") aren't replaced again
+    return re.sub(r'[#:]\w+', replace_placeholder, expression)
+
+
+def render_condition(condition, is_key_condition: bool = False) -> str:
+    """Render a boto3 Key or Attr condition in a readable form, see render_expression()."""
+    # A new builder for every condition: the builder numbers its placeholders and isn't thread-safe
+    built_expression = ConditionExpressionBuilder().build_expression(condition, is_key_condition=is_key_condition)
+    return render_expression(
+        built_expression.condition_expression,
+        built_expression.attribute_name_placeholders,
+        built_expression.attribute_value_placeholders,
+    )
+
+
+def cache_info() -> dict:
+    """Return the hit and miss counters of the expression caches."""
+    return {
+        'filter': _compile_canonical_filter.cache_info()._asdict(),
+        'projection': _compile_projection.cache_info()._asdict(),
+    }
+
+
+def _append_filter(source_filter, operation, additional_filter):
+    """Combine two Attr conditions with an AND or OR operator, where either of them can be None."""
+    if source_filter is None:
+        # This is the first addition to the filter, return
+        # the filter being added as-is.
+        return additional_filter
+    if additional_filter is None:
+        # We're trying to add nothing to the source filter
+        # so just return the source filter.
+        return source_filter
+    if operation == 'AND':
+        return source_filter & additional_filter
+    if operation == 'OR':
+        return source_filter | additional_filter
+    raise RuntimeError(f'Invalid operation: {operation}')
+
+
+@lru_cache(maxsize=EXPRESSION_CACHE_SIZE)
+def _compile_canonical_filter(filter_key: frozenset) -> dict:
+    """Compile a canonical filter key (see canonical_filter_key()) into DynamoDB expressions."""
+    # Group the (key, operation, values) entries by key again, in a stable order
+    filter_dict = {}
+    for filter_key_name, filter_op, filter_op_values in sorted(filter_key, key=lambda entry: entry[:2]):
+        if filter_op in FILTER_OPERATIONS:
+            filter_dict.setdefault(filter_key_name, {})[filter_op] = sorted(filter_op_values, key=repr)
+    if not filter_dict:
+        return None
+
+    expression_attribute_names = {}
+    # Every distinct value gets one placeholder, even if it's used by multiple filters
+    value_placeholders = {}
+
+    def value_placeholder(filter_op_value) -> str:
+        return value_placeholders.setdefault(filter_op_value, f':f{len(value_placeholders)}')
+
+    key_expressions = []
+    for filter_key_index, (filter_key_name, filter_values) in enumerate(filter_dict.items()):
+        # Like the ProjectionExpression, the names are numbered references (#F0, #F1, ...), so
+        # reserved words like 'Region' can be filtered on.
+        name_placeholder = f'#F{filter_key_index}'
+        expression_attribute_names[name_placeholder] = filter_key_name
+
+        operation_expressions = []
+        for filter_op, filter_op_values in filter_values.items():
+            condition_template, join_operator = FILTER_OPERATIONS[filter_op]
+
+            operation_expressions.append(_group([
+                condition_template.format(name=name_placeholder, value=value_placeholder(filter_op_value))
+                for filter_op_value in filter_op_values
+            ], join_operator))
+
+        key_expressions.append(_group(operation_expressions, ' AND '))
+
+    return {
+        'FilterExpression': ' AND '.join(key_expressions),
+        'ExpressionAttributeNames': expression_attribute_names,
+        'ExpressionAttributeValues': {
+            placeholder: filter_op_value for filter_op_value, placeholder in value_placeholders.items()
+        },
+    }
+
+
+def _group(expressions: list, join_operator: str) -> str:
+    """Join expressions with an operator, in parentheses if there's more than one."""
+    # DynamoDB rejects an expression with redundant parentheses, like (#F0 = :f0)
+    if len(expressions) == 1:
+        return expressions[0]
+    return f'({join_operator.join(expressions)})'
+
+
+@lru_cache(maxsize=EXPRESSION_CACHE_SIZE)
+def _compile_projection(selection_set: tuple) -> dict:
+    """Compile a tuple of attributes into a ProjectionExpression and ExpressionAttributeNames."""
+    # The ProjectionExpression can't contain words like 'Region', so we use numbered references.
+    return {
+        'ProjectionExpression': ', '.join(f'#K{index}' for index in range(len(selection_set))),
+        'ExpressionAttributeNames': {
+            f'#K{index}': selection_key for index, selection_key in enumerate(selection_set)
+        },
+    }
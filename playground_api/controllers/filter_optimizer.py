@@ -0,0 +1,141 @@
+"""
+The filter_optimizer module simplifies client filters before they're sent to DynamoDB.
+
+Clients send filters with duplicate values, redundant terms or predicates that contradict each
+other. The optimizer removes what doesn't change the result and detects filters that can never
+match, so get_items() can return an empty page without reading anything.
+"""
+# Standard library imports
+# -
+
+# Related third party imports
+# -
+
+# Local application/library specific imports
+# -
+
+# The attributes of the Continent enum type in schema.graphql, per item type
+ENUM_ATTRIBUTES = {
+    'car': {
+        'continentOfOrigin': {
+            'AFRICA',
+            'ANTARCTICA',
+            'ASIA',
+            'AUSTRALIA',
+            'EUROPE',
+            'NORTHAMERICA',
+            'SOUTHAMERICA',
+        },
+    },
+}
+
+
+def optimize_filter(item_type: str, filter_dict: dict) -> tuple:
+    """
+    Optimize a filter (see build_filter_condition() of controllers/expression_compiler.py) for an item type.
+
+    Returns a tuple of the optimized filter and whether that filter can match any item at all.
+    The optimized filter only contains keys and operations that actually filter something.
+    """
+    optimized_filter = {}
+    for filter_key, filter_values in (filter_dict or {}).items():
+        valid_values = ENUM_ATTRIBUTES.get(item_type, {}).get(filter_key)
+        optimized_values, can_match = _optimize_key_filter(filter_values, valid_values)
+        if not can_match:
+            return None, False
+        if optimized_values:
+            optimized_filter[filter_key] = optimized_values
+    return optimized_filter, True
+
+
+def _optimize_key_filter(filter_values: dict, valid_values: set = None) -> tuple:
+    """
+    Optimize the operations on a single key, e.g. {"equalsOr": ["Tesla"], "notEquals": ["Tesla"]}.
+
+    `valid_values` are the values an enum attribute can have. Returns a tuple of the
+    optimized operations and whether they can match any item.
+    """
+    # Remove duplicate values, but keep the order the client provided
+    operations = {
+        filter_op: list(dict.fromkeys(filter_op_values))
+        for filter_op, filter_op_values in filter_values.items()
+        if filter_op_values
+    }
+
+    if valid_values is not None:
+        # An enum attribute never equals a value outside the enum
+        if 'notEquals' in operations:
+            operations['notEquals'] = [value for value in operations['notEquals'] if value in valid_values]
+        if 'equalsOr' in operations:
+            operations['equalsOr'] = [value for value in operations['equalsOr'] if value in valid_values]
+            if not operations['equalsOr']:
+                return None, False
+
+    # A term that contains another term is redundant: for notContains, excluding the shorter term
+    # excludes the longer one, and for containsOr, the shorter term matches whenever the longer one does.
+    for filter_op in ('notContains', 'containsOr'):
+        if filter_op in operations:
+            operations[filter_op] = _remove_containing_terms(operations[filter_op])
+
+    # For containsAnd it's the other way around: a term that's part of another term is redundant.
+    if 'containsAnd' in operations:
+        operations['containsAnd'] = [
+            term for term in operations['containsAnd']
+            if not any(term != other_term and _contains(other_term, term) for other_term in operations['containsAnd'])
+        ]
+
+    excluded_terms = operations.get('notContains', [])
+    # containsAnd can't match if one of its terms contains an excluded term
+    if any(
+        _contains(term, excluded_term)
+        for term in operations.get('containsAnd', [])
+        for excluded_term in excluded_terms
+    ):
+        return None, False
+    # A containsOr term that contains an excluded term can never be the one that matches
+    if 'containsOr' in operations:
+        operations['containsOr'] = [
+            term for term in operations['containsOr']
+            if not any(_contains(term, excluded_term) for excluded_term in excluded_terms)
+        ]
+        if not operations['containsOr']:
+            return None, False
+
+    if 'equalsOr' in operations:
+        # With equalsOr, the attribute is one of a known set of values. Every other operation
+        # can be evaluated for those values right now, leaving only the values that can match.
+        remaining_values = [
+            value for value in operations['equalsOr']
+            if _value_matches(value, operations)
+        ]
+        if not remaining_values:
+            return None, False
+        return {'equalsOr': remaining_values}, True
+
+    return {filter_op: filter_op_values for filter_op, filter_op_values in operations.items() if filter_op_values}, True
+
+
+def _value_matches(value, operations: dict) -> bool:
+    """Return whether an attribute with the given value matches all operations except equalsOr."""
+    if value in operations.get('notEquals', []):
+        return False
+    if any(_contains(value, term) for term in operations.get('notContains', [])):
+        return False
+    if not all(_contains(value, term) for term in operations.get('containsAnd', [])):
+        return False
+    if operations.get('containsOr') and not any(_contains(value, term) for term in operations['containsOr']):
+        return False
+    return True
+
+
+def _remove_containing_terms(terms: list) -> list:
+    """Remove the terms that contain one of the other terms."""
+    return [
+        term for term in terms
+        if not any(term != other_term and _contains(term, other_term) for other_term in terms)
+    ]
+
+
+def _contains(value, term) -> bool:
+    """Return whether a string value contains a term, like the DynamoDB contains() function."""
+    return isinstance(value, str) and isinstance(term, str) and term in value
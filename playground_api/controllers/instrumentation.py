@@ -0,0 +1,219 @@
+"""
+The instrumentation module measures the Lambda handlers and the DynamoDB calls they make.
+
+Every handler invocation emits a single log line in the CloudWatch embedded metric format (EMF).
+CloudWatch turns it into metrics with the GraphQL field name and the shape of the filter as
+dimensions: the handler latency, a cold start flag, the number and latency of DynamoDB calls,
+the consumed read and write capacity, the number of items DynamoDB read vs. returned, and the
+hits, misses and evictions of the result cache during the invocation.
+Set INVENTORY_METRICS=false to disable the instrumentation.
+"""
+# Standard library imports
+import json
+import os
+import sys
+import threading
+import time
+from functools import wraps
+
+# Related third party imports
+# -
+
+# Local application/library specific imports
+from controllers.result_cache import RESULT_CACHE
+
+METRICS_ENABLED = os.environ.get('INVENTORY_METRICS', 'true').lower() == 'true'
+METRICS_NAMESPACE = os.environ.get('INVENTORY_METRICS_NAMESPACE', 'GraphQLPlayground')
+
+# The name, unit and source attribute of every metric in the log line
+METRICS = [
+    ('HandlerLatency', 'Milliseconds', 'handler_latency'),
+    ('ColdStart', 'Count', 'cold_start'),
+    ('Errors', 'Count', 'errors'),
+    ('DynamoDBCalls', 'Count', 'dynamodb_calls'),
+    ('DynamoDBLatency', 'Milliseconds', 'dynamodb_latency'),
+    ('ConsumedReadCapacity', 'Count', 'read_capacity'),
+    ('ConsumedWriteCapacity', 'Count', 'write_capacity'),
+    ('ScannedCount', 'Count', 'scanned_count'),
+    ('ReturnedCount', 'Count', 'returned_count'),
+    ('ResultCacheHits', 'Count', 'result_cache_hits'),
+    ('ResultCacheMisses', 'Count', 'result_cache_misses'),
+    ('ResultCacheEvictions', 'Count', 'result_cache_evictions'),
+]
+
+WRITE_OPERATIONS = {'PutItem', 'UpdateItem', 'DeleteItem', 'BatchWriteItem', 'TransactWriteItems'}
+
+
+class InvocationMetrics:  # pylint: disable=too-many-instance-attributes
+    """The InvocationMetrics collect the metrics of a single handler invocation."""
+
+    def __init__(self, field_name: str, shape: str, cold_start: bool) -> None:
+        """Initialize the InvocationMetrics Class."""
+        self.field_name = field_name
+        self.filter_shape = shape
+        self.cold_start = int(cold_start)
+        self.errors = 0
+        self.handler_latency = 0.0
+        self.dynamodb_calls = 0
+        self.dynamodb_latency = 0.0
+        self.read_capacity = 0.0
+        self.write_capacity = 0.0
+        self.scanned_count = 0
+        self.returned_count = 0
+        self.result_cache_hits = 0
+        self.result_cache_misses = 0
+        self.result_cache_evictions = 0
+        self._lock = threading.Lock()
+
+    def record_call(self, operation: str, latency: float, parsed: dict) -> None:
+        """Record a DynamoDB call, its latency in milliseconds and its parsed response."""
+        consumed_capacity = parsed.get('ConsumedCapacity') or []
+        # Single-table operations return one ConsumedCapacity, batch operations a list
+        if isinstance(consumed_capacity, dict):
+            consumed_capacity = [consumed_capacity]
+        capacity_units = sum(capacity.get('CapacityUnits', 0.0) for capacity in consumed_capacity)
+
+        with self._lock:
+            self.dynamodb_calls += 1
+            self.dynamodb_latency += latency
+            if operation in WRITE_OPERATIONS:
+                self.write_capacity += capacity_units
+            else:
+                self.read_capacity += capacity_units
+            self.scanned_count += parsed.get('ScannedCount', 0)
+            self.returned_count += parsed.get('Count', 0)
+
+    def record_result_cache(self, stats_before: dict, stats_after: dict) -> None:
+        """Record the result cache activity between two snapshots of its stats()."""
+        self.result_cache_hits = stats_after['hits'] - stats_before['hits']
+        self.result_cache_misses = stats_after['misses'] - stats_before['misses']
+        self.result_cache_evictions = stats_after['evictions'] - stats_before['evictions']
+
+    def to_log_line(self) -> str:
+        """Return the metrics as a line in the CloudWatch embedded metric format."""
+        return json.dumps({
+            '_aws': {
+                'Timestamp': int(time.time() * 1000),
+                'CloudWatchMetrics': [{
+                    'Namespace': METRICS_NAMESPACE,
+                    'Dimensions': [['FieldName'], ['FieldName', 'FilterShape']],
+                    'Metrics': [{'Name': metric_name, 'Unit': unit} for metric_name, unit, _attribute in METRICS],
+                }],
+            },
+            'FieldName': self.field_name,
+            'FilterShape': self.filter_shape,
+            **{
+                metric_name: round(getattr(self, attribute), 3) for metric_name, _unit, attribute in METRICS
+            },
+        })
+
+
+class InvocationState:  # pylint: disable=too-few-public-methods
+    """The InvocationState holds the state of the handler invocations of a Lambda container."""
+
+    def __init__(self) -> None:
+        """Initialize the InvocationState Class."""
+        # True until the first invocation of this Lambda container has been measured
+        self.cold_start = True
+        # The metrics of the running invocation. A Lambda container handles one invocation at a
+        # time, but the InventoryController makes DynamoDB calls from multiple threads.
+        self.current_metrics = None
+
+
+# The state shared by all invocations of a Lambda container
+INVOCATION_STATE = InvocationState()
+
+
+def filter_shape(filter_dict: dict) -> str:
+    """
+    Return the shape of a filter: its operations per key, without the values.
+
+    For example {"make": {"equalsOr": ["Tesla"]}} has the shape "make:equalsOr".
+    """
+    if not filter_dict:
+        return 'none'
+    return ','.join(
+        f'{filter_key}:{"+".join(sorted(filter_values))}' for filter_key, filter_values in sorted(filter_dict.items())
+    )
+
+
+def instrument_handler(field_name: str):
+    """Return a decorator that measures a Lambda handler for the given GraphQL field."""
+
+    def decorator(handler):
+        if not METRICS_ENABLED:
+            return handler
+
+        @wraps(handler)
+        def instrumented_handler(event, context):
+            # A BatchInvoke request is a list of events, measured as a single invocation
+            first_event = event[0] if isinstance(event, list) and event else event
+            arguments = first_event.get('arguments', {}) if isinstance(first_event, dict) else {}
+            invocation_metrics = InvocationMetrics(
+                field_name, filter_shape(arguments.get('filter')), INVOCATION_STATE.cold_start
+            )
+            INVOCATION_STATE.current_metrics = invocation_metrics
+            INVOCATION_STATE.cold_start = False
+
+            # The counters of the result cache run for the lifetime of the container
+            result_cache_stats = RESULT_CACHE.stats()
+            started_at = time.perf_counter()
+            try:
+                response = handler(event, context)
+                # The handlers report failures in their response instead of raising them. The
+                # response of a BatchInvoke request is a list, with a response for every event.
+                invocation_metrics.errors += sum(
+                    isinstance(single_response, dict) and single_response.get('success') is False
+                    for single_response in (response if isinstance(response, list) else [response])
+                )
+                return response
+            except Exception:
+                invocation_metrics.errors += 1
+                raise
+            finally:
+                invocation_metrics.handler_latency = (time.perf_counter() - started_at) * 1000
+                invocation_metrics.record_result_cache(result_cache_stats, RESULT_CACHE.stats())
+                INVOCATION_STATE.current_metrics = None
+                # CloudWatch only extracts metrics from a line that is a JSON document on its own,
+                # so the line is written to stdout as-is instead of through the (prefixing) logger
+                sys.stdout.write(invocation_metrics.to_log_line() + '\n')
+                sys.stdout.flush()
+
+        return instrumented_handler
+
+    return decorator
+
+
+def instrument_client(client) -> None:
+    """
+    Measure all calls of a DynamoDB client, and request their consumed capacity.
+
+    The calls are recorded in the metrics of the running handler invocation, if there is one.
+    """
+    if not METRICS_ENABLED:
+        return
+    client.meta.events.register(
+        'before-parameter-build.dynamodb', _request_consumed_capacity, unique_id='inventory-metrics-capacity'
+    )
+    client.meta.events.register('before-call.dynamodb', _start_call, unique_id='inventory-metrics-start')
+    client.meta.events.register('after-call.dynamodb', _record_call, unique_id='inventory-metrics-record')
+
+
+def _request_consumed_capacity(params, model, **_kwargs):
+    """Return the consumed capacity with every operation that supports it."""
+    if 'ReturnConsumedCapacity' in model.input_shape.members:
+        params.setdefault('ReturnConsumedCapacity', 'TOTAL')
+
+
+def _start_call(context, **_kwargs):
+    """Store the start time of a call in its request context, which is passed on to after-call."""
+    context['metrics_started_at'] = time.perf_counter()
+
+
+def _record_call(parsed, model, context, **_kwargs):
+    """Record a finished call in the metrics of the running invocation."""
+    invocation_metrics = INVOCATION_STATE.current_metrics
+    if invocation_metrics is None or 'metrics_started_at' not in context:
+        return
+    latency = (time.perf_counter() - context['metrics_started_at']) * 1000
+    invocation_metrics.record_call(model.name, latency, parsed)
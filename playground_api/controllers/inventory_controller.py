@@ -1,256 +1,969 @@
 """The InventoryController module contains the InventoryController class."""
 # Standard library imports
-import base64
 import os
+import random
+import time
 import uuid
-from datetime import datetime
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+from itertools import repeat
 
 # Related third party imports
-import boto3
-from boto3.dynamodb.conditions import Key, Attr
+from boto3.dynamodb.conditions import Key
+from botocore.exceptions import BotoCoreError, ClientError
 
 # Local application/library specific imports
-# -
-
-
-class InventoryController:
+from controllers.api_cache import flush_api_cache
+from controllers.aws_clients import dynamodb_client, dynamodb_resource, dynamodb_table
+from controllers.client_engine import ClientTable
+from controllers.expression_compiler import canonical_filter_key, compile_projection_expression
+from controllers.filter_optimizer import optimize_filter
+from controllers.item_counters import (
+    COUNT_PARTITION_KEY,
+    VERSION_PARTITION_KEY,
+    counter_update,
+    item_counter_sort_keys,
+    total_count_sort_keys,
+)
+from controllers.item_loader import ItemLoader
+from controllers.ngram_index import (
+    build_ngram_entries,
+    item_matches_filter,
+    match_posting_lists,
+    ngram_filters,
+    page_candidates,
+    posting_list_keys,
+)
+from controllers.pagination import (
+    build_query_params,
+    decode_next_token,
+    encode_next_token,
+    merge_stream_responses,
+    project_items,
+    selected_item_attributes,
+    selects,
+)
+from controllers.query_diagnostics import QueryDiagnostics
+from controllers.result_cache import RESULT_CACHE
+from controllers.time_ordered_ids import is_ulid, new_ulid, parse_datetime, random_part, ulid_range
+
+
+class InventoryController:  # pylint: disable=too-many-instance-attributes
     """The InventoryController is reponsible for Inventory read and write operations."""
 
+    # Items used to be stored in a single partition with this partition key. It is still
+    # read when INVENTORY_LEGACY_PARTITION is enabled, until all rows have been migrated.
+    LEGACY_PARTITION_KEY = 'ITEM'
+
+    # BatchWriteItem accepts at most 25 put requests per call
+    BATCH_WRITE_SIZE = 25
+    # BatchGetItem accepts at most 100 keys per call
+    BATCH_GET_SIZE = 100
+    # How often unprocessed items or keys of a batch are retried before they're reported as failed
+    BATCH_MAX_RETRIES = 5
+    # The base delay in seconds for the jittered exponential backoff between retries
+    BATCH_BACKOFF_BASE = 0.05
+
+    # The maximum number of DynamoDB requests sent in parallel for a single operation
+    MAX_PARALLEL_REQUESTS = 16
+
+    # The string attributes clients can filter on per item type, see GetCarsFilter and GetBooksFilter
+    FILTERABLE_ATTRIBUTES = {
+        'car': ['make', 'model', 'color', 'continentOfOrigin', 'countryOfOrigin', 'licensePlate'],
+        'book': ['title', 'author'],
+    }
+    # The stream key used in the nextToken when items are read through the n-gram index
+    NGRAM_STREAM_KEY = 'NGRAM'
+
     def __init__(self) -> None:
-        self.inventory_table = boto3.resource('dynamodb').Table(
-            name=os.environ.get('INVENTORY_TABLE')
+        # The resource is shared by all invocations of the Lambda container, see aws_clients.
+        # INVENTORY_DYNAMODB_ENDPOINT points it to a local stand-in like DynamoDB Local.
+        self.dynamodb = dynamodb_resource()
+        self.inventory_table = dynamodb_table(os.environ.get('INVENTORY_TABLE'))
+        # The read paths (queries and BatchGetItem) run on the Table resource, or on the low-level
+        # client with a faster deserializer that returns ints and floats instead of Decimals.
+        self.read_engine = os.environ.get('INVENTORY_READ_ENGINE', 'resource').lower()
+        if self.read_engine == 'client':
+            self.read_table = self.read_resource = ClientTable(dynamodb_client(), self.inventory_table.name)
+        else:
+            self.read_table, self.read_resource = self.inventory_table, self.dynamodb
+        # Writes are spread over ITEM#0 .. ITEM#<shard_count - 1>, so we're not
+        # bound to the throughput limits of a single DynamoDB partition.
+        self.shard_count = int(os.environ.get('INVENTORY_SHARD_COUNT', '1'))
+        self.read_legacy_partition = os.environ.get('INVENTORY_LEGACY_PARTITION', 'false').lower() == 'true'
+        # DynamoDB applies the Limit before the FilterExpression, so a filtered page is often short.
+        # In fill mode we keep querying until the page is full or the read budget (the number of
+        # items read or the read capacity units consumed) runs out.
+        self.fill_pages = os.environ.get('INVENTORY_FILL_PAGES', 'true').lower() == 'true'
+        self.fill_read_budget_items = int(os.environ.get('INVENTORY_FILL_READ_BUDGET_ITEMS', '1000'))
+        self.fill_read_budget_rcu = float(os.environ.get('INVENTORY_FILL_READ_BUDGET_RCU', '50'))
+        # The attributes with a global secondary index named '<attribute>-index'. The index has the
+        # attribute as its partition key and SK as its sort key.
+        self.indexed_attributes = [
+            attribute for attribute in os.environ.get('INVENTORY_INDEXED_ATTRIBUTES', '').split(',') if attribute
+        ]
+        # Maintain an inverted index of n-grams for the containsAnd and containsOr filters
+        self.ngram_index = os.environ.get('INVENTORY_NGRAM_INDEX', 'false').lower() == 'true'
+        # Resolve those filters with the n-gram index. Items without index entries would not be
+        # found, so enable this after backfill_ngram_index of controllers/inventory_migrations.py.
+        self.ngram_index_reads = (
+            self.ngram_index and os.environ.get('INVENTORY_NGRAM_INDEX_READS', 'false').lower() == 'true'
         )
+        # New items get a time-ordered id (a ULID) instead of a random uuid4, so their sort keys are
+        # sorted by the time they were added. This enables the addedAfter, addedBefore and newestFirst
+        # arguments. Items added before are rewritten with controllers/inventory_migrations.py
+        self.time_ordered_ids = os.environ.get('INVENTORY_TIME_ORDERED_IDS', 'false').lower() == 'true'
+        # The QueryDiagnostics of the running _read_items() call, if the client selected them
+        self._diagnostics = None
+
+    def shard(self, item_id: str) -> int:
+        """Return the shard an item with the given id is stored in."""
+        # The shard is derived from the (random) uuid, or the random part of the ULID, so items are
+        # evenly spread over the shards and the shard of an item can always be derived from its id.
+        if is_ulid(item_id):
+            return random_part(item_id) % self.shard_count
+        return uuid.UUID(item_id).int % self.shard_count
+
+    def shard_partition_key(self, item_id: str) -> str:
+        """Return the partition key of the shard an item with the given id is stored in."""
+        return f'{self.LEGACY_PARTITION_KEY}#{self.shard(item_id)}'
+
+    def item_key(self, sort_key: str) -> dict:
+        """Return the primary key of the item with the given sort key, e.g. 'CAR#<uuid>'."""
+        return {
+            'PK': self.shard_partition_key(sort_key.split('#', 1)[1]),
+            'SK': sort_key,
+        }
 
-    def add_item(self, item_type: str, item: dict) -> dict:
-        """Add an item (Car or Book) to DynamoDB."""
-        item_uuid = str(uuid.uuid4())
+    def partition_keys(self) -> list:
+        """Return all the partition keys items can be stored in."""
+        partition_keys = [f'{self.LEGACY_PARTITION_KEY}#{shard}' for shard in range(self.shard_count)]
+        if self.read_legacy_partition:
+            partition_keys.append(self.LEGACY_PARTITION_KEY)
+        return partition_keys
+
+    def build_item(self, item_type: str, item: dict) -> dict:
+        """Build the DynamoDB item for a new item (Car or Book) provided by the client."""
+        date_added = datetime.now(timezone.utc)
+        item_id = new_ulid(date_added) if self.time_ordered_ids else str(uuid.uuid4())
 
         # Add a few common values (PK, SK, id, date), then store all the attributes
-        # provided by the client as-is.
-        item_data = {
-            'PK': 'ITEM',
-            'SK': f'{item_type.upper()}#{item_uuid}',  # e.g. CAR#1234 or BOOK#5411
-            'id': item_uuid,
-            'dateAdded': datetime.now().strftime('%Y-%m-%dT%H:%M:%S.%f')[:-3] + 'Z',
-            **item
+        # provided by the client as-is. Attributes without a value are left out: an
+        # index key attribute can't be NULL or an empty string.
+        return {
+            'PK': self.shard_partition_key(item_id),
+            'SK': f'{item_type.upper()}#{item_id}',  # e.g. CAR#1234 or BOOK#5411
+            'id': item_id,
+            'dateAdded': date_added.strftime('%Y-%m-%dT%H:%M:%S.%f')[:-3] + 'Z',
+            **{
+                item_key: item_value for item_key, item_value in item.items()
+                if item_value is not None and not (item_key in self.indexed_attributes and item_value == '')
+            }
         }
 
-        self.inventory_table.put_item(
-            Item=item_data
-        )
+    def add_item(self, item_type: str, item: dict) -> dict:
+        """
+        Add an item (Car or Book) to DynamoDB.
+
+        The item is stored in a single transaction with the updates of its counters and the version
+        of its type, so it's never stored without being counted (or counted without being stored).
+        The n-gram index entries are written first: entries of an item that doesn't exist are
+        skipped when the index is read.
+        """
+        item_data = self.build_item(item_type, item)
+        self.write_ngram_entries(item_type, [item_data])
+
+        table_name = self.inventory_table.name
+        self.dynamodb.meta.client.transact_write_items(TransactItems=[
+            {'Put': {'TableName': table_name, 'Item': item_data}},
+            *(
+                {'Update': {'TableName': table_name, **update_params}}
+                for update_params in self._counter_updates(item_type, [item_data])
+            ),
+        ])
+        flush_api_cache()
         return item_data
 
+    def add_items(self, item_type: str, items: list) -> list:
+        """
+        Add a list of items (Cars or Books) to DynamoDB with BatchWriteItem.
+
+        The items are written in chunks of 25, and the chunks are sent in parallel. Returns
+        a result for every item, in the same order as `items`. Each result looks like
+        {"success": True, "item": {...}} or {"success": False, "error_type": ..., "error": ...}.
+        """
+        items_data = [self.build_item(item_type, item) for item in items]
+        chunks = [
+            items_data[index:index + self.BATCH_WRITE_SIZE]
+            for index in range(0, len(items_data), self.BATCH_WRITE_SIZE)
+        ]
+        if not chunks:
+            return []
+
+        with ThreadPoolExecutor(max_workers=min(len(chunks), self.MAX_PARALLEL_REQUESTS)) as executor:
+            chunk_errors = executor.map(self._add_chunk, repeat(item_type), chunks)
+            # Combine the errors of all chunks into one dictionary of {SK: error}
+            errors = {
+                sort_key: error
+                for chunk_error in chunk_errors
+                for sort_key, error in chunk_error.items()
+            }
+        if len(errors) < len(items_data):
+            flush_api_cache()
+
+        results = []
+        for item_data in items_data:
+            error = errors.get(item_data['SK'])
+            if error:
+                results.append({
+                    'success': False,
+                    'error_type': type(error).__name__,
+                    'error': str(error),
+                })
+            else:
+                results.append({
+                    'success': True,
+                    'item': item_data,
+                })
+        return results
+
+    def _add_chunk(self, item_type: str, chunk: list) -> dict:
+        """
+        Add a chunk of at most 25 items with their n-gram index entries and counters.
+
+        The n-gram index entries are written first, like add_item() does. BatchWriteItem isn't
+        transactional, so the counters of the written items are updated afterwards. A failed
+        counter update doesn't fail the stored items: only their counters are off, and
+        backfill_counters of controllers/inventory_migrations.py recounts them. Returns a
+        dictionary of {SK: exception} for the items that could not be written.
+        """
+        try:
+            self.write_ngram_entries(item_type, chunk)
+        except (BotoCoreError, ClientError) as exc:
+            # None of the items have been written yet
+            return {item_data['SK']: exc for item_data in chunk}
+
+        errors = self._batch_write_chunk(chunk)
+        written_items = [item_data for item_data in chunk if item_data['SK'] not in errors]
+        try:
+            self.update_counters(item_type, written_items)
+        except (BotoCoreError, ClientError) as exc:
+            print(f'Failed to count {len(written_items)} added {item_type} items: {exc}')
+        return errors
+
+    def _batch_write_chunk(self, chunk: list) -> dict:
+        """
+        Write a chunk of at most 25 items with BatchWriteItem.
+
+        Items DynamoDB could not process (e.g. because of throttling) are retried with a jittered
+        exponential backoff. Returns a dictionary of {SK: exception} for the items that could
+        not be written.
+        """
+        table_name = self.inventory_table.name
+        request_items = {
+            table_name: [{'PutRequest': {'Item': item_data}} for item_data in chunk]
+        }
+
+        for attempt in range(self.BATCH_MAX_RETRIES + 1):
+            if attempt:
+                # Full jitter: sleep a random time between 0 and the exponential backoff delay
+                time.sleep(random.uniform(0, self.BATCH_BACKOFF_BASE * 2 ** attempt))
+            try:
+                ddb_response = self.dynamodb.batch_write_item(RequestItems=request_items)
+            except Exception as exc:  # pylint: disable=broad-except
+                # The whole chunk failed, e.g. because of a validation error
+                return {request['PutRequest']['Item']['SK']: exc for request in request_items[table_name]}
+
+            request_items = ddb_response.get('UnprocessedItems')
+            if not request_items:
+                return {}
+
+        return {
+            request['PutRequest']['Item']['SK']: RuntimeError('Item was not processed by DynamoDB after retrying')
+            for request in request_items[table_name]
+        }
+
+    def build_ngram_entries(self, item_type: str, item_data: dict) -> list:
+        """Build the n-gram index entries for the filterable attributes of an item, see controllers/ngram_index.py."""
+        return build_ngram_entries(item_type, item_data, self.FILTERABLE_ATTRIBUTES.get(item_type, []))
+
+    def write_ngram_entries(self, item_type: str, items_data: list) -> None:
+        """Write the n-gram index entries for the given items, if the n-gram index is enabled."""
+        if not self.ngram_index:
+            return
+        # The batch writer sends the entries in batches of 25 and retries unprocessed items
+        with self.inventory_table.batch_writer() as batch:
+            for item_data in items_data:
+                for ngram_entry in self.build_ngram_entries(item_type, item_data):
+                    batch.put_item(Item=ngram_entry)
+
+    def batch_get_items(self, sort_keys: list, projection_params: dict = None) -> list:
+        """
+        Get the items with the given sort keys with BatchGetItem.
+
+        The keys are requested in parallel chunks of 100. With INVENTORY_LEGACY_PARTITION enabled,
+        every item is also requested from the legacy partition, where it is until it has been
+        migrated. `projection_params` can contain a ProjectionExpression and ExpressionAttributeNames,
+        which must include the sort key. Items that don't exist are left out, the other items are
+        returned once, in no particular order.
+        """
+        keys = [self.item_key(sort_key) for sort_key in sort_keys]
+        if self.read_legacy_partition:
+            keys.extend({'PK': self.LEGACY_PARTITION_KEY, 'SK': sort_key} for sort_key in sort_keys)
+        chunks = [
+            keys[index:index + self.BATCH_GET_SIZE]
+            for index in range(0, len(keys), self.BATCH_GET_SIZE)
+        ]
+        if not chunks:
+            return []
+
+        with ThreadPoolExecutor(max_workers=min(len(chunks), self.MAX_PARALLEL_REQUESTS)) as executor:
+            chunk_items = executor.map(self._batch_get_chunk, chunks, repeat(projection_params))
+            # While an item is being migrated, it's briefly stored in both partitions
+            return list({item['SK']: item for items in chunk_items for item in items}.values())
+
+    def item_loader(self, item_types: list, selection_set: list = None) -> ItemLoader:
+        """
+        Return a new ItemLoader that looks up items of the given types by id.
+
+        With a `selection_set` (e.g. ['id', 'make']), only those attributes are fetched, with the
+        same ProjectionExpression as a query. The itemType and __typename aren't stored, the
+        loader adds them to every item.
+        """
+        projection_params = None
+        if selection_set is not None:
+            projection_params = compile_projection_expression([
+                attribute for attribute in selection_set if attribute not in ('itemType', '__typename')
+            ] + ['SK'])
+        return ItemLoader(self, item_types, projection_params)
+
+    def _batch_get_chunk(self, keys: list, projection_params: dict = None) -> list:
+        """
+        Get a chunk of at most 100 items (by their primary keys) with BatchGetItem.
+
+        Keys DynamoDB could not process (e.g. because of throttling) are retried with a jittered
+        exponential backoff. Raises a RuntimeError if keys are still unprocessed after retrying.
+        """
+        table_name = self.inventory_table.name
+        request_items = {
+            table_name: {
+                'Keys': keys,
+                **(projection_params or {})
+            }
+        }
+
+        items = []
+        for attempt in range(self.BATCH_MAX_RETRIES + 1):
+            if attempt:
+                # Full jitter: sleep a random time between 0 and the exponential backoff delay
+                time.sleep(random.uniform(0, self.BATCH_BACKOFF_BASE * 2 ** attempt))
+            ddb_response = self.read_resource.batch_get_item(RequestItems=request_items, ReturnConsumedCapacity='TOTAL')
+            self._record_diagnostics(ddb_response)
+            items.extend(ddb_response['Responses'].get(table_name, []))
+
+            request_items = ddb_response.get('UnprocessedKeys')
+            if not request_items:
+                return items
+
+        raise RuntimeError('Keys were not processed by DynamoDB after retrying')
+
+    def counter_increments(self, item_type: str, items_data: list) -> dict:
+        """
+        Return how much every item counter increases when the given items are added.
+
+        The increments are keyed by the primary key of the counter, as a (PK, SK) tuple,
+        e.g. {("COUNT#3", "CAR"): 2, ("COUNT#3", "CAR#continentOfOrigin#EUROPE"): 1}.
+        """
+        increments = {}
+        for item_data in items_data:
+            counter_partition_key = f'{COUNT_PARTITION_KEY}#{self.shard(item_data["id"])}'
+            for counter_sort_key in item_counter_sort_keys(item_type, item_data):
+                counter_key = (counter_partition_key, counter_sort_key)
+                increments[counter_key] = increments.get(counter_key, 0) + 1
+        return increments
+
+    def update_counters(self, item_type: str, items_data: list) -> None:
+        """
+        Count the given (stored) items in the item counters, and increment the version counter.
+
+        Every counter is updated with a single ADD, outside of a transaction (unlike the counters
+        of add_item()): the counters are exact unless an update fails after its items have been
+        stored. Run backfill_counters of controllers/inventory_migrations.py to recount them.
+        """
+        if not items_data:
+            return
+        for update_params in self._counter_updates(item_type, items_data):
+            self.inventory_table.update_item(**update_params)
+
+    def _counter_updates(self, item_type: str, items_data: list) -> list:
+        """Return the updates that increment the version of an item type and count the given items."""
+        # Any version counter will do, the version is the sum of all of them
+        version_partition_key = f'{VERSION_PARTITION_KEY}#{random.randrange(self.shard_count)}'
+        return [counter_update(version_partition_key, item_type.upper(), 'version', 1)] + [
+            counter_update(partition_key, sort_key, 'itemCount', increment)
+            for (partition_key, sort_key), increment in self.counter_increments(item_type, items_data).items()
+        ]
+
+    def read_total_count(self, item_type: str, filter_parameters: dict):
+        """
+        Return the number of items matching an (optimized) filter from the item counters.
+
+        Returns None if the filter can't be served from the counters, see total_count_sort_keys().
+        """
+        counter_sort_keys = total_count_sort_keys(item_type, filter_parameters)
+        if counter_sort_keys is None:
+            return None
+        return self._sum_counters(COUNT_PARTITION_KEY, counter_sort_keys, 'itemCount')
+
+    def _sum_counters(self, partition_key_prefix: str, sort_keys: list, attribute: str,
+                      consistent_read: bool = False) -> int:
+        """Return the sum of the counters with the given sort keys, over all shards."""
+        counter_keys = [
+            {'PK': f'{partition_key_prefix}#{shard}', 'SK': sort_key}
+            for sort_key in sort_keys
+            for shard in range(self.shard_count)
+        ]
+        projection_params = {
+            'ProjectionExpression': '#counter',
+            'ExpressionAttributeNames': {'#counter': attribute},
+            'ConsistentRead': consistent_read,
+        }
+        counters = [
+            counter
+            for index in range(0, len(counter_keys), self.BATCH_GET_SIZE)
+            for counter in self._batch_get_chunk(counter_keys[index:index + self.BATCH_GET_SIZE], projection_params)
+        ]
+        return sum(int(counter[attribute]) for counter in counters)
+
+    def increment_version(self, item_type: str) -> None:
+        """Increment the version of an item type, which invalidates its cached results."""
+        # Without items, the version counter is the only update
+        self.inventory_table.update_item(**self._counter_updates(item_type, [])[0])
+
+    def read_version(self, item_type: str) -> int:
+        """
+        Return the version of an item type, or 0 if no items have been added yet.
+
+        The version is read with strongly consistent reads: an eventually consistent read can miss
+        the increment of an item that was just added, and serve the cached result without it.
+        """
+        return self._sum_counters(VERSION_PARTITION_KEY, [item_type.upper()], 'version', consistent_read=True)
+
     def get_items(self, params: dict) -> dict:
-        """Get items from the inventory"""
+        """
+        Get items from the inventory, from the result cache if the item type hasn't changed.
 
+        Reading the version counters of the item type is a single small BatchGetItem, which replaces
+        a full query whenever the same page was requested before at the same version.
+        """
+        if not RESULT_CACHE.enabled:
+            return self._with_result_cache_status(self._read_items(params), 'DISABLED')
+
+        # The key contains the canonical filter, the selection set and all other arguments,
+        # like the item type, limit and nextToken.
+        selection_set = params.get('selection_set')
+        cache_key = (
+            canonical_filter_key(params.get('filter')),
+            tuple(sorted(selection_set)) if selection_set is not None else None,
+            tuple(sorted(
+                (param_key, param_value) for param_key, param_value in params.items()
+                if param_key not in ('filter', 'selection_set')
+            )),
+        )
+
+        version = self.read_version(params['item_type'])
+        cached_result = RESULT_CACHE.get(cache_key, version)
+        if cached_result is not None:
+            # The diagnostics describe the call that read the cached result
+            return self._with_result_cache_status(cached_result, 'HIT')
+
+        result = self._read_items(params)
+        RESULT_CACHE.put(cache_key, version, result)
+        return self._with_result_cache_status(result, 'MISS')
+
+    @staticmethod
+    def _with_result_cache_status(result: dict, status: str) -> dict:
+        """Return a copy of a result, with the result cache status in its diagnostics (if selected)."""
+        result = dict(result)
+        if 'diagnostics' in result:
+            result['diagnostics'] = {**result['diagnostics'], 'resultCache': status}
+        return result
+
+    def _read_items(self, params: dict) -> dict:
+        """Read a page of items from the inventory, with its total count if the client selected it."""
+        item_type = params['item_type']
+        selection_set = params.get('selection_set', [])
+
+        # When the client selects the diagnostics, every DynamoDB response of this call is recorded
+        # in them, together with the access path and the expressions that were used.
+        self._diagnostics = QueryDiagnostics() if selects(selection_set, 'diagnostics') else None
+
+        # Remove duplicate and redundant predicates from the filter. If the filter can never
+        # match (e.g. equalsOr: ["Tesla"] with notEquals: ["Tesla"]), don't query DynamoDB at all.
+        filter_parameters, can_match = optimize_filter(item_type, params.get('filter'))
+
+        # The range of sort keys of the items added between addedAfter and addedBefore, which
+        # is queried with a key condition instead of a filter. None when the range is empty.
+        sort_key_range = self._sort_key_range(item_type, params.get('addedAfter'), params.get('addedBefore'))
+
+        if not can_match or sort_key_range is None:
+            result = {
+                'items': [],
+                'resultCount': 0,
+                'nextToken': None,
+            }
+            if 'totalCount' in selection_set:
+                result['totalCount'] = 0
+            return self._attach_diagnostics(result)
+
+        result = self._read_page(params, filter_parameters, sort_key_range)
+
+        # The total count is served from the item counters, and only read if the client asks for it.
+        # The counters count the items of all time, so there's no total count within a time range.
+        if 'totalCount' in selection_set:
+            result['totalCount'] = None if sort_key_range else self.read_total_count(item_type, filter_parameters)
+        return self._attach_diagnostics(result)
+
+    def _read_page(self, params: dict, filter_parameters: dict, sort_key_range) -> dict:
+        """
+        Read the page of items matching an (optimized) filter, with its resultCount and nextToken.
+
+        The page is read through the n-gram index, counted with Select=COUNT queries when the client
+        doesn't select any items, or filled from the streams of the access path.
+        """
         item_type = params['item_type']
-        filter_parameters = params.get('filter')  # Optional, might return None
         limit = params.get('limit')  # Optional, might return None
-        next_token = params.get('nextToken')  # Optional, might return None
 
-        # Set up the basic parameters for the DynamoDB Query. The primary key
-        # always contains the partition key 'ITEM' and the sort key starts
-        # with CAR or BOOK, depending on what we're retrieving.
-        query_params = {
-            'KeyConditionExpression':
-                Key('PK').eq('ITEM') &
-                Key('SK').begins_with(f'{item_type.upper()}#')
+        # Decide how to read the items: from all shards of the table, from an index when the
+        # filter contains an equalsOr on an indexed attribute, or from the n-gram index when it
+        # contains a containsAnd or containsOr. For an index, the equalsOr is resolved by the
+        # key condition and removed from the filter.
+        stream_keys, filter_parameters = self._plan_query(item_type, filter_parameters)
+        if self._diagnostics is not None:
+            self._diagnostics.describe_plan(stream_keys, self.NGRAM_STREAM_KEY)
+
+        # When the client doesn't select any items (e.g. only resultCount and nextToken), the items
+        # only have to be counted. With a countBudget (or without a limit), DynamoDB counts them with
+        # Select=COUNT, without returning them. Otherwise the limit still applies: a page is read
+        # like any other page (with only the sort keys), and its items are counted.
+        items_selected = 'selection_set' not in params or selects(params['selection_set'], 'items')
+        count_only = not items_selected and (params.get('countBudget') is not None or not limit)
+
+        query_params, selection_set = build_query_params(params, filter_parameters, count_only)
+        if self._diagnostics is not None and stream_keys != [self.NGRAM_STREAM_KEY]:
+            self._diagnostics.describe_request(query_params)
+
+        # If the user provides a next_token, decode it into a cursor per stream. Streams that
+        # have been read completely are not part of the token and won't be queried again.
+        if params.get('nextToken'):
+            cursors = decode_next_token(params['nextToken'])
+        else:
+            cursors = {stream_key: None for stream_key in stream_keys}
+
+        if stream_keys == [self.NGRAM_STREAM_KEY]:
+            # The contains-filters are resolved with the n-gram index instead of a Query. The
+            # candidates are verified against the filter, so they're fetched even when only counting.
+            items, next_cursors = self._read_ngram_page(
+                item_type, filter_parameters, cursors, selection_set=selection_set,
+                limit=None if count_only else limit, sort_key_range=sort_key_range,
+                newest_first=bool(params.get('newestFirst')),
+            )
+            result_count = len(items)
+        elif count_only:
+            items = []
+            result_count, next_cursors = self._count_items(
+                item_type, query_params, cursors, params.get('countBudget'), sort_key_range
+            )
+        else:
+            items, next_cursors = self._fill_page(item_type, query_params, cursors, limit, sort_key_range)
+            result_count = len(items)
+
+        return {
+            # The sort key (and the filtered attributes, for the n-gram index) were only projected
+            # for internal use. Only return the attributes the client selected.
+            'items': project_items(items, selection_set) if items_selected else [],
+            'resultCount': result_count,
+            'nextToken': encode_next_token(next_cursors),
+        }
+
+    def get_inventory(self, params: dict) -> dict:
+        """
+        Get the items of all item types, sorted by the time they were added.
+
+        Every shard of every item type is a stream, e.g. 'car:ITEM#2'. A page is read in a single
+        round that queries all streams in parallel. The streams are merged with a heap on their
+        time-ordered ids: a ULID starts with its dateAdded timestamp, so this is the dateAdded order
+        (items added in the same millisecond are ordered by the random part of their id). The
+        nextToken holds the position in every stream, and with it the position in every item type.
+        """
+        if not self.time_ordered_ids:
+            raise ValueError('getInventory requires time-ordered ids (INVENTORY_TIME_ORDERED_IDS)')
+
+        limit = params.get('limit')  # Optional, might return None
+        newest_first = bool(params.get('newestFirst'))
+
+        # The range of sort keys of every item type, see _read_items()
+        sort_key_ranges = {
+            item_type: self._sort_key_range(item_type, params.get('addedAfter'), params.get('addedBefore'))
+            for item_type in self.FILTERABLE_ATTRIBUTES
         }
+        if None in sort_key_ranges.values():
+            return {'items': [], 'resultCount': 0, 'nextToken': None}
 
-        # If get_items() is called with a list of attributes to return, build a ProjectionExpression.
-        # This reduces the amount of data retrieved from DynamoDB to what we're actually requesting.
+        query_params = {'ReturnConsumedCapacity': 'TOTAL'}
+        selection_set = None
         if 'selection_set' in params:
-            # `selection_set` looks like this:
-            # [
-            #     "resultCount",
-            #     "nextToken",
-            #     "items",
-            #     "items/id",
-            #     "items/make",
-            #     "items/model",
-            #     "items/color",
-            #     "items/continentOfOrigin",
-            #     "items/countryOfOrigin"
-            # ]
-
-            # We only want the selection set items with the prefix 'items/', and we want the prefix stripped.
-            selection_set = [
-                set_item[len('items/'):] for set_item in params['selection_set'] if set_item.startswith('items/')
-            ]
-
-            # Build a ProjectionExpression and ExpressionAttributeNames with the provided selection set,
-            # then store them in the parameters provided to the DynamoDB Query.
-            projection_expression = self._build_projection_expression(selection_set)
-            query_params['ProjectionExpression'] = projection_expression['projection_expression']
-            query_params['ExpressionAttributeNames'] = projection_expression['expression_attribute_names']
-
-        # If the user provides filter parameters, build a FilterExpression with them
-        # and provide it to the query. This filter will be applied after the query has retrieved
-        # its results from DynamoDB.
-        filter_expression = self._build_query_filter_expression(filter_parameters)
-        if filter_expression:
-            query_params['FilterExpression'] = filter_expression
-
-        # If the user provides a limit, pass that limit on to the DynamoDB Query
+            # Every item type projects the selected attributes, whether it has them or not. The
+            # itemType and __typename are derived from the stream, they're not stored.
+            selection_set = selected_item_attributes(params['selection_set'], ('itemType', '__typename'))
+            query_params.update(compile_projection_expression(selection_set + ['SK']))
+            selection_set += ['itemType', '__typename']
         if limit:
             query_params['Limit'] = limit
+        if newest_first:
+            query_params['ScanIndexForward'] = False
+
+        if params.get('nextToken'):
+            cursors = decode_next_token(params['nextToken'])
+        else:
+            cursors = {
+                f'{item_type}:{partition_key}': None
+                for item_type in self.FILTERABLE_ATTRIBUTES
+                for partition_key in self.partition_keys()
+            }
 
-        # If the user provides a next_token, decode it and pass it to the DynamoDB Query
-        if next_token:
-            decoded_next_token = base64.b64decode(next_token.encode()).decode()
-            query_params['ExclusiveStartKey'] = {
-                'PK': 'ITEM',
-                'SK': f'{item_type.upper()}#{decoded_next_token}'
+        def query_stream(stream_key):
+            item_type, partition_key = stream_key.split(':', 1)
+            stream_query_params = {
+                **self._stream_query_params(
+                    item_type, partition_key, cursors[stream_key], sort_key_ranges[item_type]
+                ),
+                **query_params,
             }
+            return self.read_table.query(**stream_query_params)
+
+        stream_responses = {}
+        if cursors:
+            with ThreadPoolExecutor(max_workers=min(len(cursors), self.MAX_PARALLEL_REQUESTS)) as executor:
+                stream_responses = dict(zip(cursors, executor.map(query_stream, cursors)))
+
+        # Merge on the id, the part of the sort key after the item type (e.g. CAR#<id>)
+        items, next_cursors = merge_stream_responses(
+            stream_responses, limit, newest_first, merge_key=lambda sort_key: sort_key.split('#', 1)[1]
+        )
+        # The cutoff is the sort key of an item of any type. Every stream continues after the
+        # same id, with the sort key prefix of its own item type.
+        next_cursors = {
+            stream_key: f"{stream_key.split(':', 1)[0].upper()}#{cursor.split('#', 1)[1]}"
+            for stream_key, cursor in next_cursors.items()
+        }
 
-        # Execute the query and retrieve the items
-        ddb_response = self.inventory_table.query(**query_params)
-        items = ddb_response['Items']
+        for item in items:
+            item_type = item['SK'].split('#', 1)[0].lower()
+            # AppSync resolves the type of an Item interface result with its __typename
+            item['__typename'] = item_type.capitalize()
+            item['itemType'] = item_type
+        items = project_items(items, selection_set)
 
-        last_evaluated_key_b64 = None
-        last_evaluated_key = ddb_response.get('LastEvaluatedKey')
-        if last_evaluated_key:
-            # Grab the Sort Key and base64 encode it. This can be used by the client as
-            # a `nextToken`, which will tell DynamoDB where to continue its next Query.
-            last_evaluated_key_b64 = base64.b64encode(last_evaluated_key['SK'].encode()).decode()
         return {
             'items': items,
             'resultCount': len(items),
-            'nextToken': last_evaluated_key_b64
+            'nextToken': encode_next_token(next_cursors),
         }
 
-    @staticmethod
-    def _build_projection_expression(selection_set: list) -> dict:
-        """Build a ProjectionExpression and ExpressionAttributeNames for the provided set of GraphQL fields."""
-        # The ProjectionExpression can't contain words like 'Region', so we use numbered references.
-        # After building, the ProjectionExpression looks like this: "#K0, #K1"
-        projection_expression = ', '.join(
-            f'#K{index}' for index in range(len(selection_set))
-        )
+    def _attach_diagnostics(self, result: dict) -> dict:
+        """Add the diagnostics of the running _read_items() call to its result, if they were selected."""
+        if self._diagnostics is not None:
+            result['diagnostics'] = self._diagnostics.result()
+            self._diagnostics = None
+        return result
+
+    def _record_diagnostics(self, ddb_response: dict, key_condition=None) -> None:
+        """Add a DynamoDB response to the diagnostics of the running _read_items() call, if any."""
+        if self._diagnostics is not None:
+            self._diagnostics.record(ddb_response, key_condition)
+
+    def _fill_page(  # pylint: disable=too-many-arguments
+        self,
+        item_type: str,
+        query_params: dict,
+        cursors: dict,
+        limit: int = None,
+        sort_key_range: tuple = None,
+    ) -> tuple:
+        """
+        Read a page of at most `limit` items, starting at the given cursors.
 
-        # Then we create a map to link the #Kx values to the actual keys we want to resolve.
-        # The final ExpressionAttributeNames look like this: {"#K0": "make", "#K1": "model"}
-        expression_attribute_names = {
-            f'#K{index}': selection_key for index, selection_key in enumerate(selection_set)
-        }
+        Every round queries all streams at the same time and merges their results by sort key. In
+        fill mode, rounds are repeated until `limit` items have been collected, all streams have
+        been read, or the read budget runs out. The returned cursors point exactly after the
+        last item returned (or after the last item read, if none of the remaining items matched).
+        """
+        items = []
+        read_items = 0
+        consumed_rcu = 0.0
+        newest_first = query_params.get('ScanIndexForward') is False
+        while True:
+            remaining_limit = limit - len(items) if limit else None
+            stream_responses = self._query_streams(item_type, query_params, cursors, sort_key_range)
+            round_items, cursors = merge_stream_responses(stream_responses, remaining_limit, newest_first)
+            items.extend(round_items)
+
+            read_items += sum(response['ScannedCount'] for response in stream_responses.values())
+            consumed_rcu += sum(
+                response.get('ConsumedCapacity', {}).get('CapacityUnits', 0)
+                for response in stream_responses.values()
+            )
+
+            if not self.fill_pages or not limit or len(items) >= limit or not cursors:
+                return items, cursors
+            if read_items >= self.fill_read_budget_items or consumed_rcu >= self.fill_read_budget_rcu:
+                return items, cursors
+
+    def _count_items(  # pylint: disable=too-many-arguments
+        self,
+        item_type: str,
+        query_params: dict,
+        cursors: dict,
+        count_budget: int = None,
+        sort_key_range: tuple = None,
+    ) -> tuple:
+        """
+        Count the matching items in every stream with Select=COUNT queries.
 
-        return {
-            'projection_expression': projection_expression,
-            'expression_attribute_names': expression_attribute_names
+        Without a `count_budget`, every stream is queried once (DynamoDB reads up to 1 MB per query).
+        With a budget, the streams are paged through until they've been read completely or the
+        number of items read reaches the budget. The remaining budget is divided over the streams
+        as their Limit. Returns the count and the cursors to continue counting from. The streams
+        are counted independently, so no merging is needed.
+        """
+        item_count = 0
+        read_items = 0
+        while cursors:
+            round_query_params = query_params
+            if count_budget:
+                round_query_params = {
+                    **query_params,
+                    'Limit': max(1, (count_budget - read_items) // len(cursors)),
+                }
+            stream_responses = self._query_streams(item_type, round_query_params, cursors, sort_key_range)
+            item_count += sum(response['Count'] for response in stream_responses.values())
+            read_items += sum(response['ScannedCount'] for response in stream_responses.values())
+
+            # Continue every stream that has more items after its LastEvaluatedKey
+            cursors = {
+                stream_key: response['LastEvaluatedKey']['SK']
+                for stream_key, response in stream_responses.items()
+                if response.get('LastEvaluatedKey')
+            }
+            if not count_budget or read_items >= count_budget:
+                break
+        return item_count, cursors
+
+    def _plan_query(self, item_type: str, filter_parameters: dict) -> tuple:
+        """
+        Choose the access path for a query and return its stream keys and the remaining filter.
+
+        A stream is a sorted range of items that is queried with a single key condition. Without a
+        usable index, there is a stream for every shard, identified by its partition key (e.g. 'ITEM#2').
+        When the filter has an equalsOr on an indexed attribute, every value becomes a query on that
+        index, identified by '<attribute>=<value>' (e.g. 'make=Tesla'). If multiple attributes qualify,
+        the one with the fewest values is used. The other filters are returned as the remaining filter.
+        Otherwise, when the n-gram index can resolve a contains-filter, the only stream is 'NGRAM'.
+        """
+        candidates = [
+            (filter_key, list(dict.fromkeys(filter_values['equalsOr'])))  # Deduplicate the values
+            for filter_key, filter_values in (filter_parameters or {}).items()
+            if filter_key in self.indexed_attributes
+            and filter_values.get('equalsOr')
+            and None not in filter_values['equalsOr']
+        ]
+        if not candidates:
+            filterable_attributes = self.FILTERABLE_ATTRIBUTES.get(item_type, [])
+            if self.ngram_index_reads and ngram_filters(filter_parameters, filterable_attributes):
+                return [self.NGRAM_STREAM_KEY], filter_parameters
+            return self.partition_keys(), filter_parameters
+
+        filter_key, filter_values = min(candidates, key=lambda candidate: len(candidate[1]))
+        remaining_filter_parameters = {
+            **filter_parameters,
+            filter_key: {
+                filter_op: filter_op_values
+                for filter_op, filter_op_values in filter_parameters[filter_key].items()
+                if filter_op != 'equalsOr'
+            }
         }
+        return [f'{filter_key}={filter_value}' for filter_value in filter_values], remaining_filter_parameters
 
-    @staticmethod
-    def _append_filter(source_filter, operation, additional_filter):
-        if source_filter is None:
-            # This is the first addition to the filter, return
-            # the filter being added as-is.
-            return additional_filter
-        if additional_filter is None:
-            # We're trying to add nothing to the source filter
-            # so just return the source filter.
-            return source_filter
-        if operation == 'AND':
-            return source_filter & additional_filter
-        if operation == 'OR':
-            return source_filter | additional_filter
-        raise RuntimeError(f'Invalid operation: {operation}')
-
-    def _build_query_filter_expression(self, filter_dict):  # pylint: disable=too-many-branches,too-many-statements
-        """
-        Build a complex Query Filter Expression to limit the results returned by DynamoDB.
-
-        The filter_dict can have multiple keys, like make, model and color. Each
-        of these keys can be filtered simultaneously, e.g. "all cars with make 'Tesla' and model 'Model 3'.
-
-        The filters allow for five different operations: containsOr, containsAnd, notContains,
-        equalsOr and notEquals.
-
-        This function returns a single filter_expression, which consists of multiple key_filters (make,
-        model, and so on), each of which has zero, one or more operations (containsOr, notEquals, and
-        so on) which are defined in sub_key_filters.
-
-        Example:
-        filter_expression = (
-            (key_filter_1) AND (key_filter_2) AND ... AND (key_filter_n)
+    def _sort_key_range(self, item_type: str, added_after: str = None, added_before: str = None):
+        """
+        Return the smallest and largest sort key of the items added between two AWSDateTimes.
+
+        Returns False without a range, and None if the range is empty. Ranges are only supported
+        with time-ordered ids: a random uuid4 in the sort key says nothing about the time.
+        """
+        if not added_after and not added_before:
+            return False
+        if not self.time_ordered_ids:
+            raise ValueError('addedAfter and addedBefore require time-ordered ids (INVENTORY_TIME_ORDERED_IDS)')
+        id_range = ulid_range(
+            parse_datetime(added_after) if added_after else None,
+            parse_datetime(added_before) if added_before else None,
         )
+        if id_range is None:
+            return None
+        return tuple(f'{item_type.upper()}#{item_id}' for item_id in id_range)
+
+    def _stream_query_params(
+        self,
+        item_type: str,
+        stream_key: str,
+        cursor: str = None,
+        sort_key_range: tuple = None,
+    ) -> dict:
+        """Return the IndexName, KeyConditionExpression and ExclusiveStartKey to query a stream."""
+        # The sort key starts with CAR or BOOK, depending on what we're retrieving. The indexes
+        # use the same sort key, so the results of every stream can be merged the same way. With
+        # time-ordered ids, the items added in a time range are a range of sort keys.
+        if sort_key_range:
+            sort_key_condition = Key('SK').between(*sort_key_range)
+        else:
+            sort_key_condition = Key('SK').begins_with(f'{item_type.upper()}#')
+
+        if '=' in stream_key:
+            # An index query, e.g. 'make=Tesla'
+            attribute, value = stream_key.split('=', 1)
+            stream_query_params = {
+                'IndexName': f'{attribute}-index',
+                'KeyConditionExpression': Key(attribute).eq(value) & sort_key_condition,
+            }
+            if cursor:
+                # An index ExclusiveStartKey also contains the table key. The sort key is
+                # unique, so the partition key of the shard doesn't affect the position.
+                stream_query_params['ExclusiveStartKey'] = {
+                    attribute: value,
+                    **self.item_key(cursor),
+                }
+            return stream_query_params
+
+        # A shard of the table, e.g. 'ITEM#2'
+        stream_query_params = {
+            'KeyConditionExpression': Key('PK').eq(stream_key) & sort_key_condition,
+        }
+        if cursor:
+            stream_query_params['ExclusiveStartKey'] = {
+                'PK': stream_key,
+                'SK': cursor,
+            }
+        return stream_query_params
+
+    def _query_streams(self, item_type: str, query_params: dict, cursors: dict, sort_key_range: tuple = None) -> dict:
+        """Query every stream in `cursors` in parallel and return the responses per stream key."""
 
-        Where key_filters look like:
-        key_filter_x = (
-            (sub_key_filter_1) AND/OR (sub_key_filter_2) AND/OR ... AND/OR (sub_key_filter_n)
+        def query_stream(stream_key):
+            # Continue after the last sort key this stream returned in the previous page
+            stream_query_params = {
+                **self._stream_query_params(item_type, stream_key, cursors[stream_key], sort_key_range),
+                **query_params
+            }
+            ddb_response = self.read_table.query(**stream_query_params)
+            self._record_diagnostics(ddb_response, stream_query_params['KeyConditionExpression'])
+            return ddb_response
+
+        if not cursors:
+            return {}
+        with ThreadPoolExecutor(max_workers=min(len(cursors), self.MAX_PARALLEL_REQUESTS)) as executor:
+            responses = executor.map(query_stream, cursors)
+            return dict(zip(cursors, responses))
+
+    def _ngram_candidates(self, item_type: str, filter_parameters: dict) -> list:
+        """Return the sorted sort keys of the items that might match the contains-filters."""
+        filters = ngram_filters(filter_parameters, self.FILTERABLE_ATTRIBUTES.get(item_type, []))
+
+        # Read the posting lists of all n-grams of all terms in parallel
+        partition_keys = posting_list_keys(item_type, filters)
+        with ThreadPoolExecutor(max_workers=min(len(partition_keys), self.MAX_PARALLEL_REQUESTS)) as executor:
+            posting_lists = dict(zip(partition_keys, executor.map(self._read_posting_list, partition_keys)))
+        return match_posting_lists(item_type, filters, posting_lists)
+
+    def _read_posting_list(self, partition_key: str) -> set:
+        """Return the sort keys of all items in the posting list of an n-gram."""
+        query_params = {
+            'KeyConditionExpression': Key('PK').eq(partition_key),
+            'ProjectionExpression': 'SK',
+            'ReturnConsumedCapacity': 'TOTAL',
+        }
+        sort_keys = set()
+        while True:
+            ddb_response = self.read_table.query(**query_params)
+            self._record_diagnostics(ddb_response, query_params['KeyConditionExpression'])
+            sort_keys.update(item['SK'] for item in ddb_response['Items'])
+            if not ddb_response.get('LastEvaluatedKey'):
+                return sort_keys
+            query_params['ExclusiveStartKey'] = ddb_response['LastEvaluatedKey']
+
+    def _read_ngram_page(  # pylint: disable=too-many-arguments
+        self,
+        item_type: str,
+        filter_parameters: dict,
+        cursors: dict,
+        *,
+        selection_set: list = None,
+        limit: int = None,
+        sort_key_range: tuple = None,
+        newest_first: bool = False,
+    ) -> tuple:
+        """
+        Read a page of at most `limit` items through the n-gram index.
+
+        The candidates from the posting lists are fetched with BatchGetItem, in sort key order,
+        and verified against the complete filter (an item can contain all n-grams of a term without
+        containing the term itself). Like _fill_page(), this continues until the page is full, all
+        candidates have been checked or the read budget runs out.
+        """
+        candidates = page_candidates(
+            self._ngram_candidates(item_type, filter_parameters), cursors.get(self.NGRAM_STREAM_KEY),
+            sort_key_range, newest_first,
         )
 
-        Whether an AND or OR is applied depends on the filter, e.g. containsOr or containsAnd.
+        # Project the selected and the filtered attributes, so the filter can be verified
+        projection_params = None
+        if selection_set is not None:
+            projection_params = compile_projection_expression(
+                list(dict.fromkeys(selection_set + ['SK'] + list(filter_parameters)))
+            )
+        if self._diagnostics is not None:
+            # The candidates are fetched with BatchGetItem and verified in Python, without a FilterExpression
+            self._diagnostics.describe_request({'Limit': limit, **(projection_params or {})})
+
+        items, position = self._verify_candidates(candidates, filter_parameters, projection_params, limit)
+        if position < len(candidates):
+            return items, {self.NGRAM_STREAM_KEY: candidates[position - 1]}
+        return items, {}
+
+    def _verify_candidates(
+        self, candidates: list, filter_parameters: dict, projection_params: dict = None, limit: int = None
+    ) -> tuple:
         """
-        if not filter_dict:
-            return None
+        Fetch the candidates in rounds, and return the ones that match the filter and how many were checked.
 
-        # We start with an empty filter expression
-        filter_expression = None
-        # Then we loop over every element of the filter_dict, defined just above.
-        # This will return values like 'model', 'make', 'title' or other terms to filter on.
-        for filter_key, filter_values in filter_dict.items():
-            key_filter = None
-            for filter_op, filter_op_values in filter_values.items():
-                # e.g. filter_key = 'make', filter_op = 'containsOr', filter_op_values = ['esla', 'olksw']
-                # This would filter the 'make' by items that contain 'esla' OR 'olkswag'.
-
-                # Create a new sub filter for the multiple values for one key, for example
-                # (make.contains('esla' OR 'olkswag')).
-                sub_filter = None
-                for filter_op_value in filter_op_values:
-                    if filter_op == 'containsOr':
-                        # Create a 'contains' comparison for every key, e.g. (make.contains('esla'))
-                        sub_key_filter = Attr(filter_key).contains(filter_op_value)
-
-                        # Then bind every sub_key_filter together with the OR operator. This creates a filter
-                        # like (make.contains('esla' OR 'olkswag'))
-                        sub_filter = self._append_filter(sub_filter, 'OR', sub_key_filter)
-
-                    elif filter_op == 'containsAnd':
-                        # Like the one above, but with an AND operator, for example (make.contains('Tes' AND 'la'))
-                        # to match Tesla and Testorilla.
-                        # Create a 'contains' comparison for every key, e.g. (make.contains('Tes'))
-                        sub_key_filter = Attr(filter_key).contains(filter_op_value)
-
-                        # Then bind every sub_key_filter together with the AND operator. This creates a filter
-                        # like (make.contains('Tes' AND 'la'))
-                        sub_filter = self._append_filter(sub_filter, 'AND', sub_key_filter)
-
-                    elif filter_op == 'notContains':
-                        # Like the one above, but with an Negate (~) operator, for example
-                        # (make.notContains('Tes' AND 'Volksw')).
-                        # Create a 'contains' comparison for every key, e.g. (make.contains('Tes'))
-                        sub_key_filter = ~Attr(filter_key).contains(filter_op_value)
-
-                        # Then bind every sub_key_filter together with the AND operator. This creates a filter
-                        # like (make.notContains('Tes' AND 'Volksw'))
-                        sub_filter = self._append_filter(sub_filter, 'AND', sub_key_filter)
-
-                    elif filter_op == 'equalsOr':
-                        # Create a 'equals' comparison for every key, e.g. (make.equals('Tesla'))
-                        sub_key_filter = Attr(filter_key).eq(filter_op_value)
-
-                        # Then bind every sub_key_filter together with the OR operator. This creates a filter
-                        # like (make.equals('Tesla' OR 'Volkswagen'))
-                        sub_filter = self._append_filter(sub_filter, 'OR', sub_key_filter)
-
-                    elif filter_op == 'notEquals':
-                        # Like the notContains one above, but with an equals operator, for example
-                        # (make.notEquals('Tesla' AND 'Volkswagen')).
-                        # Create a 'equals' comparison for every key, e.g. (make.notEquals('Tesla'))
-                        sub_key_filter = ~Attr(filter_key).eq(filter_op_value)
-
-                        # Then bind every sub_key_filter together with the AND operator. This creates a filter
-                        # like (make.notEquals('Tesla' AND 'Volkswagen'))
-                        sub_filter = self._append_filter(sub_filter, 'AND', sub_key_filter)
-
-                # When all keywords have been combined, add it to key_filter with an AND operator.
-                # This creates a filter like
-                # "(make.notEquals('Tesla' AND 'Volkswagen')) AND (model.notEquals('Mach-E'))".
-                key_filter = self._append_filter(key_filter, 'AND', sub_filter)
-
-            # Finally, bind the key_filters together into filter_expression.
-            filter_expression = self._append_filter(filter_expression, 'AND', key_filter)
-
-        # Return the filter expression built after looping over the keys.
-        return filter_expression
+        Every round fetches as many candidates as the page still needs. In fill mode, rounds are
+        repeated until the page is full, all candidates have been checked or the read budget runs out.
+        """
+        items = []
+        position = 0
+        while position < len(candidates) and not (limit and len(items) >= limit):
+            round_sort_keys = candidates[position:position + (limit - len(items) if limit else len(candidates))]
+            position += len(round_sort_keys)
+
+            fetched_items = {
+                item['SK']: item for item in self.batch_get_items(round_sort_keys, projection_params)
+            }
+            for sort_key in round_sort_keys:
+                item = fetched_items.get(sort_key)
+                if item and item_matches_filter(item, filter_parameters):
+                    items.append(item)
+
+            if not self.fill_pages or position >= self.fill_read_budget_items:
+                break
+        return items, position
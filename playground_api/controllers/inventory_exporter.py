@@ -0,0 +1,213 @@
+"""
+The InventoryExporter module contains the InventoryExporter class.
+
+Run an export from the playground_api directory, for example:
+INVENTORY_TABLE=<table name> python -m controllers.inventory_exporter inventory --item-types car
+
+The export is written to part files in the output directory. Concatenated, they form a single
+gzip-compressed JSONL file: cat inventory/part-*.jsonl.gz > inventory.jsonl.gz
+"""
+# Standard library imports
+import argparse
+import gzip
+import json
+import os
+import queue
+import re
+import threading
+from decimal import Decimal
+from itertools import chain, islice
+
+# Related third party imports
+from boto3.dynamodb.conditions import Attr
+
+# Local application/library specific imports
+from controllers.expression_compiler import compile_projection_expression
+from controllers.inventory_controller import InventoryController
+
+
+class InventoryExporter:  # pylint: disable=too-few-public-methods
+    """
+    The InventoryExporter streams the inventory into gzip-compressed JSONL part files.
+
+    The table is read with a parallel Scan: every segment is scanned by its own worker thread.
+    The workers hand their pages to the writer through a bounded queue, so memory use is
+    constant regardless of the size of the table. The pages are written to part files of at
+    most `pages_per_part` pages. Once a part file is closed, the position of every segment
+    after its pages is stored in a checkpoint file, with the number of the next part. An
+    interrupted export continues from the checkpoints: it removes the part files written after
+    the last checkpoint, which may be truncated, and writes their pages again.
+    """
+
+    PART_FILE_PATTERN = re.compile(r'part-(\d+)\.jsonl\.gz')
+
+    def __init__(
+        self,
+        inventory_controller: InventoryController = None,
+        total_segments: int = 8,
+        checkpoint_path: str = None,
+        pages_per_part: int = 100,
+    ) -> None:
+        """Initialize the InventoryExporter Class."""
+        self.inventory_controller = inventory_controller or InventoryController()
+        self.total_segments = total_segments
+        self.checkpoint_path = checkpoint_path
+        self.pages_per_part = pages_per_part
+
+    def export(self, output_path: str, item_types: list = None, attributes: list = None) -> int:
+        """
+        Export the items of the given types (default: all types) to part files in the directory `output_path`.
+
+        If `attributes` is provided, only those attributes are exported. Returns the number
+        of items written in this run.
+        """
+        checkpoints = self._load_checkpoints()
+        os.makedirs(output_path, exist_ok=True)
+        self._remove_unfinished_parts(output_path, checkpoints['nextPart'])
+        exported_items = 0
+
+        pages = self._scan_pages(checkpoints['segments'], item_types, attributes)
+        for first_page in pages:
+            part_positions = {}
+            part_path = os.path.join(output_path, f'part-{checkpoints["nextPart"]:05d}.jsonl.gz')
+            with gzip.open(part_path, 'wt', encoding='utf-8') as part_file:
+                for segment, items, last_evaluated_key in chain([first_page], islice(pages, self.pages_per_part - 1)):
+                    for line in self._to_json_lines(items):
+                        part_file.write(line)
+                    exported_items += len(items)
+                    part_positions[str(segment)] = last_evaluated_key or 'done'
+
+            # Only store the checkpoint when the part is complete
+            checkpoints['segments'].update(part_positions)
+            checkpoints['nextPart'] += 1
+            self._store_checkpoints(checkpoints)
+
+        return exported_items
+
+    def _remove_unfinished_parts(self, output_path: str, next_part: int) -> None:
+        """Remove the part files from `next_part` on, which were written after the last checkpoint."""
+        for file_name in os.listdir(output_path):
+            part_match = self.PART_FILE_PATTERN.fullmatch(file_name)
+            if part_match and int(part_match.group(1)) >= next_part:
+                os.remove(os.path.join(output_path, file_name))
+
+    def _scan_pages(self, checkpoints: dict, item_types: list = None, attributes: list = None):
+        """Scan all unfinished segments in parallel and yield (segment, items, LastEvaluatedKey) per page."""
+        scan_params = {
+            'TotalSegments': self.total_segments,
+            'FilterExpression': self._build_scan_filter(item_types),
+        }
+        if attributes:
+            scan_params.update(compile_projection_expression(attributes))
+
+        segments = [
+            segment for segment in range(self.total_segments)
+            if checkpoints.get(str(segment)) != 'done'
+        ]
+        if not segments:
+            return
+
+        # At most two pages per worker are waiting to be written
+        pages = queue.Queue(maxsize=2 * len(segments))
+        finished = object()
+        errors = []
+
+        def scan_segment(segment):
+            try:
+                segment_scan_params = {**scan_params, 'Segment': segment}
+                if checkpoints.get(str(segment)):
+                    segment_scan_params['ExclusiveStartKey'] = checkpoints[str(segment)]
+                while True:
+                    ddb_response = self.inventory_controller.inventory_table.scan(**segment_scan_params)
+                    last_evaluated_key = ddb_response.get('LastEvaluatedKey')
+                    pages.put((segment, ddb_response['Items'], last_evaluated_key))
+                    if not last_evaluated_key:
+                        break
+                    segment_scan_params['ExclusiveStartKey'] = last_evaluated_key
+            except Exception as exc:  # pylint: disable=broad-except
+                errors.append(exc)
+            finally:
+                pages.put(finished)
+
+        workers = [threading.Thread(target=scan_segment, args=(segment,), daemon=True) for segment in segments]
+        for worker in workers:
+            worker.start()
+
+        running_workers = len(workers)
+        while running_workers:
+            page = pages.get()
+            if page is finished:
+                running_workers -= 1
+                continue
+            yield page
+
+        if errors:
+            raise errors[0]
+
+    @staticmethod
+    def _build_scan_filter(item_types: list = None):
+        """Build a FilterExpression that only matches items, not index entries or counters."""
+        scan_filter = Attr('PK').begins_with(InventoryController.LEGACY_PARTITION_KEY)
+        if item_types:
+            type_filters = [Attr('SK').begins_with(f'{item_type.upper()}#') for item_type in item_types]
+            type_filter = type_filters[0]
+            for additional_type_filter in type_filters[1:]:
+                type_filter = type_filter | additional_type_filter
+            scan_filter = scan_filter & type_filter
+        return scan_filter
+
+    @staticmethod
+    def _to_json_lines(items: list):
+        """Yield every item as a line of JSON. DynamoDB numbers become JSON numbers."""
+        for item in items:
+            yield json.dumps(item, default=_json_default, separators=(',', ':')) + '\n'
+
+    def _load_checkpoints(self) -> dict:
+        """Load the next part and the position of every segment from the checkpoint file, if there is one."""
+        if not self.checkpoint_path or not os.path.exists(self.checkpoint_path):
+            return {'nextPart': 0, 'segments': {}}
+        with open(self.checkpoint_path, 'r', encoding='utf-8') as checkpoint_file:
+            checkpoints = json.load(checkpoint_file)
+        if checkpoints.get('totalSegments') != self.total_segments:
+            raise ValueError(
+                f'The checkpoints were made with {checkpoints.get("totalSegments")} segments, not {self.total_segments}'
+            )
+        return {'nextPart': checkpoints['nextPart'], 'segments': checkpoints['segments']}
+
+    def _store_checkpoints(self, checkpoints: dict) -> None:
+        """Atomically replace the checkpoint file with the next part and the current position of every segment."""
+        if not self.checkpoint_path:
+            return
+        temporary_path = f'{self.checkpoint_path}.tmp'
+        with open(temporary_path, 'w', encoding='utf-8') as checkpoint_file:
+            json.dump(
+                {'totalSegments': self.total_segments, **checkpoints},
+                checkpoint_file,
+                default=_json_default,
+            )
+        os.replace(temporary_path, self.checkpoint_path)
+
+
+def _json_default(value):
+    """Convert the Decimals returned by DynamoDB to int or float."""
+    if isinstance(value, Decimal):
+        return int(value) if value == value.to_integral_value() else float(value)
+    raise TypeError(f'Object of type {type(value).__name__} is not JSON serializable')
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Export the inventory to gzip-compressed JSONL part files.')
+    parser.add_argument('output_path', help='the directory of the part files')
+    parser.add_argument('--item-types', nargs='*', help='e.g. car book (default: all item types)')
+    parser.add_argument('--attributes', nargs='*', help='e.g. id make model (default: all attributes)')
+    parser.add_argument('--segments', type=int, default=8, help='the number of parallel scan segments')
+    parser.add_argument('--checkpoint', help='the checkpoint file, to resume an interrupted export')
+    parser.add_argument('--pages-per-part', type=int, default=100, help='the number of scanned pages per part file')
+    args = parser.parse_args()
+
+    exporter = InventoryExporter(
+        total_segments=args.segments,
+        checkpoint_path=args.checkpoint,
+        pages_per_part=args.pages_per_part,
+    )
+    print(f'Exported {exporter.export(args.output_path, args.item_types, args.attributes)} items')
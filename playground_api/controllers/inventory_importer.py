@@ -0,0 +1,301 @@
+r"""
+The InventoryImporter module contains the InventoryImporter class.
+
+Run an import from the playground_api directory, for example:
+INVENTORY_TABLE=<table name> INVENTORY_SHARD_COUNT=4 INVENTORY_NGRAM_INDEX=true \
+    python -m controllers.inventory_importer cars.jsonl.gz --item-type car
+"""
+# Standard library imports
+import argparse
+import gzip
+import json
+import os
+import random
+import re
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+# Related third party imports
+from botocore.exceptions import BotoCoreError, ClientError
+
+# Local application/library specific imports
+from controllers.inventory_controller import InventoryController
+
+# The GraphQL schema with the AddCarInput and AddBookInput types
+SCHEMA_PATH = os.path.join(os.path.dirname(os.path.realpath(__file__)), '..', '..', 'graphql', 'schema.graphql')
+
+# The Python types of the GraphQL scalars used in the input types
+SCALAR_TYPES = {
+    'String': str,
+    'ID': str,
+    'Int': int,
+    'Float': (int, float),
+    'Boolean': bool,
+}
+
+# The error codes DynamoDB returns when a request is throttled
+THROTTLING_ERROR_CODES = {
+    'ProvisionedThroughputExceededException',
+    'RequestLimitExceeded',
+    'ThrottlingException',
+}
+
+
+def load_input_shapes(schema_path: str = SCHEMA_PATH) -> dict:
+    """
+    Load the input and enum types from a GraphQL schema.
+
+    Returns a dictionary like {"inputs": {"AddCarInput": {"make": ("String", True), ...}},
+    "enums": {"Continent": {"AFRICA", ...}}}, where the tuple holds the type and whether
+    the field is required.
+    """
+    with open(schema_path, 'r', encoding='utf-8') as schema_file:
+        schema = schema_file.read()
+
+    inputs = {
+        input_name: {
+            field_name: (field_type, required == '!')
+            for field_name, field_type, required in re.findall(r'(\w+)\s*:\s*(\w+)(!?)', input_body)
+        }
+        for input_name, input_body in re.findall(r'input\s+(\w+)\s*\{([^}]*)\}', schema)
+    }
+    enums = {
+        enum_name: set(re.findall(r'\w+', enum_body))
+        for enum_name, enum_body in re.findall(r'enum\s+(\w+)\s*\{([^}]*)\}', schema)
+    }
+    return {
+        'inputs': inputs,
+        'enums': enums,
+    }
+
+
+class InventoryImporter:  # pylint: disable=too-many-instance-attributes
+    """
+    The InventoryImporter loads large JSONL files of cars or books into the inventory.
+
+    Every line is validated against the AddCarInput or AddBookInput type, and turned into an item
+    the same way add_item() does. The items and their n-gram index entries are written with
+    BatchWriteItem by a pool of worker threads. The number of batches in flight adapts to
+    throttling: it's halved when DynamoDB throttles a batch (or the request fails, e.g. on a
+    timeout), and increased by one after every batch that was written without throttling. Every
+    worker counts the items of its batch once they're written, so the counters stay exact when
+    an import is interrupted.
+    """
+
+    BATCH_WRITE_SIZE = InventoryController.BATCH_WRITE_SIZE
+
+    def __init__(
+        self,
+        inventory_controller: InventoryController = None,
+        max_workers: int = 32,
+        progress_interval: float = 5.0,
+        report_progress=None,
+    ) -> None:
+        """Initialize the InventoryImporter Class."""
+        self.inventory_controller = inventory_controller or InventoryController()
+        self.input_shapes = load_input_shapes()
+        self.max_workers = max_workers
+        self.concurrency = max(1, max_workers // 4)
+        self.progress_interval = progress_interval
+        # Called with a dictionary of statistics every `progress_interval` seconds
+        self.report_progress = report_progress
+        self.stats = {}
+
+    def import_file(self, input_path: str, item_type: str) -> dict:
+        """Import all records in a (gzip-compressed) JSONL file and return the import statistics."""
+        open_file = gzip.open if input_path.endswith('.gz') else open
+        with open_file(input_path, 'rt', encoding='utf-8') as input_file:
+            return self.import_records(input_file, item_type)
+
+    def import_records(self, lines, item_type: str) -> dict:
+        """Import an iterable of JSON lines, which is read lazily, and return the import statistics."""
+        self.stats = {
+            'read': 0,
+            'invalid': 0,
+            'written': 0,
+            'failed': 0,
+            'throttled_batches': 0,
+            'uncounted': 0,
+            'errors': [],
+            'started_at': time.monotonic(),
+        }
+        last_report = time.monotonic()
+
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            in_flight = set()
+            for batch in self._batches(self._put_requests(self._valid_records(lines, item_type), item_type)):
+                # Wait until there's room for another batch at the current concurrency
+                while len(in_flight) >= self.concurrency:
+                    done, in_flight = wait(in_flight, return_when=FIRST_COMPLETED)
+                    for future in done:
+                        self._process_batch_result(future.result())
+                in_flight.add(executor.submit(self._import_batch, item_type, batch))
+
+                if self.report_progress and time.monotonic() - last_report >= self.progress_interval:
+                    self.report_progress(self.progress())
+                    last_report = time.monotonic()
+
+            for future in wait(in_flight).done:
+                self._process_batch_result(future.result())
+
+        progress = self.progress()
+        if self.report_progress:
+            self.report_progress(progress)
+        return progress
+
+    def progress(self) -> dict:
+        """Return the statistics of the running import, including its throughput in items per second."""
+        elapsed = time.monotonic() - self.stats['started_at']
+        return {
+            **{stat_key: stat_value for stat_key, stat_value in self.stats.items() if stat_key != 'started_at'},
+            'elapsed_seconds': round(elapsed, 1),
+            'items_per_second': round(self.stats['written'] / elapsed, 1) if elapsed else 0.0,
+            'concurrency': self.concurrency,
+        }
+
+    def validate(self, record, item_type: str) -> list:
+        """Validate a record against the AddCarInput or AddBookInput type and return the errors."""
+        input_type = f'Add{item_type.capitalize()}Input'
+        fields = self.input_shapes['inputs'][input_type]
+        if not isinstance(record, dict):
+            return [f'{input_type} must be an object']
+
+        errors = [f'Unknown field {field_name}' for field_name in record if field_name not in fields]
+        for field_name, (field_type, required) in fields.items():
+            value = record.get(field_name)
+            if value is None:
+                if required:
+                    errors.append(f'Missing required field {field_name}')
+            elif field_type in self.input_shapes['enums']:
+                if value not in self.input_shapes['enums'][field_type]:
+                    errors.append(f'Invalid {field_type} value {value!r} for {field_name}')
+            elif field_type in SCALAR_TYPES:
+                # bool is a subclass of int, but not a valid Int or Float
+                is_bool = isinstance(value, bool) and field_type != 'Boolean'
+                if not isinstance(value, SCALAR_TYPES[field_type]) or is_bool:
+                    errors.append(f'Field {field_name} must be a {field_type}')
+        return errors
+
+    def _valid_records(self, lines, item_type: str):
+        """Parse and validate the lines, and yield the valid records. Invalid records are counted and skipped."""
+        for line_number, line in enumerate(lines, start=1):
+            if not line.strip():
+                continue
+            self.stats['read'] += 1
+            try:
+                record = json.loads(line)
+                errors = self.validate(record, item_type)
+            except ValueError as exc:
+                errors = [f'Invalid JSON: {exc}']
+            if errors:
+                self.stats['invalid'] += 1
+                # Keep the first few errors for the report
+                if len(self.stats['errors']) < 10:
+                    self.stats['errors'].append(f'Line {line_number}: {"; ".join(errors)}')
+                continue
+            yield record
+
+    def _put_requests(self, records, item_type: str):
+        """Yield a PutRequest for every record, followed by the PutRequests of its n-gram index entries."""
+        for record in records:
+            item_data = self.inventory_controller.build_item(item_type, record)
+            yield {'PutRequest': {'Item': item_data}}
+            if self.inventory_controller.ngram_index:
+                for ngram_entry in self.inventory_controller.build_ngram_entries(item_type, item_data):
+                    yield {'PutRequest': {'Item': ngram_entry}}
+
+    def _batches(self, put_requests):
+        """Group the PutRequests into batches of 25."""
+        batch = []
+        for put_request in put_requests:
+            batch.append(put_request)
+            if len(batch) == self.BATCH_WRITE_SIZE:
+                yield batch
+                batch = []
+        if batch:
+            yield batch
+
+    def _import_batch(self, item_type: str, batch: list) -> dict:
+        """Write a batch, and count the items that were written in the item counters."""
+        result = self._write_batch(batch)
+        # Only count the items themselves, not their n-gram index entries
+        unprocessed_sort_keys = {
+            request['PutRequest']['Item']['SK'] for request in result['unprocessed']
+            if not request['PutRequest']['Item']['PK'].startswith('NGRAM#')
+        }
+        result['written_items'] = [
+            request['PutRequest']['Item'] for request in batch
+            if not request['PutRequest']['Item']['PK'].startswith('NGRAM#')
+            and request['PutRequest']['Item']['SK'] not in unprocessed_sort_keys
+        ]
+        result['failed'] = len(unprocessed_sort_keys)
+        try:
+            self.inventory_controller.update_counters(item_type, result['written_items'])
+        except (BotoCoreError, ClientError) as exc:
+            # The items are stored, only their counters are off. backfill_counters recounts them.
+            result['uncounted'] = len(result['written_items'])
+            result['error'] = f'Counters not updated: {exc}'
+        return result
+
+    def _write_batch(self, batch: list) -> dict:
+        """
+        Write a batch with BatchWriteItem, retrying unprocessed items with a jittered exponential backoff.
+
+        Returns the batch, the requests that could not be written and whether DynamoDB throttled the batch.
+        """
+        table_name = self.inventory_controller.inventory_table.name
+        requests = batch
+        throttled = False
+        error = 'Unprocessed after retrying'
+        for attempt in range(self.inventory_controller.BATCH_MAX_RETRIES + 1):
+            if attempt:
+                time.sleep(random.uniform(0, self.inventory_controller.BATCH_BACKOFF_BASE * 2 ** attempt))
+            try:
+                ddb_response = self.inventory_controller.dynamodb.batch_write_item(
+                    RequestItems={table_name: requests}
+                )
+            except ClientError as exc:
+                if exc.response['Error']['Code'] not in THROTTLING_ERROR_CODES:
+                    return {'batch': batch, 'unprocessed': requests, 'throttled': throttled, 'error': str(exc)}
+                throttled = True
+                continue
+            except BotoCoreError as exc:
+                # E.g. a ReadTimeoutError or EndpointConnectionError. Writing the batch again is
+                # harmless, so retry it like a throttled batch.
+                throttled = True
+                error = str(exc)
+                continue
+
+            requests = ddb_response.get('UnprocessedItems', {}).get(table_name, [])
+            if not requests:
+                return {'batch': batch, 'unprocessed': [], 'throttled': throttled}
+            # DynamoDB returns unprocessed items when the table or a partition is throttled
+            throttled = True
+
+        return {'batch': batch, 'unprocessed': requests, 'throttled': True, 'error': error}
+
+    def _process_batch_result(self, result: dict) -> None:
+        """Update the statistics and concurrency with the result of a batch."""
+        self.stats['written'] += len(result['written_items'])
+        self.stats['failed'] += result['failed']
+        self.stats['uncounted'] += result.get('uncounted', 0)
+        if result.get('error') and len(self.stats['errors']) < 10:
+            self.stats['errors'].append(result['error'])
+
+        # Additive increase, multiplicative decrease
+        if result['throttled']:
+            self.stats['throttled_batches'] += 1
+            self.concurrency = max(1, self.concurrency // 2)
+        else:
+            self.concurrency = min(self.max_workers, self.concurrency + 1)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Import a (gzip-compressed) JSONL file of cars or books.')
+    parser.add_argument('input_path')
+    parser.add_argument('--item-type', required=True, choices=['car', 'book'])
+    parser.add_argument('--max-workers', type=int, default=32, help='the maximum number of batches in flight')
+    args = parser.parse_args()
+
+    importer = InventoryImporter(max_workers=args.max_workers, report_progress=print)
+    importer.import_file(args.input_path, args.item_type)
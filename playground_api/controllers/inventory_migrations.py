@@ -0,0 +1,255 @@
+"""
+The inventory_migrations module contains one-off data migrations for the inventory table.
+
+Run a migration from the playground_api directory, with the environment of the Lambda functions.
+For example, to rewrite the items with a uuid4 id:
+INVENTORY_TABLE=<table name> INVENTORY_SHARD_COUNT=4 INVENTORY_NGRAM_INDEX=true \
+    INVENTORY_TIME_ORDERED_IDS=true python -m controllers.inventory_migrations time-ordered-ids
+Run with --help to list the migrations.
+"""
+# Standard library imports
+import argparse
+import uuid
+
+# Related third party imports
+from boto3.dynamodb.conditions import Key
+from botocore.exceptions import ClientError
+
+# Local application/library specific imports
+from controllers.inventory_controller import InventoryController
+from controllers.time_ordered_ids import is_ulid, new_ulid, parse_datetime
+
+
+def migrate_legacy_partition(inventory_controller: InventoryController) -> int:
+    """
+    Move all items from the unsharded 'ITEM' partition to their shard.
+
+    Every item is written with the partition key of its shard (derived from its id) and
+    removed from the legacy partition in the same transaction, so an item is never lost
+    or stored twice. The write is conditional: an item that's already in its shard (e.g.
+    left behind in the legacy partition by an earlier run that wasn't transactional) isn't
+    overwritten, and only its legacy copy is removed. Items keep their sort key, id and
+    dateAdded. The migration can safely be interrupted and run again. Keep
+    INVENTORY_LEGACY_PARTITION enabled until it has finished, then disable it to save a
+    query per page.
+
+    Returns the number of migrated items.
+    """
+    legacy_partition_key = inventory_controller.LEGACY_PARTITION_KEY
+    table_name = inventory_controller.inventory_table.name
+    query_params = {
+        'KeyConditionExpression': Key('PK').eq(legacy_partition_key)
+    }
+
+    migrated_items = 0
+    while True:
+        ddb_response = inventory_controller.inventory_table.query(**query_params)
+        for item in ddb_response['Items']:
+            legacy_key = {'PK': legacy_partition_key, 'SK': item['SK']}
+            try:
+                inventory_controller.dynamodb.meta.client.transact_write_items(TransactItems=[
+                    {
+                        'Put': {
+                            'TableName': table_name,
+                            'Item': {
+                                **item,
+                                'PK': inventory_controller.shard_partition_key(item['id']),
+                            },
+                            'ConditionExpression': 'attribute_not_exists(PK)',
+                        }
+                    },
+                    {
+                        'Delete': {
+                            'TableName': table_name,
+                            'Key': legacy_key,
+                        }
+                    },
+                ])
+            except ClientError as exc:
+                # Only the Put has a condition: the item is already in its shard
+                if exc.response.get('CancellationReasons', [{}])[0].get('Code') != 'ConditionalCheckFailed':
+                    raise
+                inventory_controller.inventory_table.delete_item(Key=legacy_key)
+            migrated_items += 1
+
+        if not ddb_response.get('LastEvaluatedKey'):
+            break
+        query_params['ExclusiveStartKey'] = ddb_response['LastEvaluatedKey']
+
+    return migrated_items
+
+
+def backfill_ngram_index(inventory_controller: InventoryController) -> int:
+    """
+    Write the n-gram index entries for all existing items.
+
+    Entries are idempotent, so the backfill can safely be run again (or interrupted). Enable
+    INVENTORY_NGRAM_INDEX_READS once it has finished. Returns the number of indexed items.
+    """
+    indexed_items = 0
+    for partition_key in inventory_controller.partition_keys():
+        query_params = {
+            'KeyConditionExpression': Key('PK').eq(partition_key)
+        }
+        while True:
+            ddb_response = inventory_controller.inventory_table.query(**query_params)
+            # Group the items by type, the prefix of the sort key, e.g. 'car' for CAR#1234
+            items_per_type = {}
+            for item in ddb_response['Items']:
+                items_per_type.setdefault(item['SK'].split('#', 1)[0].lower(), []).append(item)
+            for item_type, items in items_per_type.items():
+                inventory_controller.write_ngram_entries(item_type, items)
+            indexed_items += len(ddb_response['Items'])
+
+            if not ddb_response.get('LastEvaluatedKey'):
+                break
+            query_params['ExclusiveStartKey'] = ddb_response['LastEvaluatedKey']
+
+    return indexed_items
+
+
+def backfill_counters(inventory_controller: InventoryController) -> dict:
+    """
+    Recount all items and overwrite the item counters with the result.
+
+    Every item is counted in the counters of its shard. Items added while the backfill runs
+    are counted by add_item, but might be overwritten by this backfill, so run it when no
+    items are being added. Counters of a shard without items are left alone. Returns the new
+    counters, keyed by (PK, SK). Run it once when upgrading to counters per shard: the
+    counters in the unsharded 'COUNT' partition are no longer read.
+    """
+    counters = {}
+    for partition_key in inventory_controller.partition_keys():
+        query_params = {
+            'KeyConditionExpression': Key('PK').eq(partition_key)
+        }
+        while True:
+            ddb_response = inventory_controller.inventory_table.query(**query_params)
+            for item in ddb_response['Items']:
+                item_type = item['SK'].split('#', 1)[0].lower()
+                for counter_key, increment in inventory_controller.counter_increments(item_type, [item]).items():
+                    counters[counter_key] = counters.get(counter_key, 0) + increment
+
+            if not ddb_response.get('LastEvaluatedKey'):
+                break
+            query_params['ExclusiveStartKey'] = ddb_response['LastEvaluatedKey']
+
+    with inventory_controller.inventory_table.batch_writer() as batch:
+        for (counter_partition_key, counter_sort_key), item_count in counters.items():
+            batch.put_item(Item={
+                'PK': counter_partition_key,
+                'SK': counter_sort_key,
+                'itemCount': item_count,
+            })
+    return counters
+
+
+def backfill_time_ordered_ids(inventory_controller: InventoryController) -> int:
+    """
+    Give every item with a random uuid4 id a time-ordered id (a ULID) based on its dateAdded.
+
+    The item is rewritten with the new id and sort key (and the shard of the new id), and the
+    old item is deleted in the same transaction. Note that this changes the id clients see.
+    The n-gram index entries of the new sort key are written before the item is moved, and
+    the old entries are deleted afterwards: entries of a missing item are skipped when read.
+    Items that already have a ULID are left alone, so the backfill can safely be interrupted
+    and run again. The version of every rewritten item type is incremented, so no cached
+    result serves the old ids. Raises a ValueError unless INVENTORY_TIME_ORDERED_IDS is
+    enabled, because new items would get a uuid4 again. Returns the number of rewritten items.
+    """
+    if not inventory_controller.time_ordered_ids:
+        raise ValueError('Enable INVENTORY_TIME_ORDERED_IDS before rewriting the ids of the items')
+
+    rewritten_items = 0
+    rewritten_item_types = set()
+    for partition_key in inventory_controller.partition_keys():
+        query_params = {
+            'KeyConditionExpression': Key('PK').eq(partition_key)
+        }
+        while True:
+            ddb_response = inventory_controller.inventory_table.query(**query_params)
+            for item in ddb_response['Items']:
+                if not _has_uuid_id(item):
+                    # Counters, version counters, or an item that already has a ULID
+                    continue
+                item_type = item['SK'].split('#', 1)[0].lower()
+                item_id = new_ulid(parse_datetime(item['dateAdded']))
+                new_item = {
+                    **item,
+                    'PK': inventory_controller.shard_partition_key(item_id),
+                    'SK': f'{item_type.upper()}#{item_id}',
+                    'id': item_id,
+                }
+
+                inventory_controller.write_ngram_entries(item_type, [new_item])
+                inventory_controller.dynamodb.meta.client.transact_write_items(TransactItems=[
+                    {
+                        'Put': {
+                            'TableName': inventory_controller.inventory_table.name,
+                            'Item': new_item,
+                        }
+                    },
+                    {
+                        'Delete': {
+                            'TableName': inventory_controller.inventory_table.name,
+                            'Key': {'PK': item['PK'], 'SK': item['SK']},
+                        }
+                    },
+                ])
+                if inventory_controller.ngram_index:
+                    with inventory_controller.inventory_table.batch_writer() as batch:
+                        for ngram_entry in inventory_controller.build_ngram_entries(item_type, item):
+                            batch.delete_item(Key=ngram_entry)
+                rewritten_items += 1
+                rewritten_item_types.add(item_type)
+
+            if not ddb_response.get('LastEvaluatedKey'):
+                break
+            query_params['ExclusiveStartKey'] = ddb_response['LastEvaluatedKey']
+
+    for item_type in sorted(rewritten_item_types):
+        inventory_controller.increment_version(item_type)
+    return rewritten_items
+
+
+def _has_uuid_id(item: dict) -> bool:
+    """Return whether an item has a random uuid4 id, and a dateAdded to derive a ULID from."""
+    if 'dateAdded' not in item or is_ulid(item.get('id', '')):
+        return False
+    try:
+        uuid.UUID(item.get('id', ''))
+    except ValueError:
+        return False
+    return True
+
+
+# The migrations by their command line name, with a description and the message of the result
+MIGRATIONS = {
+    'legacy-partition': (
+        migrate_legacy_partition, 'Move the items of the legacy partition to their shard.', 'Migrated {} items',
+    ),
+    'ngram-index': (
+        backfill_ngram_index, 'Write the n-gram index entries of all items.', 'Indexed {} items',
+    ),
+    'counters': (
+        backfill_counters, 'Recount all items and overwrite the item counters.', 'Counted {}',
+    ),
+    'time-ordered-ids': (
+        backfill_time_ordered_ids, 'Give every item with a uuid4 id a time-ordered id.',
+        'Rewrote {} items with a time-ordered id',
+    ),
+}
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Run a one-off data migration of the inventory table.')
+    subparsers = parser.add_subparsers(dest='migration', required=True, metavar='migration')
+    for migration_name, (_migration, migration_help, _message) in MIGRATIONS.items():
+        subparsers.add_parser(migration_name, help=migration_help)
+    args = parser.parse_args()
+
+    migration, _migration_help, message = MIGRATIONS[args.migration]
+    try:
+        print(message.format(migration(InventoryController())))
+    except ValueError as exc:
+        parser.exit(1, f'{exc}\n')
@@ -0,0 +1,85 @@
+"""
+The item_counters module describes the version and item counters in the inventory table.
+
+Counting the items of a type (or of a filter) with a query reads all of them. Instead, the
+InventoryController keeps counters that are updated whenever items are added, and a count is a
+single BatchGetItem of the counters. The same sharded counters hold the version of every item
+type, which invalidates the cached results of that type.
+"""
+# Standard library imports
+# -
+
+# Related third party imports
+# -
+
+# Local application/library specific imports
+# -
+
+# The partition key prefix of the version counters. Every item type has a counter per shard,
+# e.g. {"PK": "VERSION#3", "SK": "CAR", "version": 12}, and one of them is incremented whenever
+# items are added. The version of an item type is the sum of its counters.
+VERSION_PARTITION_KEY = 'VERSION'
+
+# The partition key prefix of the item counters. Every item type has a counter per shard, e.g.
+# {"PK": "COUNT#3", "SK": "CAR", "itemCount": 300}, and one per value of every counted attribute,
+# e.g. {"PK": "COUNT#3", "SK": "CAR#continentOfOrigin#EUROPE", "itemCount": 75}. An item is
+# counted in the shard it's stored in, and a count is the sum of the counters of all shards.
+# Spreading the counters over the shards like the items avoids a single hot counter item.
+COUNT_PARTITION_KEY = 'COUNT'
+# The low-cardinality attributes with a counter per value, per item type
+COUNTED_ATTRIBUTES = {
+    'car': ['continentOfOrigin'],
+    'book': [],
+}
+
+
+def counter_sort_key(item_type: str, attribute: str, value: str) -> str:
+    """Return the sort key of the counter of an attribute value, e.g. CAR#continentOfOrigin#EUROPE."""
+    return f'{item_type.upper()}#{attribute}#{value}'
+
+
+def counter_update(partition_key: str, sort_key: str, attribute: str, increment: int) -> dict:
+    """
+    Return the parameters of an UpdateItem call that adds an increment to a counter.
+
+    The same parameters, together with the TableName, are the Update of a TransactWriteItems call.
+    """
+    return {
+        'Key': {
+            'PK': partition_key,
+            'SK': sort_key,
+        },
+        'UpdateExpression': 'ADD #counter :increment',
+        'ExpressionAttributeNames': {'#counter': attribute},
+        'ExpressionAttributeValues': {':increment': increment},
+    }
+
+
+def item_counter_sort_keys(item_type: str, item_data: dict) -> list:
+    """Return the sort keys of the counters an item is counted in, e.g. ['CAR', 'CAR#continentOfOrigin#EUROPE']."""
+    return [item_type.upper()] + [
+        counter_sort_key(item_type, attribute, item_data[attribute])
+        for attribute in COUNTED_ATTRIBUTES.get(item_type, []) if attribute in item_data
+    ]
+
+
+def total_count_sort_keys(item_type: str, filter_parameters: dict):
+    """
+    Return the sort keys of the counters that sum up to the number of items matching an (optimized) filter.
+
+    Without a filter, this is the counter of the item type. A filter with only an equalsOr on
+    a counted attribute is the sum of the counters of its values. Any other filter can't be
+    served from the counters, so None is returned.
+    """
+    if not filter_parameters:
+        return [item_type.upper()]
+
+    filter_key, filter_values = next(iter(filter_parameters.items()))
+    served_by_counters = (
+        len(filter_parameters) == 1
+        and filter_key in COUNTED_ATTRIBUTES.get(item_type, [])
+        and list(filter_values) == ['equalsOr']
+    )
+    if not served_by_counters:
+        return None
+    return [counter_sort_key(item_type, filter_key, value) for value in filter_values['equalsOr']]
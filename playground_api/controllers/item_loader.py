@@ -0,0 +1,95 @@
+"""
+The item_loader module contains the ItemLoader, a DataLoader-style batcher for items by id.
+
+Resolvers that look up items by id (getCarsByIds, getBooksByIds and item) first queue all ids
+of a request with load() / load_many(), and then read the items with get() / get_many(). The
+first read fetches all queued ids at once: the ids are deduplicated (BatchGetItem rejects
+duplicate keys), and fetched with InventoryController.batch_get_items(), which sends chunks of
+100 keys in parallel, retries unprocessed keys and also looks in the legacy partition when
+INVENTORY_LEGACY_PARTITION is enabled. A loader is created per request, so items are never
+served from an earlier request.
+"""
+# Standard library imports
+# -
+
+# Related third party imports
+# -
+
+# Local application/library specific imports
+# -
+
+
+class ItemLoader:
+    """The ItemLoader batches and deduplicates the lookups of items by id within a single request."""
+
+    def __init__(self, inventory_controller, item_types: list, projection_params: dict = None) -> None:
+        """
+        Initialize the ItemLoader Class.
+
+        An id is looked up in every item type: the sort key is '<ITEM TYPE>#<id>', so an id
+        alone doesn't tell the type of the item. `projection_params` can contain a
+        ProjectionExpression and ExpressionAttributeNames, which must include the sort key.
+        """
+        self.inventory_controller = inventory_controller
+        self.item_types = item_types
+        self.projection_params = projection_params
+        # The sort keys to fetch with the next dispatch(), in the order they were queued
+        self._queued_sort_keys = {}
+        # The fetched item per sort key, or None if it doesn't exist
+        self._items = {}
+
+    def load(self, item_id: str) -> None:
+        """Queue an id, to be fetched with all other queued ids."""
+        for sort_key in self._sort_keys(item_id):
+            if sort_key not in self._items:
+                self._queued_sort_keys[sort_key] = None
+
+    def load_many(self, item_ids: list) -> None:
+        """Queue a list of ids, to be fetched with all other queued ids."""
+        for item_id in item_ids:
+            self.load(item_id)
+
+    def dispatch(self) -> None:
+        """Fetch all queued ids with BatchGetItem."""
+        sort_keys = list(self._queued_sort_keys)
+        self._queued_sort_keys = {}
+        if not sort_keys:
+            return
+
+        fetched_items = {
+            item['SK']: item for item in self.inventory_controller.batch_get_items(sort_keys, self.projection_params)
+        }
+        for sort_key in sort_keys:
+            item = fetched_items.get(sort_key)
+            if item is not None:
+                item_type = sort_key.split('#', 1)[0].lower()
+                # AppSync resolves the type of an Item interface result with its __typename
+                item = {**item, 'itemType': item_type, '__typename': item_type.capitalize()}
+            self._items[sort_key] = item
+
+    def get(self, item_id: str):
+        """Return the item with the given id, or None if there is no such item (of the item types)."""
+        return self.get_many([item_id])[0]
+
+    def get_many(self, item_ids: list) -> list:
+        """Return the items with the given ids in the same order, with None for the ids that don't exist."""
+        self.load_many(item_ids)
+        self.dispatch()
+        return [
+            next(
+                (self._items[sort_key] for sort_key in self._sort_keys(item_id) if self._items[sort_key] is not None),
+                None
+            )
+            for item_id in item_ids
+        ]
+
+    def _sort_keys(self, item_id: str) -> list:
+        """Return the sort keys an id can have, one per item type. An invalid id has none."""
+        sort_keys = [f'{item_type.upper()}#{item_id}' for item_type in self.item_types]
+        try:
+            # The shard of an item is derived from its id, which has to be a uuid or a ULID
+            for sort_key in sort_keys:
+                self.inventory_controller.item_key(sort_key)
+        except ValueError:
+            return []
+        return sort_keys
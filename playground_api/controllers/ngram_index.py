@@ -0,0 +1,150 @@
+"""
+The ngram_index module contains the inverted index of n-grams for the contains-filters.
+
+DynamoDB can't use a key condition for contains(), so a containsAnd or containsOr filter reads
+every item. With INVENTORY_NGRAM_INDEX enabled, the InventoryController also stores an index
+entry for every n-gram of every filterable attribute. The posting lists of the n-grams of a term
+contain every item that might contain the term. Those candidates are fetched with BatchGetItem
+and verified against the complete filter with item_matches_filter().
+"""
+# Standard library imports
+# -
+
+# Related third party imports
+# -
+
+# Local application/library specific imports
+# -
+
+# Contains-filters are resolved with an inverted index of n-grams of this length
+NGRAM_LENGTH = 3
+
+
+def ngrams(value: str) -> set:
+    """Return the n-grams of a string, e.g. {'Tes', 'esl', 'sla'} for 'Tesla'."""
+    return {value[index:index + NGRAM_LENGTH] for index in range(len(value) - NGRAM_LENGTH + 1)}
+
+
+def ngram_partition_key(item_type: str, attribute: str, ngram: str) -> str:
+    """Return the partition key of the posting list of an n-gram."""
+    return f'NGRAM#{item_type.upper()}#{attribute}#{ngram}'
+
+
+def build_ngram_entries(item_type: str, item_data: dict, attributes: list) -> list:
+    """
+    Build the n-gram index entries for the given attributes of an item.
+
+    Every n-gram of every attribute gets an entry with partition key
+    'NGRAM#<ITEM TYPE>#<attribute>#<n-gram>' and the sort key of the item, e.g.
+    {"PK": "NGRAM#CAR#make#esl", "SK": "CAR#b59ae8c5-12a6-4774-a3fe-a4a53bae2331"}.
+    Querying a partition key returns the posting list of that n-gram.
+    """
+    return [
+        {
+            'PK': ngram_partition_key(item_type, attribute, ngram),
+            'SK': item_data['SK'],
+        }
+        for attribute in attributes
+        if isinstance(item_data.get(attribute), str)
+        for ngram in sorted(ngrams(item_data[attribute]))
+    ]
+
+
+def ngram_filters(filter_parameters: dict, attributes: list) -> list:
+    """
+    Return the contains-filters the n-gram index can resolve, as (attribute, operation, terms).
+
+    Terms shorter than an n-gram can't be looked up, and notContains can't be resolved with
+    an index. Those filters are only applied when the candidate items are verified.
+    """
+    return [
+        (filter_key, filter_op, filter_op_values)
+        for filter_key, filter_values in (filter_parameters or {}).items()
+        if filter_key in attributes
+        for filter_op, filter_op_values in filter_values.items()
+        if filter_op in ('containsAnd', 'containsOr')
+        and filter_op_values
+        and all(isinstance(term, str) and len(term) >= NGRAM_LENGTH for term in filter_op_values)
+    ]
+
+
+def posting_list_keys(item_type: str, filters: list) -> list:
+    """Return the partition keys of the posting lists of all n-grams of all terms of the filters."""
+    return list({
+        ngram_partition_key(item_type, attribute, ngram)
+        for attribute, _, terms in filters
+        for term in terms
+        for ngram in ngrams(term)
+    })
+
+
+def match_posting_lists(item_type: str, filters: list, posting_lists: dict) -> list:
+    """Return the sorted sort keys of the items that might match the filters, given their posting lists."""
+    candidates = None
+    for attribute, filter_op, terms in filters:
+        # An attribute can only contain a term if it contains every n-gram of that term
+        term_candidates = [
+            set.intersection(*(
+                posting_lists[ngram_partition_key(item_type, attribute, ngram)]
+                for ngram in ngrams(term)
+            ))
+            for term in terms
+        ]
+        # Intersect the terms for containsAnd, union them for containsOr
+        if filter_op == 'containsAnd':
+            filter_candidates = set.intersection(*term_candidates)
+        else:
+            filter_candidates = set.union(*term_candidates)
+
+        # All filters have to match
+        candidates = filter_candidates if candidates is None else candidates & filter_candidates
+    return sorted(candidates)
+
+
+def page_candidates(
+    candidates: list, cursor: str = None, sort_key_range: tuple = None, newest_first: bool = False
+) -> list:
+    """
+    Return the sorted candidates that are left for a page, in the order they're read.
+
+    The posting lists aren't limited to a time range, so the range is applied to the candidates.
+    With `newest_first`, the candidates are read from the largest sort key down. A page continues
+    after the `cursor` of the previous page.
+    """
+    if sort_key_range:
+        candidates = [sort_key for sort_key in candidates if sort_key_range[0] <= sort_key <= sort_key_range[1]]
+    if newest_first:
+        candidates = candidates[::-1]
+    return [
+        sort_key for sort_key in candidates
+        if not cursor or (sort_key < cursor if newest_first else sort_key > cursor)
+    ]
+
+
+def item_matches_filter(item: dict, filter_dict: dict) -> bool:
+    """Evaluate a filter in Python, with the same semantics as the compiled FilterExpression."""
+    def contains(filter_key, filter_op_value):
+        return isinstance(item.get(filter_key), str) and filter_op_value in item[filter_key]
+
+    def equals(filter_key, filter_op_value):
+        return filter_key in item and item[filter_key] == filter_op_value
+
+    for filter_key, filter_values in (filter_dict or {}).items():
+        for filter_op, filter_op_values in filter_values.items():
+            if not filter_op_values:
+                continue
+            if filter_op == 'containsOr':
+                matches = any(contains(filter_key, value) for value in filter_op_values)
+            elif filter_op == 'containsAnd':
+                matches = all(contains(filter_key, value) for value in filter_op_values)
+            elif filter_op == 'notContains':
+                matches = not any(contains(filter_key, value) for value in filter_op_values)
+            elif filter_op == 'equalsOr':
+                matches = any(equals(filter_key, value) for value in filter_op_values)
+            elif filter_op == 'notEquals':
+                matches = not any(equals(filter_key, value) for value in filter_op_values)
+            else:
+                matches = True
+            if not matches:
+                return False
+    return True
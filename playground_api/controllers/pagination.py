@@ -0,0 +1,194 @@
+"""
+The pagination module builds the pages of the InventoryController from the responses of its streams.
+
+A stream is a sorted range of items that is queried with a single key condition, like a shard of
+the table or a value of an index (see InventoryController._plan_query()). All streams of a page
+are queried with the same parameters, apart from their key condition. A page merges the query
+responses of all streams by sort key, and its nextToken holds the cursor per stream: the sort key
+to continue after. The items of a page only contain the attributes the client selected.
+"""
+# Standard library imports
+import base64
+import heapq
+import json
+
+# Related third party imports
+# -
+
+# Local application/library specific imports
+from controllers.expression_compiler import compile_filter_expression, compile_projection_expression
+
+
+def build_query_params(params: dict, filter_parameters: dict, count_only: bool) -> tuple:
+    """
+    Build the parameters of the DynamoDB Query of every stream, and return them with the selected attributes.
+
+    The key condition is added per stream in InventoryController._query_streams(), because every
+    shard or index value has its own key. The selected attributes are None when the client didn't
+    send a selection set.
+    """
+    query_params = {}
+
+    # If get_items() is called with a list of attributes to return, build a ProjectionExpression.
+    # This reduces the amount of data retrieved from DynamoDB to what we're actually requesting.
+    selection_set = None
+    if count_only:
+        selection_set = []
+        query_params['Select'] = 'COUNT'
+    elif 'selection_set' in params:
+        selection_set = selected_item_attributes(params['selection_set'])
+
+        # Build a ProjectionExpression and ExpressionAttributeNames with the provided selection set,
+        # then store them in the parameters provided to the DynamoDB Query. The sort key is always
+        # projected, because we need it to merge the results of the streams. The compiled
+        # expressions are memoized per Lambda container.
+        query_params.update(compile_projection_expression(selection_set + ['SK']))
+
+    # If the user provides filter parameters, build a FilterExpression with them
+    # and provide it to the query. This filter will be applied after the query has retrieved
+    # its results from DynamoDB. The filter is compiled into the final expression strings
+    # (and memoized), which is cheaper than the Attr tree of build_filter_condition().
+    compiled_filter = compile_filter_expression(filter_parameters)
+    if compiled_filter:
+        query_params['FilterExpression'] = compiled_filter['FilterExpression']
+        query_params['ExpressionAttributeNames'] = {
+            **query_params.get('ExpressionAttributeNames', {}),
+            **compiled_filter['ExpressionAttributeNames'],
+        }
+        query_params['ExpressionAttributeValues'] = compiled_filter['ExpressionAttributeValues']
+
+    # If the user provides a limit, pass that limit on to the DynamoDB Query of every stream.
+    # When only counting, all matching items within the budget are counted instead.
+    if params.get('limit') and not count_only:
+        query_params['Limit'] = params['limit']
+
+    # Read every stream from the largest sort key down, so the most recently added items come first
+    if params.get('newestFirst'):
+        query_params['ScanIndexForward'] = False
+
+    # Request the consumed capacity, so we can keep track of the read budget in fill mode
+    query_params['ReturnConsumedCapacity'] = 'TOTAL'
+    return query_params, selection_set
+
+
+def merge_stream_responses(
+    stream_responses: dict,
+    limit: int = None,
+    newest_first: bool = False,
+    merge_key=None,
+) -> tuple:
+    """
+    Merge the query responses of multiple streams into one deduplicated page sorted by sort key.
+
+    Returns the merged items and the cursors for the next page. A stream that has more
+    data (it returned a LastEvaluatedKey) has only been read up to that key, so items
+    of other streams beyond that key can't be returned yet: the stream might hold smaller
+    sort keys we haven't seen. Everything up to the smallest LastEvaluatedKey (or up to the
+    last item returned, if the limit was reached first) has been read from every stream, so
+    that sort key is a valid cursor for all streams that still have items.
+    With `newest_first`, the streams were read in descending order (ScanIndexForward=False).
+    Everything is mirrored then: the page is sorted from the largest sort key down, and
+    every stream has been read down to the largest LastEvaluatedKey.
+    `merge_key` maps a sort key to the value the streams are sorted by, if that's not the sort
+    key itself (e.g. the time-ordered id without the item type, for streams of multiple types).
+    """
+    merge_key = merge_key or (lambda sort_key: sort_key)
+
+    def beyond(sort_key: str, position: str) -> bool:
+        # Whether a sort key comes after a position, in the order the streams are read
+        if newest_first:
+            return merge_key(sort_key) < merge_key(position)
+        return merge_key(sort_key) > merge_key(position)
+
+    read_until = (max if newest_first else min)(
+        (response['LastEvaluatedKey']['SK'] for response in stream_responses.values()
+         if response.get('LastEvaluatedKey')),
+        key=merge_key,
+        default=None
+    )
+
+    merged_items = heapq.merge(
+        *(response['Items'] for response in stream_responses.values()),
+        key=lambda item: merge_key(item['SK']),
+        reverse=newest_first,
+    )
+
+    items = []
+    cutoff = read_until
+    for item in merged_items:
+        if read_until is not None and beyond(item['SK'], read_until):
+            break
+        if limit and len(items) == limit:
+            # There are more items, but the page is full
+            cutoff = items[-1]['SK']
+            break
+        if items and items[-1]['SK'] == item['SK']:
+            # The same item was returned by multiple streams
+            continue
+        items.append(item)
+
+    if cutoff is None:
+        # Every stream has been read completely and all items have been returned
+        return items, {}
+
+    next_cursors = {}
+    for stream_key, response in stream_responses.items():
+        has_more_items = response.get('LastEvaluatedKey') or any(
+            beyond(item['SK'], cutoff) for item in response['Items']
+        )
+        if has_more_items:
+            next_cursors[stream_key] = cutoff
+    return items, next_cursors
+
+
+def encode_next_token(cursors: dict) -> str:
+    """Encode the cursor per stream into a `nextToken` the client can use to retrieve the next page."""
+    if not cursors:
+        return None
+    return base64.b64encode(json.dumps(cursors, separators=(',', ':')).encode()).decode()
+
+
+def decode_next_token(next_token: str) -> dict:
+    """Decode a `nextToken` into a dictionary of stream keys and the sort key to continue from."""
+    return json.loads(base64.b64decode(next_token.encode()).decode())
+
+
+def selects(selection_set: list, field: str) -> bool:
+    """Return whether a selection set selects a field, e.g. 'items' for ['items/id', 'items/make']."""
+    return any(set_item == field or set_item.startswith(f'{field}/') for set_item in selection_set)
+
+
+def selected_item_attributes(selection_set: list, derived_attributes: tuple = ()) -> list:
+    """
+    Return the item attributes in a selection set, without the ones that aren't stored.
+
+    `selection_set` looks like this:
+    [
+        "resultCount",
+        "nextToken",
+        "items",
+        "items/id",
+        "items/make",
+        "items/model"
+    ]
+    We only want the selection set items with the prefix 'items/', and we want the prefix stripped.
+    """
+    return [
+        set_item[len('items/'):] for set_item in selection_set
+        if set_item.startswith('items/') and set_item[len('items/'):] not in derived_attributes
+    ]
+
+
+def project_items(items: list, attributes: list) -> list:
+    """
+    Return the items with only the given attributes, or the items as they are if `attributes` is None.
+
+    Attributes like the sort key are projected for internal use, e.g. to merge the streams. Only
+    the attributes the client selected are returned.
+    """
+    if attributes is None:
+        return items
+    return [
+        {item_key: item_value for item_key, item_value in item.items() if item_key in attributes}
+        for item in items
+    ]
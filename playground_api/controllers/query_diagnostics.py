@@ -0,0 +1,102 @@
+"""
+The query_diagnostics module contains the QueryDiagnostics class.
+
+When a client selects the diagnostics of getCars or getBooks, the InventoryController records
+how the page was read: the access path and the expressions it used, and the sum of every
+DynamoDB response. See the QueryDiagnostics type in the schema.
+"""
+# Standard library imports
+import threading
+
+# Related third party imports
+# -
+
+# Local application/library specific imports
+from controllers.expression_compiler import render_condition, render_expression
+
+
+class QueryDiagnostics:
+    """The QueryDiagnostics describe how a single InventoryController._read_items() call read its items."""
+
+    def __init__(self) -> None:
+        """Initialize empty QueryDiagnostics."""
+        self.values = {
+            'accessPath': 'NONE',
+            'indexName': None,
+            'streams': [],
+            'keyConditions': [],
+            'select': None,
+            'limit': None,
+            'filterExpression': None,
+            'projectionExpression': None,
+            'pages': 0,
+            'scannedCount': 0,
+            'count': 0,
+            'consumedCapacity': 0.0,
+            'resultCache': None,
+        }
+        self._lock = threading.Lock()
+
+    def describe_plan(self, stream_keys: list, ngram_stream_key: str) -> None:
+        """Describe the access path chosen by InventoryController._plan_query()."""
+        if stream_keys == [ngram_stream_key]:
+            self.values.update({'accessPath': 'NGRAM_INDEX', 'streams': stream_keys})
+        elif '=' in stream_keys[0]:
+            # An index query, e.g. 'make=Tesla'
+            self.values.update({
+                'accessPath': 'INDEX',
+                'indexName': f"{stream_keys[0].split('=', 1)[0]}-index",
+                'streams': stream_keys,
+            })
+        else:
+            self.values.update({'accessPath': 'TABLE', 'streams': stream_keys})
+
+    def describe_request(self, request_params: dict) -> None:
+        """Describe the Select, Limit and expressions of the requests that read the items."""
+        self.values.update({
+            'select': request_params.get('Select', 'ITEMS'),
+            'limit': request_params.get('Limit'),
+            'filterExpression': render_expression(
+                request_params.get('FilterExpression'),
+                request_params.get('ExpressionAttributeNames'),
+                request_params.get('ExpressionAttributeValues'),
+            ),
+            'projectionExpression': render_expression(
+                request_params.get('ProjectionExpression'),
+                request_params.get('ExpressionAttributeNames'),
+            ),
+        })
+
+    def record(self, ddb_response: dict, key_condition=None) -> None:
+        """
+        Add a DynamoDB response to the diagnostics.
+
+        Queries report their ScannedCount and Count. For a BatchGetItem, both are the number of
+        items returned. The key conditions are rendered and listed once. This is called from the
+        threads that query the streams in parallel, so the diagnostics are updated with a lock.
+        """
+        consumed_capacity = ddb_response.get('ConsumedCapacity') or []
+        # A Query returns one ConsumedCapacity, a BatchGetItem a list
+        if isinstance(consumed_capacity, dict):
+            consumed_capacity = [consumed_capacity]
+        if 'Responses' in ddb_response:
+            scanned_count = count = sum(len(items) for items in ddb_response['Responses'].values())
+        else:
+            scanned_count, count = ddb_response.get('ScannedCount', 0), ddb_response.get('Count', 0)
+        rendered_key_condition = render_condition(key_condition, is_key_condition=True) if key_condition else None
+
+        with self._lock:
+            self.values['pages'] += 1
+            self.values['scannedCount'] += scanned_count
+            self.values['count'] += count
+            self.values['consumedCapacity'] += sum(
+                float(capacity.get('CapacityUnits', 0)) for capacity in consumed_capacity
+            )
+            if rendered_key_condition and rendered_key_condition not in self.values['keyConditions']:
+                self.values['keyConditions'].append(rendered_key_condition)
+
+    def result(self) -> dict:
+        """Return the diagnostics for the result of the call."""
+        # The streams are queried in parallel, so sort the key conditions for a stable order
+        self.values['keyConditions'].sort()
+        return self.values
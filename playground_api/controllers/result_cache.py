@@ -0,0 +1,86 @@
+"""
+The ResultCache module contains the ResultCache class and the cache shared by a Lambda container.
+
+getCars and getBooks are read far more often than items are added, and clients request the same
+pages over and over. The InventoryController keeps query results in this cache. Every entry is
+stored with the inventory version it was read at: when items are added, the version is
+incremented and older entries are no longer served.
+"""
+# Standard library imports
+import os
+import time
+from collections import OrderedDict
+
+# Related third party imports
+# -
+
+# Local application/library specific imports
+# -
+
+
+class ResultCache:
+    """The ResultCache is an in-process LRU cache with a time to live and versioned entries."""
+
+    def __init__(self, max_size: int, ttl: float) -> None:
+        """Initialize a ResultCache with at most `max_size` entries that expire after `ttl` seconds."""
+        self.max_size = max_size
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._entries = OrderedDict()
+
+    @property
+    def enabled(self) -> bool:
+        """Return whether the cache stores anything at all."""
+        return self.max_size > 0
+
+    def get(self, key, version: int):
+        """Return the cached value for `key` if it was stored at `version` and hasn't expired, or None."""
+        entry = self._entries.get(key)
+        if entry is None:
+            self.misses += 1
+            return None
+
+        entry_version, stored_at, value = entry
+        if entry_version != version or time.monotonic() - stored_at > self.ttl:
+            # The inventory changed since this entry was stored, or the entry expired
+            del self._entries[key]
+            self.misses += 1
+            return None
+
+        # Mark the entry as most recently used
+        self._entries.move_to_end(key)
+        self.hits += 1
+        return value
+
+    def put(self, key, version: int, value) -> None:
+        """Store a value for `key`, read at the given inventory version."""
+        if not self.enabled:
+            return
+        self._entries[key] = (version, time.monotonic(), value)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_size:
+            # Remove the least recently used entry
+            self._entries.popitem(last=False)
+            self.evictions += 1
+
+    def clear(self) -> None:
+        """Remove all entries, but keep the counters."""
+        self._entries.clear()
+
+    def stats(self) -> dict:
+        """Return the hit, miss and eviction counters and the current size of the cache."""
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'evictions': self.evictions,
+            'size': len(self._entries),
+        }
+
+
+# The cache shared by all invocations of a Lambda container
+RESULT_CACHE = ResultCache(
+    max_size=int(os.environ.get('INVENTORY_RESULT_CACHE_SIZE', '128')),
+    ttl=float(os.environ.get('INVENTORY_RESULT_CACHE_TTL', '60')),
+)
@@ -0,0 +1,114 @@
+"""
+The time_ordered_ids module generates and decodes time-ordered item ids (ULIDs).
+
+A ULID is a 128 bit id: a 48 bit timestamp in milliseconds followed by 80 random bits, encoded
+as 26 characters of Crockford's base32, e.g. '01F1K6BQ2W8X7RZ5NVMD3JHT0A'. The timestamp comes
+first and every character sorts in the same order as its value, so sort keys like 'CAR#<ulid>'
+are sorted by the time the item was added. A range of dateAdded values therefore becomes a range
+of sort keys, which DynamoDB resolves with a key condition instead of a filter.
+"""
+# Standard library imports
+import os
+import re
+from datetime import datetime, timezone
+
+# Related third party imports
+# -
+
+# Local application/library specific imports
+# -
+
+# Crockford's base32 leaves out I, L, O and U, and sorts in the same order as its values
+ENCODING = '0123456789ABCDEFGHJKMNPQRSTVWXYZ'
+DECODING = {character: value for value, character in enumerate(ENCODING)}
+
+ULID_LENGTH = 26
+TIMESTAMP_LENGTH = 10
+RANDOM_BITS = 80
+# The largest timestamp a ULID can hold, in the year 10889
+MAX_TIMESTAMP = 2 ** 48 - 1
+
+# An AWSDateTime: the seconds and the fraction of a second are optional, the time zone isn't
+AWS_DATETIME = re.compile(
+    r'(?P<date>\d{4}-\d{2}-\d{2})T(?P<time>\d{2}:\d{2})(?::(?P<seconds>\d{2})(?:\.(?P<fraction>\d+))?)?'
+    r'(?P<offset>Z|[+-]\d{2}:\d{2}(?::\d{2})?)'
+)
+
+
+def new_ulid(timestamp: datetime) -> str:
+    """Return a new ULID for the given time, with random bits to make it unique."""
+    randomness = int.from_bytes(os.urandom(RANDOM_BITS // 8), 'big')
+    return encode((timestamp_ms(timestamp) << RANDOM_BITS) | randomness)
+
+
+def encode(value: int) -> str:
+    """Encode a 128 bit integer as a ULID."""
+    characters = []
+    for _ in range(ULID_LENGTH):
+        characters.append(ENCODING[value & 31])
+        value >>= 5
+    return ''.join(reversed(characters))
+
+
+def decode(ulid: str) -> int:
+    """Decode a ULID into its 128 bit integer value. Raises a ValueError for an invalid ULID."""
+    if not is_ulid(ulid):
+        raise ValueError(f'Invalid ULID: {ulid}')
+    value = 0
+    for character in ulid:
+        value = (value << 5) | DECODING[character]
+    return value
+
+
+def is_ulid(item_id: str) -> bool:
+    """Return whether an id is a ULID, rather than the uuid4 of an item added before time-ordered ids."""
+    return len(item_id) == ULID_LENGTH and all(character in DECODING for character in item_id)
+
+
+def random_part(ulid: str) -> int:
+    """Return the 80 random bits of a ULID, which spread the items evenly over the shards."""
+    return decode(ulid) & (2 ** RANDOM_BITS - 1)
+
+
+def timestamp_ms(timestamp: datetime) -> int:
+    """Return a time as milliseconds since the epoch. A time without a time zone is in UTC."""
+    if timestamp.tzinfo is None:
+        timestamp = timestamp.replace(tzinfo=timezone.utc)
+    return int(timestamp.timestamp() * 1000)
+
+
+def parse_datetime(value: str) -> datetime:
+    """
+    Parse an AWSDateTime (an ISO 8601 date and time, e.g. '2021-03-22T10:51:41.386Z').
+
+    Before Python 3.11, datetime.fromisoformat() only accepts a fraction of 3 or 6 digits and no
+    'Z' suffix, so the value is normalized first. Raises a ValueError for an invalid value.
+    """
+    match = AWS_DATETIME.fullmatch(value)
+    if not match:
+        raise ValueError(f'Invalid AWSDateTime: {value}')
+    # Microseconds are the smallest unit of a datetime, so more digits are truncated
+    fraction = (match.group('fraction') or '').ljust(6, '0')[:6]
+    offset = '+00:00' if match.group('offset') == 'Z' else match.group('offset')
+    return datetime.fromisoformat(
+        f'{match.group("date")}T{match.group("time")}:{match.group("seconds") or "00"}.{fraction}{offset}'
+    )
+
+
+def ulid_range(added_after: datetime = None, added_before: datetime = None) -> tuple:
+    """
+    Return the smallest and largest ULID of the items added strictly between two times.
+
+    The bounds are the timestamps just inside the range, followed by the smallest or the largest
+    random part. Without `added_after` the range starts at the epoch, without `added_before` it
+    runs until the largest timestamp. Returns None if no item can be added in the range.
+    """
+    lower_timestamp = max(timestamp_ms(added_after) + 1, 0) if added_after else 0
+    upper_timestamp = min(timestamp_ms(added_before) - 1, MAX_TIMESTAMP) if added_before else MAX_TIMESTAMP
+    if lower_timestamp > upper_timestamp:
+        return None
+    random_length = ULID_LENGTH - TIMESTAMP_LENGTH
+    return (
+        encode(lower_timestamp << RANDOM_BITS)[:TIMESTAMP_LENGTH] + ENCODING[0] * random_length,
+        encode(upper_timestamp << RANDOM_BITS)[:TIMESTAMP_LENGTH] + ENCODING[-1] * random_length,
+    )
@@ -1,35 +1,100 @@
 """Lambda handler for deployment functions."""
 
 # Standard library imports
-# -
+import json
 
 # Related third party imports
 # -
 
 # Local application/library specific imports
+from controllers.instrumentation import instrument_handler
 from controllers.inventory_controller import InventoryController
 
 
+@instrument_handler('addBook')
 def handle_add_book(event, _context):
     """Add a book to DynamoDB."""
+    if isinstance(event, list):
+        # A BatchInvoke request from AppSync
+        return _batch_add_items('book', event)
     return _add_item('book', event)
 
 
+@instrument_handler('addCar')
 def handle_add_car(event, _context):
     """Add a car to DynamoDB."""
+    if isinstance(event, list):
+        # A BatchInvoke request from AppSync
+        return _batch_add_items('car', event)
     return _add_item('car', event)
 
 
+@instrument_handler('addBooks')
+def handle_add_books(event, _context):
+    """Add a list of books to DynamoDB."""
+    return _add_items('book', event)
+
+
+@instrument_handler('addCars')
+def handle_add_cars(event, _context):
+    """Add a list of cars to DynamoDB."""
+    return _add_items('car', event)
+
+
+@instrument_handler('getBooks')
 def handle_get_books(event, _context):
     """Get books from DynamoDB."""
+    if isinstance(event, list):
+        # A BatchInvoke request from AppSync
+        return _batch_get_items('book', event)
     return _get_items('book', event)
 
 
+@instrument_handler('getCars')
 def handle_get_cars(event, _context):
     """Get cars from DynamoDB."""
+    if isinstance(event, list):
+        # A BatchInvoke request from AppSync
+        return _batch_get_items('car', event)
     return _get_items('car', event)
 
 
+@instrument_handler('getBooksByIds')
+def handle_get_books_by_ids(event, _context):
+    """Get books by id from DynamoDB."""
+    if isinstance(event, list):
+        # A BatchInvoke request from AppSync
+        return _get_items_by_ids(['book'], event)
+    return _get_items_by_ids(['book'], [event])[0]
+
+
+@instrument_handler('getCarsByIds')
+def handle_get_cars_by_ids(event, _context):
+    """Get cars by id from DynamoDB."""
+    if isinstance(event, list):
+        # A BatchInvoke request from AppSync
+        return _get_items_by_ids(['car'], event)
+    return _get_items_by_ids(['car'], [event])[0]
+
+
+@instrument_handler('item')
+def handle_item(event, _context):
+    """Get an item of any type by id from DynamoDB."""
+    if isinstance(event, list):
+        # A BatchInvoke request from AppSync
+        return _get_items_by_ids(list(InventoryController.FILTERABLE_ATTRIBUTES), event)
+    return _get_items_by_ids(list(InventoryController.FILTERABLE_ATTRIBUTES), [event])[0]
+
+
+@instrument_handler('getInventory')
+def handle_get_inventory(event, _context):
+    """Get the items of all types from DynamoDB, sorted by the time they were added."""
+    if isinstance(event, list):
+        # A BatchInvoke request from AppSync
+        return [_get_inventory(single_event) for single_event in event]
+    return _get_inventory(event)
+
+
 def _add_item(item_type: str, event: dict) -> dict:
     """Add an Item (car or book) to DynamoDB."""
     # Retrieve the selection set provided by the client. This might look like this:
@@ -73,7 +138,7 @@ def _add_item(item_type: str, event: dict) -> dict:
 
         # `added_item` is a dictionary of item properties, e.g.:
         # {
-        #     "PK": "ITEM",
+        #     "PK": "ITEM#3",
         #     "SK": "CAR#b59ae8c5-12a6-4774-a3fe-a4a53bae2331",
         #     "id": "b59ae8c5-12a6-4774-a3fe-a4a53bae2331",
         #     "dateAdded": "2021-03-22T10:51:41.386Z",
@@ -99,6 +164,92 @@ def _add_item(item_type: str, event: dict) -> dict:
         }
 
 
+def _batch_add_items(item_type: str, events: list) -> list:
+    """
+    Add the Items (cars or books) of a BatchInvoke request with a single BatchWriteItem path.
+
+    Returns a response for every event, in the same order as `events`.
+    """
+    inventory_controller = InventoryController()
+    add_results = inventory_controller.add_items(
+        item_type=item_type,
+        items=[event['arguments'][item_type] for event in events]
+    )
+
+    responses = []
+    for event, add_result in zip(events, add_results):
+        if add_result['success']:
+            selection_set_list_item_keys = _selection_set_keys(event['selectionSetList'], f'{item_type}/')
+            responses.append({
+                'success': True,
+                item_type: _prune_item(add_result['item'], selection_set_list_item_keys)
+            })
+        else:
+            responses.append({
+                'success': False,
+                'error_type': add_result['error_type'],
+                'error': add_result['error'],
+            })
+    return responses
+
+
+def _add_items(item_type: str, event: dict) -> dict:
+    """Add a list of Items (cars or books) to DynamoDB with BatchWriteItem."""
+    # The selectionSetList of a batch mutation has an extra level, e.g.:
+    # "selectionSetList": [
+    #     "results",
+    #     "results/success",
+    #     "results/car",
+    #     "results/car/id",
+    #     "results/car/make",
+    #     "successCount"
+    # ]
+    # Like in _add_item(), we only return the item values the client is querying.
+    selection_set_list = event['selectionSetList']
+    selection_set_list_item_keys = _selection_set_keys(selection_set_list, f'results/{item_type}/')
+
+    # Instantiate a new InventoryController
+    inventory_controller = InventoryController()
+
+    # Add the items to the inventory. `event['arguments']` might look like this:
+    # {
+    #     "arguments": {
+    #         "cars": [
+    #             {"make": "Tesla", "model": "Model 3"},
+    #             {"make": "Volkswagen", "model": "ID.3", "color": "white"}
+    #         ]
+    #     }
+    # }
+    add_results = inventory_controller.add_items(
+        item_type=item_type,
+        items=event['arguments'][f'{item_type}s']
+    )
+
+    # Build a response for every item, based on the selectionSetList. A failed item
+    # doesn't fail the whole mutation, its error is reported in its own result.
+    results = []
+    for add_result in add_results:
+        if add_result['success']:
+            results.append({
+                'success': True,
+                item_type: _prune_item(add_result['item'], selection_set_list_item_keys)
+            })
+        else:
+            results.append({
+                'success': False,
+                'errorType': add_result['error_type'],
+                'error': add_result['error'],
+            })
+
+    success_count = sum(1 for result in results if result['success'])
+    return {
+        'success': True,
+        'results': results,
+        'successCount': success_count,
+        'failureCount': len(results) - success_count,
+    }
+
+
 def _get_items(item_type: str, event: dict) -> dict:
     """Get items from DynamoDB."""
     # Create a new dictionary with the 'selection_set' and 'arguments'
@@ -117,3 +268,141 @@ def _get_items(item_type: str, event: dict) -> dict:
         'success': True,
         **found_items
     }
+
+
+def _get_inventory(event: dict) -> dict:
+    """Get the items of all types from DynamoDB."""
+    inventory_controller = InventoryController()
+    found_items = inventory_controller.get_inventory(params={
+        'selection_set': event['selectionSetList'],
+        **event['arguments'],
+    })
+
+    return {
+        'success': True,
+        **found_items
+    }
+
+
+def _get_items_by_ids(item_types: list, events: list) -> list:
+    """
+    Get the items by id for a list of events, with a single ItemLoader.
+
+    The ids of all events are queued first, so they're fetched together: every id is read once,
+    in parallel BatchGetItem calls, with the union of the selection sets of the events. An event
+    has an `ids` argument (getCarsByIds, getBooksByIds) or an `id` argument (item). Returns a
+    response for every event, in the same order as `events`: a list of items in the order of the
+    ids (None for an id that doesn't exist), or a single item (or None).
+    """
+    # The selectionSetList of a list or a single item, e.g. ["id", "make", "model"]
+    selection_set = sorted({set_item for event in events for set_item in event['selectionSetList']})
+    item_loader = InventoryController().item_loader(item_types, selection_set)
+    for event in events:
+        arguments = event['arguments']
+        item_loader.load_many(arguments['ids'] if 'ids' in arguments else [arguments['id']])
+
+    responses = []
+    for event in events:
+        # AppSync needs the __typename to resolve an Item interface, so it's always returned
+        selection_set_keys = event['selectionSetList'] + ['__typename']
+        if 'ids' in event['arguments']:
+            responses.append([
+                _prune_item(item, selection_set_keys) if item else None
+                for item in item_loader.get_many(event['arguments']['ids'])
+            ])
+        else:
+            item = item_loader.get(event['arguments']['id'])
+            responses.append(_prune_item(item, selection_set_keys) if item else None)
+    return responses
+
+
+def _batch_get_items(item_type: str, events: list) -> list:
+    """
+    Get items for all events of a BatchInvoke request.
+
+    Events with the same arguments (filter, limit and nextToken) only differ in the fields they
+    select, so they're served with a single get_items() call that projects the union of their
+    selection sets. The result is then pruned to the selection set of every event. A group that
+    fails (e.g. because of an invalid nextToken) doesn't fail the events of the other groups: its
+    events get a response with its error, like a failed _add_item().
+    Returns a response for every event, in the same order as `events`.
+    """
+    # Group the indexes of the events by their arguments
+    event_groups = {}
+    for index, event in enumerate(events):
+        group_key = json.dumps(event['arguments'], sort_keys=True)
+        event_groups.setdefault(group_key, []).append(index)
+
+    responses = [None] * len(events)
+    for event_indexes in event_groups.values():
+        group_selection_set = sorted({
+            set_item for index in event_indexes for set_item in events[index]['selectionSetList']
+        })
+        try:
+            group_response = _get_items(item_type, {
+                'arguments': events[event_indexes[0]]['arguments'],
+                'selectionSetList': group_selection_set,
+            })
+        except Exception as exc:  # pylint: disable=broad-except
+            for index in event_indexes:
+                responses[index] = {
+                    'success': False,
+                    'error_type': type(exc).__name__,
+                    'error': str(exc),
+                }
+            continue
+
+        for index in event_indexes:
+            selection_set_list_item_keys = _selection_set_keys(events[index]['selectionSetList'], 'items/')
+            responses[index] = {
+                **group_response,
+                'items': [
+                    _prune_item(item, selection_set_list_item_keys) for item in group_response['items']
+                ],
+            }
+    return responses
+
+
+def _selection_set_keys(selection_set_list: list, prefix: str) -> list:
+    """Return the keys in the selection set that start with `prefix`, without the prefix."""
+    return [
+        set_item[len(prefix):] for set_item in selection_set_list if set_item.startswith(prefix)
+    ]
+
+
+def _prune_item(item: dict, keys: list) -> dict:
+    """Return a copy of `item` that only contains the given keys."""
+    return {
+        item_key: item_value for item_key, item_value in item.items() if item_key in keys
+    }
+
+
+# The handler of every field, used by the router function of a LambdaRouter
+FIELD_HANDLERS = {
+    'addBook': handle_add_book,
+    'addCar': handle_add_car,
+    'addBooks': handle_add_books,
+    'addCars': handle_add_cars,
+    'getBooks': handle_get_books,
+    'getBooksByIds': handle_get_books_by_ids,
+    'getCars': handle_get_cars,
+    'getCarsByIds': handle_get_cars_by_ids,
+    'getInventory': handle_get_inventory,
+    'item': handle_item,
+}
+
+
+def handle_request(event, context):
+    """Route a request of any field to the handler of that field, based on its info.fieldName."""
+    if isinstance(event, list):
+        # A BatchInvoke request from AppSync, in which all events are for the same field
+        if not event:
+            return []
+        field_name = event[0]['info']['fieldName']
+    else:
+        field_name = event['info']['fieldName']
+
+    handler = FIELD_HANDLERS.get(field_name)
+    if handler is None:
+        raise ValueError(f'No handler for field {field_name}')
+    return handler(event, context)
@@ -0,0 +1,99 @@
+"""
+Shared fixtures of the tests.
+
+The controllers run against an inventory table in a mocked DynamoDB (moto), so the tests don't
+need AWS credentials or a deployed stack. Run them from the repository root with `pytest`.
+"""
+# Standard library imports
+import os
+import sys
+import uuid
+from datetime import datetime, timezone
+
+# Related third party imports
+import boto3
+import pytest
+
+try:
+    from moto import mock_aws
+except ImportError:  # moto < 5
+    from moto import mock_dynamodb2 as mock_aws
+
+# The controllers are imported the way the Lambda functions import them, from playground_api
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.realpath(__file__))), 'playground_api'))
+
+# The result cache and the metrics are configured when their modules are imported. Every test
+# has to read DynamoDB, and the metrics would only clutter the output.
+os.environ['INVENTORY_RESULT_CACHE_SIZE'] = '0'
+os.environ['INVENTORY_METRICS'] = 'false'
+
+# Local application/library specific imports
+from controllers import aws_clients  # noqa: E402 pylint: disable=wrong-import-position
+
+TABLE_NAME = 'inventory'
+SHARD_COUNT = 4
+
+
+@pytest.fixture
+def inventory_table(monkeypatch):
+    """Create the inventory table in a mocked DynamoDB, and point the controllers to it."""
+    monkeypatch.setenv('AWS_DEFAULT_REGION', 'eu-west-1')
+    monkeypatch.setenv('AWS_ACCESS_KEY_ID', 'testing')
+    monkeypatch.setenv('AWS_SECRET_ACCESS_KEY', 'testing')
+    monkeypatch.delenv('AWS_PROFILE', raising=False)
+    monkeypatch.delenv('INVENTORY_DYNAMODB_ENDPOINT', raising=False)
+    monkeypatch.setenv('INVENTORY_TABLE', TABLE_NAME)
+    monkeypatch.setenv('INVENTORY_SHARD_COUNT', str(SHARD_COUNT))
+
+    with mock_aws():
+        # The shared clients of a previous test belong to the mock of that test
+        _clear_aws_clients()
+        table = boto3.resource('dynamodb').create_table(
+            TableName=TABLE_NAME,
+            KeySchema=[
+                {'AttributeName': 'PK', 'KeyType': 'HASH'},
+                {'AttributeName': 'SK', 'KeyType': 'RANGE'},
+            ],
+            AttributeDefinitions=[
+                {'AttributeName': 'PK', 'AttributeType': 'S'},
+                {'AttributeName': 'SK', 'AttributeType': 'S'},
+            ],
+            BillingMode='PAY_PER_REQUEST',
+        )
+        yield table
+        _clear_aws_clients()
+
+
+@pytest.fixture
+def add_legacy_items(inventory_table):  # pylint: disable=redefined-outer-name
+    """
+    Return a function that stores items in the unsharded 'ITEM' partition.
+
+    These are the rows written before the table was sharded: they have a uuid4 id and no
+    n-gram index entries or counters. The function returns the stored items.
+    """
+    def add(item_type: str, items: list) -> list:
+        stored_items = []
+        with inventory_table.batch_writer() as batch:
+            for item in items:
+                item_id = str(uuid.uuid4())
+                item_data = {
+                    'PK': 'ITEM',
+                    'SK': f'{item_type.upper()}#{item_id}',
+                    'id': item_id,
+                    'dateAdded': datetime.now(timezone.utc).strftime('%Y-%m-%dT%H:%M:%S.%f')[:-3] + 'Z',
+                    **item,
+                }
+                batch.put_item(Item=item_data)
+                stored_items.append(item_data)
+        return stored_items
+
+    return add
+
+
+def _clear_aws_clients() -> None:
+    """Forget the shared clients, so the next controller creates them in the current mock."""
+    aws_clients.dynamodb_resource.cache_clear()
+    aws_clients.dynamodb_client.cache_clear()
+    aws_clients.dynamodb_table.cache_clear()
+    aws_clients.appsync_client.cache_clear()
@@ -0,0 +1,106 @@
+"""Tests for adding items with BatchWriteItem, when DynamoDB only processes part of a batch."""
+# Standard library imports
+# -
+
+# Related third party imports
+import pytest
+from boto3.dynamodb.conditions import Key
+
+# Local application/library specific imports
+from controllers import aws_clients
+from controllers.inventory_controller import InventoryController
+
+
+@pytest.fixture(name='batch_write_requests')
+def fixture_batch_write_requests(inventory_table, monkeypatch) -> list:
+    """
+    Make BatchWriteItem return the items with an 'unprocessed' attribute as UnprocessedItems.
+
+    An item with {"unprocessed": 2} is returned unprocessed twice, and written the third time it's
+    sent. The requests of every BatchWriteItem call are recorded in the returned list.
+    """
+    resource = aws_clients.dynamodb_resource()
+    batch_write_item = resource.batch_write_item
+    batch_write_requests = []
+    attempts = {}
+
+    def partial_batch_write_item(RequestItems):  # pylint: disable=invalid-name
+        requests = RequestItems[inventory_table.name]
+        batch_write_requests.append(requests)
+        processed_requests, unprocessed_requests = [], []
+        for request in requests:
+            item = request['PutRequest']['Item']
+            attempts[item['SK']] = attempts.get(item['SK'], 0) + 1
+            if attempts[item['SK']] <= item.get('unprocessed', 0):
+                unprocessed_requests.append(request)
+            else:
+                processed_requests.append(request)
+        if processed_requests:
+            batch_write_item(RequestItems={inventory_table.name: processed_requests})
+        return {'UnprocessedItems': {inventory_table.name: unprocessed_requests} if unprocessed_requests else {}}
+
+    monkeypatch.setattr(resource, 'batch_write_item', partial_batch_write_item)
+    monkeypatch.setattr(InventoryController, 'BATCH_BACKOFF_BASE', 0)
+    return batch_write_requests
+
+
+def stored_items(table, item_type: str) -> list:
+    """Return all items of a type, from all shards."""
+    return [
+        item
+        for shard in range(InventoryController().shard_count)
+        for item in table.query(
+            KeyConditionExpression=Key('PK').eq(f'ITEM#{shard}') & Key('SK').begins_with(f'{item_type.upper()}#')
+        )['Items']
+    ]
+
+
+def test_unprocessed_items_are_retried(inventory_table, batch_write_requests):
+    """Only the unprocessed items are sent again, until DynamoDB has processed all of them."""
+    inventory_controller = InventoryController()
+
+    results = inventory_controller.add_items('car', [
+        {'make': 'Tesla'}, {'make': 'Volvo', 'unprocessed': 2}, {'make': 'Kia', 'unprocessed': 1},
+    ])
+
+    assert [result['success'] for result in results] == [True, True, True]
+    assert [
+        [request['PutRequest']['Item']['make'] for request in requests] for requests in batch_write_requests
+    ] == [['Tesla', 'Volvo', 'Kia'], ['Volvo', 'Kia'], ['Volvo']]
+    assert sorted(item['make'] for item in stored_items(inventory_table, 'car')) == ['Kia', 'Tesla', 'Volvo']
+    assert inventory_controller.read_total_count('car', None) == 3
+
+
+@pytest.mark.usefixtures('batch_write_requests')
+def test_items_that_stay_unprocessed_fail(inventory_table):
+    """Items that are still unprocessed after the last retry fail, and aren't counted."""
+    inventory_controller = InventoryController()
+
+    results = inventory_controller.add_items('car', [
+        {'make': 'Tesla'},
+        {'make': 'Volvo', 'unprocessed': inventory_controller.BATCH_MAX_RETRIES + 1},
+        {'make': 'Kia', 'unprocessed': inventory_controller.BATCH_MAX_RETRIES},
+    ] + [{'make': 'BMW'}] * 30)
+
+    assert [result['success'] for result in results] == [True, False, True] + [True] * 30
+    assert results[1]['error_type'] == 'RuntimeError'
+    assert 'Volvo' not in [item['make'] for item in stored_items(inventory_table, 'car')]
+    assert inventory_controller.read_total_count('car', None) == 32
+    # Both chunks of 25 items incremented the version
+    assert inventory_controller.read_version('car') == 2
+
+
+@pytest.mark.usefixtures('batch_write_requests')
+def test_failed_counter_update_keeps_the_items(inventory_table):
+    """The items are stored before they're counted, so a failed counter update doesn't fail them."""
+    inventory_controller = InventoryController()
+    # A counter that can't be incremented: ADD fails on a string
+    for shard in range(inventory_controller.shard_count):
+        inventory_table.put_item(Item={'PK': f'COUNT#{shard}', 'SK': 'CAR', 'itemCount': 'invalid'})
+
+    results = inventory_controller.add_items('car', [{'make': 'Tesla'}, {'make': 'Volvo', 'unprocessed': 1}])
+
+    assert [result['success'] for result in results] == [True, True]
+    assert sorted(item['id'] for item in stored_items(inventory_table, 'car')) == sorted(
+        result['item']['id'] for result in results
+    )
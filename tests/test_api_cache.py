@@ -0,0 +1,52 @@
+"""Tests for flushing the AppSync API cache when items are added."""
+# Standard library imports
+# -
+
+# Related third party imports
+import pytest
+from boto3.dynamodb.conditions import Key
+from botocore.stub import Stubber
+
+# Local application/library specific imports
+from controllers import aws_clients
+from controllers.api_cache import flush_api_cache
+from controllers.inventory_controller import InventoryController
+
+
+@pytest.fixture(name='appsync_stubber')
+def fixture_appsync_stubber(inventory_table, monkeypatch):  # pylint: disable=unused-argument
+    """Return a Stubber of the shared AppSync client, for an API with an API cache."""
+    # The client is created in the mocked AWS environment of the inventory table
+    monkeypatch.setenv('INVENTORY_API_CACHE_API_ID', 'api-id')
+    with Stubber(aws_clients.appsync_client()) as stubber:
+        yield stubber
+        stubber.assert_no_pending_responses()
+
+
+@pytest.mark.usefixtures('inventory_table')
+def test_no_flush_without_api_cache(monkeypatch):
+    """Without INVENTORY_API_CACHE_API_ID, there's no API cache to flush."""
+    monkeypatch.delenv('INVENTORY_API_CACHE_API_ID', raising=False)
+
+    assert flush_api_cache() is False
+
+
+def test_adding_items_flushes_the_api_cache(appsync_stubber):
+    """Every mutation flushes the cache once, so cached pages don't hide the added items."""
+    inventory_controller = InventoryController()
+    appsync_stubber.add_response('flush_api_cache', {}, {'apiId': 'api-id'})
+    appsync_stubber.add_response('flush_api_cache', {}, {'apiId': 'api-id'})
+
+    inventory_controller.add_item('car', {'make': 'Volvo'})
+    inventory_controller.add_items('car', [{'make': 'Kia'}] * 30)
+
+
+def test_failed_flush_doesnt_fail_the_mutation(inventory_table, appsync_stubber):
+    """The items are stored before the flush, so a failed flush only leaves the cache to expire."""
+    inventory_controller = InventoryController()
+    appsync_stubber.add_client_error('flush_api_cache', service_error_code='NotFoundException')
+
+    item = inventory_controller.add_item('car', {'make': 'Volvo'})
+
+    stored_items = inventory_table.query(KeyConditionExpression=Key('PK').eq(item['PK']))['Items']
+    assert [stored_item['id'] for stored_item in stored_items] == [item['id']]
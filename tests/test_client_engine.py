@@ -0,0 +1,121 @@
+"""Tests for the ClientTable read engine, against the Table resource it replaces."""
+# Standard library imports
+from decimal import Decimal
+
+# Related third party imports
+import pytest
+from boto3.dynamodb.conditions import Attr, Key
+from boto3.dynamodb.types import Binary
+
+# Local application/library specific imports
+from controllers.aws_clients import dynamodb_client
+from controllers.client_engine import ClientTable
+
+PARTITION_KEY = 'ROUND_TRIP'
+ITEMS = [
+    {'SK': 'ITEM#0', 'price': Decimal('12.5'), 'yearReleased': Decimal('2021'), 'mileage': Decimal('-0.001')},
+    {'SK': 'ITEM#1', 'large': Decimal('123456789012345678901234567890'), 'small': Decimal('1E-20')},
+    {
+        'SK': 'ITEM#2',
+        'specs': {'engine': {'power': Decimal('150.5'), 'electric': True}, 'seats': Decimal('5'), 'note': None},
+        'owners': [{'name': 'Ada', 'since': Decimal('2019')}, ['nested', Decimal('1.5')], []],
+    },
+    {
+        'SK': 'ITEM#3',
+        'colors': {'Black', 'Red'},
+        'ratings': {Decimal('4'), Decimal('4.5')},
+        'thumbnails': {b'\x00\x01', b'\x02'},
+    },
+    {'SK': 'ITEM#4', 'make': '', 'specs': {'note': ''}, 'owners': ['']},
+]
+
+
+@pytest.fixture(name='client_table')
+def fixture_client_table(inventory_table) -> ClientTable:
+    """Store the ITEMS in a partition of their own, and return a ClientTable of the inventory table."""
+    with inventory_table.batch_writer() as batch:
+        for item in ITEMS:
+            batch.put_item(Item={'PK': PARTITION_KEY, **item})
+    return ClientTable(dynamodb_client(), inventory_table.name)
+
+
+def plain_value(value):
+    """Convert a value of the Table resource to the value the ClientTable returns instead."""
+    if isinstance(value, Decimal):
+        return int(value) if value == value.to_integral_value() else float(value)
+    if isinstance(value, Binary):
+        return value.value
+    if isinstance(value, dict):
+        return {key: plain_value(nested_value) for key, nested_value in value.items()}
+    if isinstance(value, list):
+        return [plain_value(nested_value) for nested_value in value]
+    if isinstance(value, set):
+        return {plain_value(member) for member in value}
+    return value
+
+
+@pytest.mark.parametrize('params', [
+    {},
+    {'ProjectionExpression': '#sk, #specs, #owners', 'ExpressionAttributeNames': {
+        '#sk': 'SK', '#specs': 'specs', '#owners': 'owners',
+    }},
+    {'FilterExpression': Attr('price').eq(Decimal('12.5')) | Attr('make').eq('')},
+    {'FilterExpression': Attr('ratings').contains(Decimal('4')) | Attr('specs.engine.electric').eq(True)},
+])
+def test_query_returns_the_items_of_the_resource(inventory_table, client_table, params):
+    """Numbers, nested maps and lists, sets and empty strings are read the same way as with the resource."""
+    key_condition = Key('PK').eq(PARTITION_KEY)
+
+    client_items = client_table.query(KeyConditionExpression=key_condition, **params)['Items']
+    resource_items = inventory_table.query(KeyConditionExpression=key_condition, **params)['Items']
+
+    assert client_items == plain_value(resource_items)
+    assert client_items
+
+
+def test_numbers_have_their_schema_type(client_table):
+    """Numbers become the type of their attribute in the schema, or an int or float by their value."""
+    items = client_table.query(KeyConditionExpression=Key('PK').eq(PARTITION_KEY))['Items']
+
+    assert [(type(value), value) for value in (items[0]['price'], items[0]['yearReleased'], items[0]['mileage'])] == [
+        (float, 12.5), (int, 2021), (float, -0.001),
+    ]
+    assert items[1]['large'] == 123456789012345678901234567890
+    assert items[2]['specs']['seats'] == 5 and isinstance(items[2]['specs']['seats'], int)
+
+
+@pytest.mark.parametrize('limit', [1, 2, 4])
+def test_pagination_keys_round_trip(inventory_table, client_table, limit):
+    """The LastEvaluatedKey of a page is the ExclusiveStartKey of the next page, as with the resource."""
+    pages = {'client': [], 'resource': []}
+    for engine, table in (('client', client_table), ('resource', inventory_table)):
+        params = {'KeyConditionExpression': Key('PK').eq(PARTITION_KEY), 'Limit': limit}
+        while True:
+            ddb_response = table.query(**params)
+            pages[engine].append([ddb_response['Items'], ddb_response.get('LastEvaluatedKey')])
+            if 'LastEvaluatedKey' not in ddb_response:
+                break
+            params['ExclusiveStartKey'] = ddb_response['LastEvaluatedKey']
+
+    assert pages['client'] == plain_value(pages['resource'])
+    assert [item['SK'] for items, _ in pages['client'] for item in items] == [item['SK'] for item in ITEMS]
+
+
+def test_batch_get_item_returns_the_items_of_the_resource(inventory_table, client_table):
+    """A BatchGetItem returns the same items as with the resource, and takes the same keys and projection."""
+    table_request = {
+        'Keys': [{'PK': PARTITION_KEY, 'SK': item['SK']} for item in ITEMS] + [{'PK': PARTITION_KEY, 'SK': 'ITEM#9'}],
+        'ProjectionExpression': '#sk, #colors, #ratings, #thumbnails, #specs',
+        'ExpressionAttributeNames': {
+            '#sk': 'SK', '#colors': 'colors', '#ratings': 'ratings', '#thumbnails': 'thumbnails', '#specs': 'specs',
+        },
+    }
+
+    client_response = client_table.batch_get_item(RequestItems={inventory_table.name: table_request})
+    resource_response = inventory_table.meta.client.batch_get_item(RequestItems={inventory_table.name: table_request})
+
+    client_items = sorted(client_response['Responses'][inventory_table.name], key=lambda item: item['SK'])
+    resource_items = sorted(resource_response['Responses'][inventory_table.name], key=lambda item: item['SK'])
+    assert client_items == plain_value(resource_items)
+    assert len(client_items) == len(ITEMS)
+    assert client_response['UnprocessedKeys'] == {}
@@ -0,0 +1,376 @@
+"""
+Tests for the direct DynamoDB resolvers, against the InventoryController.
+
+The generated mapping templates (see tools/vtl_generator.py) are rendered with airspeed, a Python
+Velocity implementation, in an emulation of the AppSync pipeline: the request template, a query
+function per stream and the response template. Every case checks that the Query requests of the
+first page match those of the InventoryController (key condition, filter, projection and limit),
+and that paging through all pages returns the same items.
+"""
+# Standard library imports
+import base64
+import json
+import os
+import random
+import re
+from functools import lru_cache
+from urllib.parse import unquote
+
+# Related third party imports
+import pytest
+from boto3.dynamodb.types import TypeSerializer
+
+# Local application/library specific imports
+from controllers.aws_clients import dynamodb_client
+from controllers.client_engine import deserialize_item
+from controllers.expression_compiler import render_expression
+from controllers.inventory_controller import InventoryController
+
+airspeed = pytest.importorskip('airspeed')
+
+GRAPHQL_PATH = os.path.join(os.path.dirname(os.path.dirname(os.path.realpath(__file__))), 'graphql')
+
+# The item type and the scopes of every field with a direct resolver, like in AppSyncDataSources
+FIELDS = {
+    'getCars': ('car', ['scopes/items:read']),
+    'getBooks': ('book', ['scopes/items:read']),
+}
+
+# The resolver arguments and selection set of every case. The values of every filter operation
+# are sorted and unique, like the InventoryController compiles them, so the expressions are equal.
+CASES = [
+    ('getCars', {'limit': 10}, ['items', 'items/id', 'items/make', 'nextToken']),
+    ('getCars', {'limit': 7, 'filter': {'make': {'equalsOr': ['Tesla', 'Volvo']}}}, ['items/id', 'items/model']),
+    ('getCars', {'limit': 5, 'filter': {
+        'make': {'notEquals': ['Tesla', 'Volvo']},
+        'color': {'notContains': ['bl', 're']},
+    }}, ['items', 'items/id', 'items/color', 'items/make']),
+    ('getCars', {'limit': 3, 'filter': {'model': {'containsAnd': ['1', 'Model']}}}, ['items', 'items/model']),
+    # A filter that rarely matches, so streams return pages without matching items
+    ('getCars', {'limit': 2, 'filter': {'model': {'equalsOr': ['Model 7']}}}, ['items', 'items/id']),
+    ('getCars', {'filter': {'continentOfOrigin': {'equalsOr': ['ASIA']}}}, ['resultCount', 'nextToken']),
+    ('getBooks', {'limit': 25}, ['items', 'items/title', 'items/yearReleased']),
+    ('getBooks', {'limit': 4, 'filter': {'author': {'containsOr': ['Banks', 'Leckie']}}}, ['items/id']),
+]
+
+CAR_MAKES = ['Tesla', 'Volkswagen', 'Ford', 'Toyota', 'Kia', 'Volvo']
+CAR_COLORS = ['white', 'black', 'red', 'blue', 'silver']
+CONTINENTS = ['EUROPE', 'ASIA', 'NORTHAMERICA']
+BOOK_AUTHORS = ['Frank Herbert', 'Ursula K. Le Guin', 'Iain M. Banks', 'Ann Leckie', 'Liu Cixin']
+
+# The Java methods the templates call, which airspeed doesn't provide for the Python types
+JAVA_METHODS = {
+    dict: {
+        'size': len,
+        'containsKey': lambda self, key: key in self,
+    },
+    list: {
+        'isEmpty': lambda self: not self,
+    },
+    str: {
+        'compareTo': lambda self, other: (self > other) - (self < other),
+        'substring': lambda self, start, end=None: self[start:end],
+    },
+}
+
+
+class ReturnEarly(Exception):
+    """Raised by the AppSync #return directive: stop evaluating, and skip the data source of the function."""
+
+
+class AppSyncError(Exception):
+    """An error raised with $util.error() in a template."""
+
+
+class DynamoDBUtil:  # pylint: disable=too-few-public-methods
+    """The $util.dynamodb helpers used by the templates."""
+
+    def __init__(self) -> None:
+        """Initialize the DynamoDBUtil Class."""
+        self.serializer = TypeSerializer()
+
+    def toDynamoDB(self, value):  # pylint: disable=invalid-name
+        """Convert a value into the DynamoDB JSON format."""
+        return self.serializer.serialize(value)
+
+
+class AppSyncUtil:  # pylint: disable=invalid-name
+    """The $util helpers used by the templates, with the same names as in AppSync."""
+
+    def __init__(self) -> None:
+        """Initialize the AppSyncUtil Class."""
+        self.dynamodb = DynamoDBUtil()
+
+    @staticmethod
+    def qr(*_values):
+        """Evaluate the arguments without output."""
+        return ''
+
+    @staticmethod
+    def error(message, error_type=None):
+        """Fail the resolver."""
+        raise AppSyncError(f'{error_type}: {message}' if error_type else message)
+
+    @staticmethod
+    def returnEarly():
+        """Stop evaluating the template, like the #return directive it replaces."""
+        raise ReturnEarly()
+
+    @staticmethod
+    def toJson(value):
+        """Serialize a value to JSON."""
+        return json.dumps(value, separators=(',', ':'))
+
+    @staticmethod
+    def parseJson(value):
+        """Parse a JSON string."""
+        return json.loads(value)
+
+    @staticmethod
+    def base64Encode(value):
+        """Base64 encode a string."""
+        return base64.b64encode(value.encode()).decode()
+
+    @staticmethod
+    def base64Decode(value):
+        """Base64 decode a string."""
+        return base64.b64decode(value.encode()).decode()
+
+    @staticmethod
+    def urlDecode(value):
+        """URL decode a string."""
+        return unquote(value)
+
+    @staticmethod
+    def isNull(value):
+        """Return whether a value is null."""
+        return value is None
+
+    @staticmethod
+    def isMap(value):
+        """Return whether a value is a map."""
+        return isinstance(value, dict)
+
+    @staticmethod
+    def defaultIfNull(value, default):
+        """Return the value, or the default if it's null."""
+        return default if value is None else value
+
+
+@lru_cache(maxsize=None)
+def load_template(relative_path: str, placeholders: tuple = ()):
+    """Load and parse a generated template, and fill in its placeholders like AppSyncDataSources does."""
+    with open(os.path.join(GRAPHQL_PATH, relative_path), 'r', encoding='utf-8') as template_file:
+        template = template_file.read()
+    for placeholder, value in placeholders:
+        template = template.replace(placeholder, value)
+    # airspeed doesn't know the #return directive of AppSync
+    return airspeed.Template(re.sub(r'#return\b', '$util.returnEarly()', template))
+
+
+def render(template, context: dict) -> tuple:
+    """Render a template, and return its output and whether it returned early with #return."""
+    util = AppSyncUtil()
+    try:
+        return template.merge({'context': context, 'util': util, 'utils': util}), False
+    except airspeed.TemplateExecutionError as exc:
+        if isinstance(exc.__cause__, ReturnEarly):
+            return '', True
+        raise exc.__cause__
+
+
+class DirectResolver:  # pylint: disable=too-few-public-methods
+    """The DirectResolver emulates the AppSync pipeline resolver of a field."""
+
+    def __init__(self, field_name: str, stream_keys: list) -> None:
+        """Initialize the DirectResolver Class."""
+        item_type, required_scopes = FIELDS[field_name]
+        self.required_scopes = required_scopes
+        self.request_template = load_template(f'request_mapping_templates/get_{item_type}s_direct.vtl', (
+            ('{required_scopes}', "', '".join(required_scopes)),
+            ('{stream_keys}', ', '.join(json.dumps(stream_key) for stream_key in stream_keys)),
+        ))
+        self.response_template = load_template('response_mapping_templates/get_items_direct.vtl')
+        self.stream_templates = {
+            stream_key: (
+                load_template('request_mapping_templates/query_stream_direct.vtl', (('{stream_key}', stream_key),)),
+                load_template('response_mapping_templates/query_stream_direct.vtl', (('{stream_key}', stream_key),)),
+            )
+            for stream_key in stream_keys
+        }
+        # The Query requests sent to DynamoDB by the last resolve() call, per stream
+        self.query_requests = {}
+
+    def resolve(self, arguments: dict, selection_set_list: list) -> dict:
+        """Resolve the field like AppSync, and return the result."""
+        context = {
+            'arguments': arguments,
+            'args': arguments,
+            'identity': {'claims': {'scope': ' '.join(self.required_scopes)}},
+            'info': {'selectionSetList': selection_set_list},
+            'stash': {},
+        }
+        render(self.request_template, context)
+
+        self.query_requests = {}
+        for stream_key, (stream_request_template, stream_response_template) in self.stream_templates.items():
+            request, returned = render(stream_request_template, context)
+            if returned:
+                continue
+            self.query_requests[stream_key] = self._query_params(json.loads(request))
+            context['result'] = self._query(self.query_requests[stream_key])
+            render(stream_response_template, context)
+            del context['result']
+
+        return json.loads(render(self.response_template, context)[0])
+
+    @staticmethod
+    def _query_params(request: dict) -> dict:
+        """Return the parameters of the Query request of the DynamoDB data source."""
+        query_params = {
+            'TableName': os.environ['INVENTORY_TABLE'],
+            'KeyConditionExpression': request['query']['expression'],
+            'ExpressionAttributeNames': dict(request['query']['expressionNames']),
+            'ExpressionAttributeValues': dict(request['query']['expressionValues']),
+            'ProjectionExpression': request['projection']['expression'],
+        }
+        query_params['ExpressionAttributeNames'].update(request['projection']['expressionNames'])
+        if 'filter' in request:
+            query_params['FilterExpression'] = request['filter']['expression']
+            query_params['ExpressionAttributeNames'].update(request['filter']['expressionNames'])
+            query_params['ExpressionAttributeValues'].update(request['filter']['expressionValues'])
+        if 'limit' in request:
+            query_params['Limit'] = request['limit']
+        if 'nextToken' in request:
+            # The nextToken of AppSync is opaque, the emulation uses the encoded LastEvaluatedKey
+            query_params['ExclusiveStartKey'] = json.loads(base64.b64decode(request['nextToken']))
+        return query_params
+
+    @staticmethod
+    def _query(query_params: dict) -> dict:
+        """Send a Query request, and return its result like AppSync."""
+        ddb_response = dynamodb_client().query(**query_params)
+        last_evaluated_key = ddb_response.get('LastEvaluatedKey')
+        return {
+            'items': [deserialize_item(raw_item) for raw_item in ddb_response['Items']],
+            'nextToken': base64.b64encode(json.dumps(last_evaluated_key).encode()).decode()
+            if last_evaluated_key else None,
+            'scannedCount': ddb_response['ScannedCount'],
+        }
+
+
+@pytest.fixture(name='inventory_controller')
+def fixture_inventory_controller(inventory_table, monkeypatch):  # pylint: disable=unused-argument
+    """
+    Return an InventoryController that reads like the direct resolvers, with a deterministic inventory.
+
+    The direct resolvers always read a single round from the shards of the table.
+    """
+    monkeypatch.setenv('INVENTORY_FILL_PAGES', 'false')
+    monkeypatch.setenv('INVENTORY_READ_ENGINE', 'client')
+    for python_type, methods in JAVA_METHODS.items():
+        for method_name, method in methods.items():
+            monkeypatch.setitem(airspeed.__additional_methods__[python_type], method_name, method)
+
+    rng = random.Random(42)
+    inventory_controller = InventoryController()
+    inventory_controller.add_items('car', [
+        {
+            'make': rng.choice(CAR_MAKES),
+            'model': f'Model {rng.randint(1, 12)}',
+            'color': rng.choice(CAR_COLORS),
+            'continentOfOrigin': rng.choice(CONTINENTS),
+        }
+        for _ in range(40)
+    ])
+    inventory_controller.add_items('book', [
+        {
+            'title': f'Book {rng.randint(1, 10000)}',
+            'author': rng.choice(BOOK_AUTHORS),
+            'yearReleased': rng.randint(1950, 2021),
+        }
+        for _ in range(40)
+    ])
+    return inventory_controller
+
+
+def rendered_expressions(query_params: dict) -> dict:
+    """Render the expressions of a Query request, without their placeholders."""
+    names = query_params.get('ExpressionAttributeNames')
+    values = query_params.get('ExpressionAttributeValues')
+    return {
+        'key_condition': render_expression(query_params['KeyConditionExpression'], names, values),
+        'filter': render_expression(query_params.get('FilterExpression'), names, values),
+        'projection': render_expression(query_params.get('ProjectionExpression'), names),
+        'limit': query_params.get('Limit'),
+    }
+
+
+def read_all_pages(get_page) -> tuple:
+    """Follow the nextToken through all pages, and return the items and the summed resultCount."""
+    items, result_count, next_token = [], 0, None
+    while True:
+        page = get_page(next_token)
+        items.extend(page['items'])
+        result_count += page['resultCount']
+        next_token = page.get('nextToken')
+        if not next_token:
+            return items, result_count
+
+
+@pytest.mark.parametrize('field_name,arguments,selection_set_list', CASES)
+def test_first_page_queries_match(inventory_controller, field_name, arguments, selection_set_list):
+    """The Query requests of the first page equal those of the InventoryController."""
+    item_type, _required_scopes = FIELDS[field_name]
+    direct_resolver = DirectResolver(field_name, inventory_controller.partition_keys())
+    controller_requests = {}
+
+    def record_query(params, **_kwargs):
+        controller_requests[params['ExpressionAttributeValues'][':v0']['S']] = dict(params)
+
+    dynamodb_client().meta.events.register('provide-client-params.dynamodb.Query', record_query)
+    try:
+        inventory_controller.get_items({'item_type': item_type, 'selection_set': selection_set_list, **arguments})
+    finally:
+        dynamodb_client().meta.events.unregister('provide-client-params.dynamodb.Query', record_query)
+    direct_resolver.resolve(arguments, selection_set_list)
+
+    # The requests continuing a stream differ: the direct resolver continues with a key condition
+    # instead of an ExclusiveStartKey. When only counting, the controller doesn't project anything.
+    compared_streams = [
+        stream_key for stream_key, query_params in controller_requests.items() if 'Select' not in query_params
+    ]
+    assert sorted(direct_resolver.query_requests) == sorted(controller_requests)
+    for stream_key in compared_streams:
+        assert rendered_expressions(direct_resolver.query_requests[stream_key]) == rendered_expressions(
+            controller_requests[stream_key]
+        ), stream_key
+
+
+@pytest.mark.parametrize('field_name,arguments,selection_set_list', CASES)
+def test_all_pages_match(inventory_controller, field_name, arguments, selection_set_list):
+    """Paging through all pages returns the same items, in the same order, as the InventoryController."""
+    item_type, _required_scopes = FIELDS[field_name]
+    direct_resolver = DirectResolver(field_name, inventory_controller.partition_keys())
+
+    expected_items, expected_count = read_all_pages(lambda next_token: inventory_controller.get_items({
+        'item_type': item_type, 'selection_set': selection_set_list, **arguments, 'nextToken': next_token,
+    }))
+    items, result_count = read_all_pages(lambda next_token: direct_resolver.resolve(
+        {**arguments, 'nextToken': next_token}, selection_set_list,
+    ))
+
+    assert (items, result_count) == (expected_items, expected_count)
+    assert expected_count
+
+
+@pytest.mark.parametrize('arguments', [
+    {'newestFirst': True},
+    {'addedAfter': '2021-01-01T00:00:00Z'},
+])
+def test_unsupported_arguments_are_rejected(inventory_controller, arguments):
+    """The arguments only the Lambda path resolves fail the direct resolver."""
+    direct_resolver = DirectResolver('getCars', inventory_controller.partition_keys())
+
+    with pytest.raises(AppSyncError, match='UnsupportedArgument'):
+        direct_resolver.resolve(arguments, ['items', 'items/id'])
@@ -0,0 +1,73 @@
+"""Tests for compiling filters into expression strings, against the boto3 conditions they replace."""
+# Standard library imports
+# -
+
+# Related third party imports
+import pytest
+from boto3.dynamodb.conditions import Key
+
+# Local application/library specific imports
+from controllers.expression_compiler import FILTER_OPERATIONS, build_filter_condition, compile_filter_expression
+
+PARTITION_KEY = 'FILTER_TEST'
+CARS = [
+    {'make': 'Tesla', 'model': 'Model 3'},
+    {'make': 'Tesla', 'model': 'Model Y'},
+    {'make': 'Volkswagen', 'model': 'ID.3'},
+    {'make': 'Volvo', 'model': 'XC40'},
+    {'make': 'Kia', 'model': 'EV6'},
+    # Without a model: the negated operations match it, the others don't
+    {'make': 'Kia'},
+]
+OPERATION_VALUES = [['Tesla'], ['Tesla', 'Volvo'], ['esl', 'Vol'], ['o', 'l'], ['Model'], ['Polestar'], ['']]
+
+
+@pytest.fixture(name='filter_table')
+def fixture_filter_table(inventory_table):
+    """Return the inventory table with the CARS in a partition of their own."""
+    with inventory_table.batch_writer() as batch:
+        for index, car in enumerate(CARS):
+            batch.put_item(Item={'PK': PARTITION_KEY, 'SK': f'CAR#{index}', **car})
+    return inventory_table
+
+
+def filtered_keys(table, filter_params: dict) -> list:
+    """Return the sort keys of the CARS that match a filter, with the given filter parameters."""
+    return [
+        item['SK']
+        for item in table.query(KeyConditionExpression=Key('PK').eq(PARTITION_KEY), **filter_params)['Items']
+    ]
+
+
+@pytest.mark.parametrize('filter_dict', [
+    {filter_key: {filter_op: filter_op_values}}
+    for filter_op in FILTER_OPERATIONS
+    for filter_key in ('make', 'model')
+    for filter_op_values in OPERATION_VALUES
+] + [
+    {'make': {'containsOr': ['esl', 'Vol'], 'notEquals': ['Volvo']}, 'model': {'notContains': ['3']}},
+    {'make': {'equalsOr': ['Tesla', 'Kia'], 'containsAnd': ['e', 'a']}, 'model': {'containsOr': ['Model', 'EV']}},
+    {'make': {'notEquals': ['Tesla', 'Volvo']}, 'model': {'equalsOr': ['EV6', 'ID.3'], 'notContains': ['D']}},
+])
+def test_compiled_filter_matches_boto3_condition(filter_table, filter_dict):
+    """A compiled filter expression returns the same items as the boto3 condition of the same filter."""
+    compiled_filter = compile_filter_expression(filter_dict)
+
+    compiled_keys = filtered_keys(filter_table, compiled_filter)
+    condition_keys = filtered_keys(filter_table, {'FilterExpression': build_filter_condition(filter_dict)})
+
+    assert compiled_keys == condition_keys
+
+
+@pytest.mark.parametrize('filter_dict, expected_indexes', [
+    ({'make': {'containsOr': ['esl', 'Vol']}}, [0, 1, 2, 3]),
+    ({'make': {'containsAnd': ['o', 'l']}}, [2, 3]),
+    ({'model': {'notContains': ['Model', 'X']}}, [2, 4, 5]),
+    ({'make': {'equalsOr': ['Tesla', 'Kia']}}, [0, 1, 4, 5]),
+    ({'model': {'notEquals': ['Model 3', 'EV6']}}, [1, 2, 3, 5]),
+])
+def test_compiled_filter(filter_table, filter_dict, expected_indexes):
+    """Every operation of a compiled filter matches the expected items."""
+    assert filtered_keys(filter_table, compile_filter_expression(filter_dict)) == [
+        f'CAR#{index}' for index in expected_indexes
+    ]
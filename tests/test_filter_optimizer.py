@@ -0,0 +1,96 @@
+"""Tests for simplifying filters, and skipping DynamoDB for filters that can never match."""
+# Standard library imports
+# -
+
+# Related third party imports
+import pytest
+
+# Local application/library specific imports
+from controllers import aws_clients
+from controllers.filter_optimizer import optimize_filter
+from controllers.inventory_controller import InventoryController
+
+
+@pytest.mark.parametrize('filter_dict', [
+    {'make': {'equalsOr': ['Tesla'], 'notEquals': ['Tesla']}},
+    {'make': {'equalsOr': ['Tesla', 'Volvo'], 'notEquals': ['Volvo', 'Tesla']}},
+    {'make': {'equalsOr': ['Tesla']}, 'model': {'equalsOr': ['XC40'], 'notEquals': ['XC40']}},
+    {'make': {'equalsOr': ['Tesla'], 'containsAnd': ['Volvo']}},
+    {'make': {'containsAnd': ['Tesla'], 'notContains': ['esl']}},
+    {'make': {'containsOr': ['Tesla', 'Model S'], 'notContains': ['Tes', 'Mod']}},
+    {'continentOfOrigin': {'equalsOr': ['ATLANTIS']}},
+])
+def test_contradictory_filters_never_match(filter_dict):
+    """A filter with operations that contradict each other can't match any item."""
+    assert optimize_filter('car', filter_dict) == (None, False)
+
+
+@pytest.mark.parametrize('filter_dict, expected', [
+    ({'make': {'equalsOr': ['Tesla', 'Volvo', 'Tesla']}}, {'make': {'equalsOr': ['Tesla', 'Volvo']}}),
+    ({'make': {'notEquals': ['Volvo', 'Tesla', 'Volvo']}}, {'make': {'notEquals': ['Volvo', 'Tesla']}}),
+    ({'make': {'containsOr': ['esl', 'esl']}}, {'make': {'containsOr': ['esl']}}),
+    ({'make': {'notContains': ['Kia', 'Kia', 'Kia']}}, {'make': {'notContains': ['Kia']}}),
+])
+def test_repeated_values_are_removed(filter_dict, expected):
+    """Every value is kept once, in the order the client provided."""
+    assert optimize_filter('car', filter_dict) == (expected, True)
+
+
+@pytest.mark.parametrize('filter_dict, expected', [
+    # A term that contains another term of containsOr or notContains is redundant
+    ({'make': {'containsOr': ['Tesla', 'esl']}}, {'make': {'containsOr': ['esl']}}),
+    ({'make': {'notContains': ['Kia Motors', 'Kia']}}, {'make': {'notContains': ['Kia']}}),
+    # A term that's part of another term of containsAnd is redundant
+    ({'make': {'containsAnd': ['Tes', 'Tesla']}}, {'make': {'containsAnd': ['Tesla']}}),
+    # A containsOr term that contains an excluded term can't be the one that matches
+    ({'make': {'containsOr': ['Tesla', 'Volvo'], 'notContains': ['sla']}},
+     {'make': {'containsOr': ['Volvo'], 'notContains': ['sla']}}),
+    # With equalsOr, the other operations are resolved for its values
+    ({'make': {'equalsOr': ['Tesla', 'Volvo'], 'notEquals': ['Volvo']}}, {'make': {'equalsOr': ['Tesla']}}),
+    ({'make': {'equalsOr': ['Tesla', 'Volvo'], 'containsOr': ['esl']}}, {'make': {'equalsOr': ['Tesla']}}),
+    # An enum attribute never equals a value outside the enum
+    ({'continentOfOrigin': {'notEquals': ['ATLANTIS']}}, {}),
+    ({'continentOfOrigin': {'equalsOr': ['ATLANTIS', 'ASIA']}}, {'continentOfOrigin': {'equalsOr': ['ASIA']}}),
+    # Operations without values don't filter anything
+    ({'make': {'equalsOr': [], 'notEquals': None}, 'model': {'containsOr': ['XC']}}, {'model': {'containsOr': ['XC']}}),
+])
+def test_redundant_clauses_are_removed(filter_dict, expected):
+    """Operations and terms that don't change the result are removed from the filter."""
+    assert optimize_filter('car', filter_dict) == (expected, True)
+
+
+def test_no_filter():
+    """Without a filter, every item matches."""
+    assert optimize_filter('book', None) == ({}, True)
+
+
+@pytest.mark.usefixtures('inventory_table')
+@pytest.mark.parametrize('read_engine', ['resource', 'client'])
+def test_impossible_filter_skips_dynamodb(monkeypatch, read_engine):
+    """A filter that can never match returns an empty page without a single DynamoDB call."""
+    monkeypatch.setenv('INVENTORY_READ_ENGINE', read_engine)
+    inventory_controller = InventoryController()
+    inventory_controller.add_items('car', [{'make': 'Tesla', 'continentOfOrigin': 'NORTHAMERICA'}] * 3)
+
+    dynamodb_calls = []
+    for client in (aws_clients.dynamodb_resource().meta.client, aws_clients.dynamodb_client()):
+        client.meta.events.register(
+            'before-call.dynamodb', lambda model, **kwargs: dynamodb_calls.append(model.name)
+        )
+    params = {
+        'item_type': 'car',
+        'selection_set': ['items', 'items/make', 'resultCount', 'nextToken', 'totalCount'],
+    }
+
+    result = inventory_controller.get_items({
+        **params,
+        'filter': {'make': {'equalsOr': ['Tesla'], 'notEquals': ['Tesla']}},
+    })
+
+    assert result == {'items': [], 'resultCount': 0, 'nextToken': None, 'totalCount': 0}
+    assert not dynamodb_calls
+
+    # The same page with a filter that can match does read DynamoDB
+    result = inventory_controller.get_items({**params, 'filter': {'make': {'equalsOr': ['Tesla']}}})
+    assert result['resultCount'] == 3
+    assert 'Query' in dynamodb_calls
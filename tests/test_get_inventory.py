@@ -0,0 +1,104 @@
+"""Tests for reading the items of all item types in the order they were added, with get_inventory."""
+# Standard library imports
+import time
+
+# Related third party imports
+import pytest
+
+# Local application/library specific imports
+from controllers.inventory_controller import InventoryController
+
+SELECTION_SET = ['items', 'items/id', 'items/itemType', 'items/__typename', 'resultCount', 'nextToken']
+# The type of every added item, in the order they're added
+ITEM_TYPES = ['car', 'book', 'book', 'car', 'car', 'car', 'book', 'car', 'book', 'book', 'car', 'book']
+
+
+@pytest.fixture(name='inventory_controller')
+def fixture_inventory_controller(inventory_table, monkeypatch):  # pylint: disable=unused-argument
+    """Return an InventoryController that gives new items time-ordered ids."""
+    monkeypatch.setenv('INVENTORY_TIME_ORDERED_IDS', 'true')
+    return InventoryController()
+
+
+@pytest.fixture(name='added_items')
+def fixture_added_items(inventory_controller) -> list:
+    """Add cars and books in the order of ITEM_TYPES, each in a millisecond of its own, and return them."""
+    added_items = []
+    for index, item_type in enumerate(ITEM_TYPES):
+        item = {'make': f'Make {index}'} if item_type == 'car' else {'title': f'Title {index}'}
+        added_items.append(inventory_controller.add_item(item_type, item))
+        # Items added in the same millisecond are ordered by the random part of their id
+        time.sleep(0.002)
+    return added_items
+
+
+def read_all_pages(inventory_controller: InventoryController, params: dict) -> list:
+    """Read every page of the inventory by following the nextToken, and return the pages."""
+    pages = []
+    next_token = None
+    while True:
+        page = inventory_controller.get_inventory({**params, 'nextToken': next_token})
+        pages.append(page)
+        next_token = page['nextToken']
+        if not next_token:
+            return pages
+
+
+def test_item_types_are_interleaved(inventory_controller, added_items):
+    """The cars and books are merged into a single page, in the order they were added."""
+    page = inventory_controller.get_inventory({'selection_set': SELECTION_SET})
+
+    assert page['items'] == [
+        {'id': item['id'], 'itemType': item_type, '__typename': item_type.capitalize()}
+        for item, item_type in zip(added_items, ITEM_TYPES)
+    ]
+    assert page['resultCount'] == len(ITEM_TYPES)
+    assert page['nextToken'] is None
+
+
+@pytest.mark.parametrize('newest_first', [False, True])
+def test_next_token_continues_every_item_type(inventory_controller, added_items, newest_first):
+    """Following the nextToken returns every item exactly once, in order, whichever order is read."""
+    pages = read_all_pages(inventory_controller, {
+        'limit': 5,
+        'newestFirst': newest_first,
+        'selection_set': SELECTION_SET,
+    })
+
+    item_ids = [item['id'] for page in pages for item in page['items']]
+    expected_ids = [item['id'] for item in added_items]
+    assert item_ids == (expected_ids[::-1] if newest_first else expected_ids)
+    assert [page['resultCount'] for page in pages] == [5, 5, 2]
+
+
+def test_newest_first(inventory_controller, added_items):
+    """With newestFirst, the most recently added items of all types come first."""
+    page = inventory_controller.get_inventory({'limit': 3, 'newestFirst': True, 'selection_set': SELECTION_SET})
+
+    assert [item['id'] for item in page['items']] == [item['id'] for item in added_items[:-4:-1]]
+    assert [item['itemType'] for item in page['items']] == ['book', 'car', 'book']
+
+
+@pytest.mark.parametrize('bounds, expected_slice', [
+    ({'addedAfter': 3}, slice(4, None)),
+    ({'addedBefore': 8}, slice(None, 8)),
+    ({'addedAfter': 3, 'addedBefore': 8}, slice(4, 8)),
+    ({'addedAfter': 8, 'addedBefore': 3}, slice(0, 0)),
+])
+def test_added_after_and_before(inventory_controller, added_items, bounds, expected_slice):
+    """Only the items added strictly between addedAfter and addedBefore are returned, over all pages."""
+    # The bounds are the dateAdded of the added items with these indexes
+    params = {argument: added_items[index]['dateAdded'] for argument, index in bounds.items()}
+
+    pages = read_all_pages(inventory_controller, {**params, 'limit': 2, 'selection_set': SELECTION_SET})
+
+    assert [item['id'] for page in pages for item in page['items']] == [
+        item['id'] for item in added_items[expected_slice]
+    ]
+
+
+@pytest.mark.usefixtures('inventory_table')
+def test_requires_time_ordered_ids():
+    """Random uuid4 ids aren't ordered by time, so there's no inventory without time-ordered ids."""
+    with pytest.raises(ValueError, match='INVENTORY_TIME_ORDERED_IDS'):
+        InventoryController().get_inventory({'selection_set': SELECTION_SET})
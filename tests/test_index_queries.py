@@ -0,0 +1,100 @@
+"""Tests for resolving equalsOr filters with a global secondary index instead of the table."""
+# Standard library imports
+# -
+
+# Related third party imports
+import pytest
+
+# Local application/library specific imports
+from controllers.inventory_controller import InventoryController
+
+MAKES = ['Tesla', 'Volvo', 'Kia', 'BMW']
+COLORS = ['Red', 'Blue', 'Black']
+SELECTION_SET = ['items', 'items/id', 'items/make', 'items/color', 'resultCount', 'nextToken']
+
+
+@pytest.fixture(name='added_cars')
+def fixture_added_cars(inventory_table, monkeypatch) -> list:
+    """Add a 'make-index' to the inventory table, enable it, and add cars of every make and color."""
+    inventory_table.meta.client.update_table(
+        TableName=inventory_table.name,
+        AttributeDefinitions=[
+            {'AttributeName': 'make', 'AttributeType': 'S'},
+            {'AttributeName': 'SK', 'AttributeType': 'S'},
+        ],
+        GlobalSecondaryIndexUpdates=[{
+            'Create': {
+                'IndexName': 'make-index',
+                'KeySchema': [
+                    {'AttributeName': 'make', 'KeyType': 'HASH'},
+                    {'AttributeName': 'SK', 'KeyType': 'RANGE'},
+                ],
+                'Projection': {'ProjectionType': 'ALL'},
+            }
+        }],
+    )
+    monkeypatch.setenv('INVENTORY_INDEXED_ATTRIBUTES', 'make')
+    return [
+        result['item'] for result in InventoryController().add_items('car', [
+            {'make': MAKES[index % len(MAKES)], 'color': COLORS[index % len(COLORS)]} for index in range(48)
+        ])
+    ]
+
+
+def read_all_pages(inventory_controller: InventoryController, params: dict) -> list:
+    """Read every page of a query by following the nextToken, and return the pages."""
+    pages = []
+    next_token = None
+    while True:
+        page = inventory_controller.get_items({**params, 'nextToken': next_token})
+        pages.append(page)
+        next_token = page['nextToken']
+        if not next_token:
+            return pages
+
+
+def test_equals_or_is_served_from_the_index(added_cars):
+    """Every value of an equalsOr on an indexed attribute is a query on the index, merged in sort key order."""
+    result = InventoryController().get_items({
+        'item_type': 'car',
+        'filter': {
+            'make': {'equalsOr': ['Volvo', 'Tesla', 'Volvo'], 'notEquals': ['Kia']},
+            'color': {'equalsOr': ['Red', 'Black']},
+        },
+        'selection_set': SELECTION_SET + ['diagnostics', 'diagnostics/accessPath', 'diagnostics/streams'],
+    })
+
+    diagnostics = result['diagnostics']
+    assert (diagnostics['accessPath'], diagnostics['indexName']) == ('INDEX', 'make-index')
+    assert diagnostics['streams'] == ['make=Volvo', 'make=Tesla']
+    # Only the remaining filter on the color is applied to the items of the index
+    assert diagnostics['filterExpression'] == '(color = "Black" OR color = "Red")'
+
+    expected_cars = sorted(
+        (car for car in added_cars if car['make'] in ('Tesla', 'Volvo') and car['color'] in ('Red', 'Black')),
+        key=lambda car: car['SK'],
+    )
+    assert [car['id'] for car in result['items']] == [car['id'] for car in expected_cars]
+    assert result['resultCount'] == len(expected_cars) == 16
+
+
+@pytest.mark.parametrize('fill_pages', ['true', 'false'])
+@pytest.mark.parametrize('filter_dict', [
+    {'make': {'equalsOr': ['Kia']}},
+    {'make': {'equalsOr': ['BMW', 'Tesla', 'Kia']}, 'color': {'notEquals': ['Blue']}},
+    {'make': {'equalsOr': ['Tesla', 'Volvo']}, 'color': {'equalsOr': ['Black']}},
+])
+def test_index_pages_match_the_table(added_cars, monkeypatch, fill_pages, filter_dict):
+    """Paginating through the index returns the same items, in the same order, as the table."""
+    monkeypatch.setenv('INVENTORY_FILL_PAGES', fill_pages)
+    params = {'item_type': 'car', 'limit': 5, 'filter': filter_dict, 'selection_set': SELECTION_SET}
+
+    index_pages = read_all_pages(InventoryController(), params)
+    monkeypatch.setenv('INVENTORY_INDEXED_ATTRIBUTES', '')
+    table_pages = read_all_pages(InventoryController(), params)
+
+    index_items = [item for page in index_pages for item in page['items']]
+    table_items = [item for page in table_pages for item in page['items']]
+    assert index_items == table_items
+    assert len({item['id'] for item in index_items}) == len(index_items)
+    assert 0 < len(index_items) < len(added_cars)
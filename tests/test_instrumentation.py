@@ -0,0 +1,92 @@
+"""Tests for the metrics of the Lambda handlers, in the CloudWatch embedded metric format."""
+# Standard library imports
+import json
+
+# Related third party imports
+import pytest
+
+# Local application/library specific imports
+from controllers import instrumentation
+from controllers.result_cache import ResultCache
+
+
+@pytest.fixture
+def metrics_enabled(monkeypatch):
+    """Enable the metrics, which are disabled for the other tests, with a fresh Lambda container."""
+    monkeypatch.setattr(instrumentation, 'METRICS_ENABLED', True)
+    monkeypatch.setattr(instrumentation, 'INVOCATION_STATE', instrumentation.InvocationState())
+
+
+def read_log_lines(capsys) -> list:
+    """Return the log lines written to stdout, parsed as JSON."""
+    return [json.loads(line) for line in capsys.readouterr().out.splitlines()]
+
+
+@pytest.mark.usefixtures('metrics_enabled')
+def test_every_invocation_writes_a_log_line(capsys):
+    """Every invocation writes one JSON line, and only the first one is a cold start."""
+    handler = instrumentation.instrument_handler('getCars')(lambda event, context: {'success': True})
+
+    handler({'arguments': {'filter': {'make': {'equalsOr': ['Tesla']}}}}, None)
+    handler([{'arguments': {}}, {'arguments': {}}], None)
+
+    log_lines = read_log_lines(capsys)
+    assert [log_line['ColdStart'] for log_line in log_lines] == [1, 0]
+    assert [log_line['FilterShape'] for log_line in log_lines] == ['make:equalsOr', 'none']
+    assert all(log_line['FieldName'] == 'getCars' for log_line in log_lines)
+    assert log_lines[0]['_aws']['CloudWatchMetrics'][0]['Namespace'] == instrumentation.METRICS_NAMESPACE
+    assert instrumentation.INVOCATION_STATE.current_metrics is None
+
+
+@pytest.mark.usefixtures('metrics_enabled')
+def test_errors_are_counted(capsys):
+    """A raised exception and a response with success False both count as an error."""
+    def failing_handler(event, _context):
+        if event['raise']:
+            raise ValueError('Invalid event')
+        return {'success': False}
+
+    handler = instrumentation.instrument_handler('addCar')(failing_handler)
+
+    with pytest.raises(ValueError):
+        handler({'raise': True}, None)
+    handler({'raise': False}, None)
+
+    assert [log_line['Errors'] for log_line in read_log_lines(capsys)] == [1, 1]
+
+
+@pytest.mark.usefixtures('metrics_enabled')
+def test_errors_in_batch_responses_are_counted(capsys):
+    """Every failed event of a BatchInvoke response counts as an error."""
+    handler = instrumentation.instrument_handler('addCar')(lambda events, context: [
+        {'success': event['success']} for event in events
+    ])
+
+    handler([{'success': True}, {'success': False}, {'success': True}, {'success': False}], None)
+    handler([{'success': True}], None)
+    handler([], None)
+
+    assert [log_line['Errors'] for log_line in read_log_lines(capsys)] == [2, 0, 0]
+
+
+@pytest.mark.usefixtures('metrics_enabled')
+def test_result_cache_activity_per_invocation(capsys, monkeypatch):
+    """The hits, misses and evictions of the result cache are reported per invocation."""
+    result_cache = ResultCache(max_size=1, ttl=60)
+    monkeypatch.setattr(instrumentation, 'RESULT_CACHE', result_cache)
+
+    def caching_handler(event, _context):
+        for key in event['keys']:
+            if result_cache.get(key, version=1) is None:
+                result_cache.put(key, 1, {'success': True})
+        return {'success': True}
+
+    handler = instrumentation.instrument_handler('getCars')(caching_handler)
+
+    handler({'keys': ['a', 'a', 'b']}, None)
+    handler({'keys': ['b']}, None)
+
+    assert [
+        (log_line['ResultCacheHits'], log_line['ResultCacheMisses'], log_line['ResultCacheEvictions'])
+        for log_line in read_log_lines(capsys)
+    ] == [(1, 2, 1), (1, 0, 0)]
@@ -0,0 +1,122 @@
+"""Tests for the item counters and version counters, which are spread over the shards."""
+# Standard library imports
+import time
+from datetime import datetime, timezone
+
+# Related third party imports
+import pytest
+from boto3.dynamodb.conditions import Key
+from botocore.exceptions import ClientError
+
+# Local application/library specific imports
+from controllers import aws_clients, inventory_controller as inventory_controller_module
+from controllers.inventory_controller import InventoryController
+from controllers.result_cache import ResultCache
+
+
+def test_counters_per_shard(inventory_table):
+    """Every item is counted in the counters of its own shard, and the counts are summed on read."""
+    inventory_controller = InventoryController()
+    cars = [
+        inventory_controller.add_item('car', {'make': 'Volvo', 'continentOfOrigin': 'EUROPE'}) for _ in range(5)
+    ] + [
+        result['item'] for result in inventory_controller.add_items('car', [
+            {'make': 'Kia', 'continentOfOrigin': 'ASIA'} for _ in range(15)
+        ])
+    ]
+
+    for shard in range(inventory_controller.shard_count):
+        counters = inventory_table.query(KeyConditionExpression=Key('PK').eq(f'COUNT#{shard}'))['Items']
+        expected_count = sum(inventory_controller.shard(car['id']) == shard for car in cars)
+        assert {counter['SK']: counter['itemCount'] for counter in counters}.get('CAR', 0) == expected_count
+    assert inventory_table.query(KeyConditionExpression=Key('PK').eq('COUNT'))['Items'] == []
+
+    assert inventory_controller.read_total_count('car', None) == 20
+    assert inventory_controller.read_total_count('car', {'continentOfOrigin': {'equalsOr': ['ASIA', 'EUROPE']}}) == 20
+    assert inventory_controller.read_total_count('car', {'continentOfOrigin': {'equalsOr': ['EUROPE']}}) == 5
+    assert inventory_controller.read_total_count('book', None) == 0
+
+
+@pytest.mark.usefixtures('inventory_table')
+def test_version_increases_with_every_write():
+    """The version of an item type is the sum of its counters, and increases with every write."""
+    inventory_controller = InventoryController()
+    assert inventory_controller.read_version('book') == 0
+
+    inventory_controller.add_item('book', {'title': 'Dune', 'author': 'Frank Herbert'})
+    inventory_controller.add_items('book', [{'title': 'Hyperion', 'author': 'Dan Simmons'}] * 3)
+    inventory_controller.add_item('book', {'title': 'Solaris', 'author': 'Stanislaw Lem'})
+
+    assert inventory_controller.read_version('book') == 3
+    assert inventory_controller.read_version('car') == 0
+
+
+def test_failed_counter_write_stores_nothing(inventory_table):
+    """An item is stored in a transaction with its counters, so a failed counter update stores neither."""
+    inventory_controller = InventoryController()
+    # A counter that can't be incremented: ADD fails on a string
+    for shard in range(inventory_controller.shard_count):
+        inventory_table.put_item(Item={'PK': f'COUNT#{shard}', 'SK': 'CAR', 'itemCount': 'invalid'})
+
+    with pytest.raises(ClientError):
+        inventory_controller.add_item('car', {'make': 'Volvo', 'continentOfOrigin': 'EUROPE'})
+
+    for shard in range(inventory_controller.shard_count):
+        assert inventory_table.query(KeyConditionExpression=Key('PK').eq(f'ITEM#{shard}'))['Items'] == []
+        counters = inventory_table.query(KeyConditionExpression=Key('PK').eq(f'COUNT#{shard}'))['Items']
+        assert counters == [{'PK': f'COUNT#{shard}', 'SK': 'CAR', 'itemCount': 'invalid'}]
+    assert inventory_controller.read_version('car') == 0
+
+
+@pytest.mark.usefixtures('inventory_table')
+def test_no_total_count_within_a_time_range(monkeypatch):
+    """The counters count the items of all time, so there's no totalCount with addedAfter or addedBefore."""
+    monkeypatch.setenv('INVENTORY_TIME_ORDERED_IDS', 'true')
+    inventory_controller = InventoryController()
+    inventory_controller.add_items('car', [{'make': 'Volvo', 'continentOfOrigin': 'EUROPE'}] * 5)
+    time.sleep(0.01)
+    added_after = datetime.now(timezone.utc).strftime('%Y-%m-%dT%H:%M:%S.%f')[:-3] + 'Z'
+    time.sleep(0.01)
+    inventory_controller.add_items('car', [{'make': 'Kia', 'continentOfOrigin': 'ASIA'}] * 2)
+    params = {'item_type': 'car', 'selection_set': ['items', 'items/make', 'resultCount', 'totalCount']}
+
+    result = inventory_controller.get_items(params)
+    assert (result['resultCount'], result['totalCount']) == (7, 7)
+
+    result = inventory_controller.get_items({**params, 'addedAfter': added_after})
+    assert [item['make'] for item in result['items']] == ['Kia', 'Kia']
+    assert (result['resultCount'], result['totalCount']) == (2, None)
+
+    result = inventory_controller.get_items({**params, 'addedBefore': added_after})
+    assert (result['resultCount'], result['totalCount']) == (5, None)
+
+
+@pytest.mark.usefixtures('inventory_table')
+@pytest.mark.parametrize('read_engine', ['resource', 'client'])
+def test_added_item_invalidates_cached_result(monkeypatch, read_engine):
+    """Adding an item increments the version, so the next read doesn't serve the result cached before it."""
+    monkeypatch.setenv('INVENTORY_READ_ENGINE', read_engine)
+    monkeypatch.setattr(inventory_controller_module, 'RESULT_CACHE', ResultCache(max_size=16, ttl=60))
+    inventory_controller = InventoryController()
+    inventory_controller.add_items('car', [{'make': 'Volvo'}, {'make': 'Kia'}])
+
+    version_reads = []
+    for client in (aws_clients.dynamodb_resource().meta.client, aws_clients.dynamodb_client()):
+        client.meta.events.register(
+            'provide-client-params.dynamodb.BatchGetItem',
+            lambda params, **kwargs: version_reads.extend(params['RequestItems'].values())
+        )
+    params = {'item_type': 'car', 'selection_set': ['items', 'items/make', 'resultCount', 'diagnostics']}
+
+    result = inventory_controller.get_items(params)
+    assert (result['resultCount'], result['diagnostics']['resultCache']) == (2, 'MISS')
+    result = inventory_controller.get_items(params)
+    assert (result['resultCount'], result['diagnostics']['resultCache']) == (2, 'HIT')
+
+    inventory_controller.add_item('car', {'make': 'Tesla'})
+
+    result = inventory_controller.get_items(params)
+    assert result['diagnostics']['resultCache'] == 'MISS'
+    assert sorted(item['make'] for item in result['items']) == ['Kia', 'Tesla', 'Volvo']
+    # An eventually consistent read could still return the version from before the item was added
+    assert version_reads and all(table_request['ConsistentRead'] for table_request in version_reads)
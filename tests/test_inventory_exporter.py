@@ -0,0 +1,78 @@
+"""Tests for exporting the inventory to part files with the InventoryExporter, and resuming an export."""
+# Standard library imports
+import gzip
+import json
+import os
+
+# Related third party imports
+import pytest
+from botocore.exceptions import ReadTimeoutError
+
+# Local application/library specific imports
+from controllers.inventory_controller import InventoryController
+from controllers.inventory_exporter import InventoryExporter
+
+TOTAL_SEGMENTS = 4
+
+
+@pytest.fixture(name='car_ids')
+def fixture_car_ids(inventory_table) -> list:  # pylint: disable=unused-argument
+    """Add cars to the inventory, and return their ids."""
+    return [
+        result['item']['id'] for result in InventoryController().add_items('car', [
+            {'make': 'Volvo', 'model': f'XC{index}'} for index in range(40)
+        ])
+    ]
+
+
+def read_exported_ids(output_path: str) -> list:
+    """Return the ids of the exported items in all part files, in order."""
+    exported_ids = []
+    for file_name in sorted(os.listdir(output_path)):
+        with gzip.open(os.path.join(output_path, file_name), 'rt', encoding='utf-8') as part_file:
+            exported_ids.extend(json.loads(line)['id'] for line in part_file)
+    return exported_ids
+
+
+def test_export_writes_part_files(car_ids, tmp_path):
+    """Every item is exported once, and a part file holds at most pages_per_part pages."""
+    output_path = str(tmp_path / 'inventory')
+    exporter = InventoryExporter(total_segments=TOTAL_SEGMENTS, pages_per_part=1)
+
+    assert exporter.export(output_path, item_types=['car']) == len(car_ids)
+
+    assert sorted(os.listdir(output_path)) == [f'part-{part:05d}.jsonl.gz' for part in range(TOTAL_SEGMENTS)]
+    assert sorted(read_exported_ids(output_path)) == sorted(car_ids)
+
+
+def test_interrupted_export_resumes_after_the_last_part(car_ids, tmp_path, monkeypatch):
+    """A resumed export replaces the part files after the last checkpoint, and exports every item once."""
+    output_path = str(tmp_path / 'inventory')
+    checkpoint_path = str(tmp_path / 'checkpoint.json')
+    exporter = InventoryExporter(total_segments=TOTAL_SEGMENTS, checkpoint_path=checkpoint_path, pages_per_part=1)
+
+    inventory_table = exporter.inventory_controller.inventory_table
+    scan = inventory_table.scan
+
+    def failing_scan(**kwargs):
+        if kwargs['Segment'] == 1:
+            raise ReadTimeoutError(endpoint_url='https://dynamodb')
+        return scan(**kwargs)
+
+    monkeypatch.setattr(inventory_table, 'scan', failing_scan)
+    with pytest.raises(ReadTimeoutError):
+        exporter.export(output_path, item_types=['car'])
+    monkeypatch.setattr(inventory_table, 'scan', scan)
+
+    with open(checkpoint_path, 'r', encoding='utf-8') as checkpoint_file:
+        checkpoints = json.load(checkpoint_file)
+    assert checkpoints['nextPart'] == TOTAL_SEGMENTS - 1
+    assert '1' not in checkpoints['segments']
+    # A part file that was being written when the export was interrupted
+    with open(os.path.join(output_path, f'part-{TOTAL_SEGMENTS - 1:05d}.jsonl.gz'), 'wb') as truncated_file:
+        truncated_file.write(gzip.compress(b'{"id": "truncated"}\n')[:10])
+
+    resumed_exporter = InventoryExporter(total_segments=TOTAL_SEGMENTS, checkpoint_path=checkpoint_path)
+    resumed_exporter.export(output_path, item_types=['car'])
+
+    assert sorted(read_exported_ids(output_path)) == sorted(car_ids)
@@ -0,0 +1,89 @@
+"""Tests for importing JSONL records into the inventory with the InventoryImporter."""
+# Standard library imports
+import json
+
+# Related third party imports
+import pytest
+from boto3.dynamodb.conditions import Attr
+from botocore.exceptions import EndpointConnectionError, ReadTimeoutError
+
+# Local application/library specific imports
+from controllers.inventory_controller import InventoryController
+from controllers.inventory_importer import InventoryImporter
+
+
+@pytest.fixture(name='importer')
+def fixture_importer(inventory_table, monkeypatch):  # pylint: disable=unused-argument
+    """Return an importer that retries failed batches without waiting."""
+    monkeypatch.setattr(InventoryController, 'BATCH_BACKOFF_BASE', 0)
+    return InventoryImporter(max_workers=4)
+
+
+def car_lines(count: int) -> list:
+    """Return the JSON lines of a number of valid cars."""
+    return [
+        json.dumps({'make': 'Volvo', 'model': f'XC{index}', 'continentOfOrigin': 'EUROPE'}) for index in range(count)
+    ]
+
+
+def fail_requests(monkeypatch, importer: InventoryImporter, exception, times: int = None) -> None:
+    """Let the BatchWriteItem requests of the importer raise an exception, the first number of times or always."""
+    dynamodb = importer.inventory_controller.dynamodb
+    batch_write_item = dynamodb.batch_write_item
+    calls = []
+
+    def failing_batch_write_item(**kwargs):
+        calls.append(kwargs)
+        if times is None or len(calls) <= times:
+            raise exception
+        return batch_write_item(**kwargs)
+
+    monkeypatch.setattr(dynamodb, 'batch_write_item', failing_batch_write_item)
+
+
+def test_import_counts_the_written_items(importer):
+    """Valid records are written and counted, invalid records are skipped."""
+    lines = car_lines(60) + ['{"make": "Volvo"}', 'not json', '']
+
+    progress = importer.import_records(lines, 'car')
+
+    assert (progress['read'], progress['invalid'], progress['written'], progress['failed']) == (62, 2, 60, 0)
+    assert importer.inventory_controller.read_total_count('car', None) == 60
+    assert importer.inventory_controller.read_total_count('car', {'continentOfOrigin': {'equalsOr': ['EUROPE']}}) == 60
+
+
+def test_request_errors_are_retried(importer, monkeypatch):
+    """A request that fails without a response, e.g. on a timeout, is retried like a throttled batch."""
+    fail_requests(monkeypatch, importer, ReadTimeoutError(endpoint_url='https://dynamodb'), times=2)
+
+    progress = importer.import_records(car_lines(30), 'car')
+
+    assert (progress['written'], progress['failed']) == (30, 0)
+    assert progress['throttled_batches'] >= 1
+    assert importer.inventory_controller.read_total_count('car', None) == 30
+
+
+def test_request_errors_fail_the_batch(importer, monkeypatch):
+    """A batch that keeps failing is reported as failed, and the import continues."""
+    fail_requests(monkeypatch, importer, EndpointConnectionError(endpoint_url='https://dynamodb'))
+
+    progress = importer.import_records(car_lines(30), 'car')
+
+    assert (progress['written'], progress['failed']) == (0, 30)
+    assert 'Could not connect to the endpoint URL' in progress['errors'][0]
+    assert importer.inventory_controller.read_total_count('car', None) == 0
+
+
+def test_interrupted_import_counts_the_written_batches(importer):
+    """The items of every written batch are counted, also when the import doesn't finish."""
+    def interrupted_lines():
+        yield from car_lines(110)
+        raise KeyboardInterrupt
+
+    with pytest.raises(KeyboardInterrupt):
+        importer.import_records(interrupted_lines(), 'car')
+
+    inventory_table = importer.inventory_controller.inventory_table
+    stored_items = inventory_table.scan(FilterExpression=Attr('PK').begins_with('ITEM#'))['Items']
+    assert len(stored_items) == 100
+    assert importer.inventory_controller.read_total_count('car', None) == 100
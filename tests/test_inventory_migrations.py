@@ -0,0 +1,131 @@
+"""Tests for the one-off data migrations of the inventory table."""
+# Standard library imports
+# -
+
+# Related third party imports
+import pytest
+from boto3.dynamodb.conditions import Key
+
+# Local application/library specific imports
+from controllers import inventory_migrations
+from controllers.inventory_controller import InventoryController
+from controllers.time_ordered_ids import is_ulid
+
+
+def query_partition(table, partition_key: str) -> list:
+    """Return all rows of a partition."""
+    return table.query(KeyConditionExpression=Key('PK').eq(partition_key))['Items']
+
+
+def test_migrate_legacy_partition(inventory_table, add_legacy_items):
+    """Every legacy item moves to the shard of its id, and the legacy partition is emptied."""
+    legacy_items = add_legacy_items('car', [{'make': 'Volvo', 'model': f'V{index}'} for index in range(20)])
+    inventory_controller = InventoryController()
+
+    assert inventory_migrations.migrate_legacy_partition(inventory_controller) == 20
+
+    assert query_partition(inventory_table, 'ITEM') == []
+    for legacy_item in legacy_items:
+        migrated_item = inventory_table.get_item(Key=inventory_controller.item_key(legacy_item['SK']))['Item']
+        assert migrated_item == {**legacy_item, 'PK': inventory_controller.shard_partition_key(legacy_item['id'])}
+
+    # Running it again doesn't change anything
+    assert inventory_migrations.migrate_legacy_partition(inventory_controller) == 0
+
+
+def test_migrate_legacy_partition_keeps_items_already_in_their_shard(inventory_table, add_legacy_items):
+    """A legacy item that's already in its shard isn't overwritten, only its legacy copy is removed."""
+    legacy_items = add_legacy_items('car', [{'make': 'Volvo', 'model': f'V{index}'} for index in range(4)])
+    inventory_controller = InventoryController()
+    # An earlier run copied the first item to its shard, but didn't delete it. The color tells the copies apart.
+    sharded_item = {
+        **legacy_items[0],
+        'PK': inventory_controller.shard_partition_key(legacy_items[0]['id']),
+        'color': 'Red',
+    }
+    inventory_table.put_item(Item=sharded_item)
+
+    assert inventory_migrations.migrate_legacy_partition(inventory_controller) == 4
+
+    assert query_partition(inventory_table, 'ITEM') == []
+    assert inventory_table.get_item(Key=inventory_controller.item_key(sharded_item['SK']))['Item'] == sharded_item
+    for legacy_item in legacy_items[1:]:
+        migrated_item = inventory_table.get_item(Key=inventory_controller.item_key(legacy_item['SK']))['Item']
+        assert migrated_item == {**legacy_item, 'PK': inventory_controller.shard_partition_key(legacy_item['id'])}
+
+
+@pytest.mark.usefixtures('inventory_table')
+def test_backfill_ngram_index(monkeypatch):
+    """After the backfill, contains-filters find the items that were added without index entries."""
+    InventoryController().add_items('car', [
+        {'make': 'Tesla', 'model': 'Model 3'},
+        {'make': 'Volvo', 'model': 'XC40'},
+        {'make': 'Tesla', 'model': 'Model S'},
+    ])
+    monkeypatch.setenv('INVENTORY_NGRAM_INDEX', 'true')
+    monkeypatch.setenv('INVENTORY_NGRAM_INDEX_READS', 'true')
+    inventory_controller = InventoryController()
+
+    assert inventory_migrations.backfill_ngram_index(inventory_controller) == 3
+
+    result = inventory_controller.get_items({
+        'item_type': 'car',
+        'filter': {'make': {'containsOr': ['esl']}},
+        'selection_set': ['items', 'items/model'],
+    })
+    assert sorted(item['model'] for item in result['items']) == ['Model 3', 'Model S']
+
+
+@pytest.mark.usefixtures('inventory_table')
+def test_backfill_counters(add_legacy_items, monkeypatch):
+    """The counters are recounted from the items, including the ones of the legacy partition."""
+    monkeypatch.setenv('INVENTORY_LEGACY_PARTITION', 'true')
+    add_legacy_items('car', [{'make': 'Volvo', 'continentOfOrigin': 'EUROPE'} for _ in range(3)])
+    inventory_controller = InventoryController()
+    inventory_controller.add_items('car', [{'make': 'Kia', 'continentOfOrigin': 'ASIA'} for _ in range(2)])
+
+    inventory_migrations.backfill_counters(inventory_controller)
+
+    assert inventory_controller.read_total_count('car', None) == 5
+    assert inventory_controller.read_total_count('car', {'continentOfOrigin': {'equalsOr': ['EUROPE']}}) == 3
+    assert inventory_controller.read_total_count('car', {'continentOfOrigin': {'equalsOr': ['ASIA']}}) == 2
+
+
+@pytest.mark.usefixtures('inventory_table')
+def test_backfill_time_ordered_ids(monkeypatch):
+    """Items with a uuid4 id get a ULID, in the shard of the new id, and keep their attributes."""
+    inventory_controller = InventoryController()
+    old_items = [
+        result['item'] for result in inventory_controller.add_items('book', [
+            {'title': f'Book {index}', 'author': 'Ann Leckie'} for index in range(8)
+        ])
+    ]
+    monkeypatch.setenv('INVENTORY_TIME_ORDERED_IDS', 'true')
+    inventory_controller = InventoryController()
+
+    version = inventory_controller.read_version('book')
+    assert inventory_migrations.backfill_time_ordered_ids(inventory_controller) == 8
+    assert inventory_controller.read_version('book') == version + 1
+
+    result = inventory_controller.get_items({
+        'item_type': 'book',
+        'selection_set': ['items', 'items/id', 'items/title', 'items/dateAdded'],
+    })
+    assert all(is_ulid(item['id']) for item in result['items'])
+    assert sorted((item['title'], item['dateAdded']) for item in result['items']) == sorted(
+        (item['title'], item['dateAdded']) for item in old_items
+    )
+    # Running it again doesn't change anything
+    assert inventory_migrations.backfill_time_ordered_ids(inventory_controller) == 0
+
+
+@pytest.mark.usefixtures('inventory_table')
+def test_backfill_time_ordered_ids_requires_time_ordered_ids():
+    """Without time-ordered ids for new items, the existing items aren't rewritten."""
+    inventory_controller = InventoryController()
+    item = inventory_controller.add_item('car', {'make': 'Tesla', 'model': 'Model 3'})
+
+    with pytest.raises(ValueError, match='INVENTORY_TIME_ORDERED_IDS'):
+        inventory_migrations.backfill_time_ordered_ids(inventory_controller)
+
+    assert inventory_controller.batch_get_items([item['SK']])[0]['id'] == item['id']
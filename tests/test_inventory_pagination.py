@@ -0,0 +1,163 @@
+"""Tests for reading pages of items from all shards (and the legacy partition) of the inventory."""
+# Standard library imports
+# -
+
+# Related third party imports
+import pytest
+
+# Local application/library specific imports
+from controllers.inventory_controller import InventoryController
+
+SELECTION_SET = ['items', 'items/id', 'items/make', 'resultCount', 'nextToken']
+
+
+def read_all_pages(inventory_controller: InventoryController, params: dict) -> list:
+    """Read every page of a query by following the nextToken, and return the pages."""
+    pages = []
+    next_token = None
+    while True:
+        page = inventory_controller.get_items({**params, 'nextToken': next_token})
+        pages.append(page)
+        next_token = page['nextToken']
+        if not next_token:
+            return pages
+
+
+@pytest.mark.usefixtures('inventory_table')
+@pytest.mark.parametrize('fill_pages', ['true', 'false'])
+def test_pages_cover_all_shards(monkeypatch, fill_pages):
+    """Every item is returned exactly once, whichever shard it's stored in."""
+    monkeypatch.setenv('INVENTORY_FILL_PAGES', fill_pages)
+    inventory_controller = InventoryController()
+    added_items = [
+        result['item'] for result in inventory_controller.add_items('car', [
+            {'make': f'Make {index}', 'model': 'Model'} for index in range(60)
+        ])
+    ]
+    # The shards are random, but with 60 items it's all but certain that every shard has items
+    assert len({item['PK'] for item in added_items}) == inventory_controller.shard_count
+
+    pages = read_all_pages(inventory_controller, {'item_type': 'car', 'limit': 7, 'selection_set': SELECTION_SET})
+
+    item_ids = [item['id'] for page in pages for item in page['items']]
+    assert sorted(item_ids) == sorted(item['id'] for item in added_items)
+    assert all(len(page['items']) <= 7 for page in pages)
+    assert all(page['resultCount'] == len(page['items']) for page in pages)
+
+
+@pytest.mark.usefixtures('inventory_table')
+def test_pages_are_filled_with_filtered_items():
+    """In fill mode, a filtered page is topped up from the following items."""
+    inventory_controller = InventoryController()
+    inventory_controller.add_items('car', [
+        {'make': 'Tesla' if index % 3 == 0 else 'Volvo', 'model': 'Model'} for index in range(30)
+    ])
+
+    pages = read_all_pages(inventory_controller, {
+        'item_type': 'car',
+        'limit': 4,
+        'filter': {'make': {'equalsOr': ['Tesla']}},
+        'selection_set': SELECTION_SET,
+    })
+
+    makes = [item['make'] for page in pages for item in page['items']]
+    assert makes == ['Tesla'] * 10
+    assert [len(page['items']) for page in pages[:-1]] == [4, 4]
+
+
+@pytest.mark.usefixtures('inventory_table')
+def test_legacy_partition_is_read_when_enabled(add_legacy_items, monkeypatch):
+    """Items in the unsharded 'ITEM' partition are only returned with INVENTORY_LEGACY_PARTITION."""
+    inventory_controller = InventoryController()
+    sharded_items = [
+        result['item'] for result in inventory_controller.add_items('car', [
+            {'make': 'Tesla', 'model': 'Model'} for _ in range(10)
+        ])
+    ]
+    legacy_items = add_legacy_items('car', [{'make': 'Volvo', 'model': 'Model'} for _ in range(10)])
+    params = {'item_type': 'car', 'limit': 3, 'selection_set': SELECTION_SET}
+
+    item_ids = [item['id'] for page in read_all_pages(inventory_controller, params) for item in page['items']]
+    assert sorted(item_ids) == sorted(item['id'] for item in sharded_items)
+
+    monkeypatch.setenv('INVENTORY_LEGACY_PARTITION', 'true')
+    inventory_controller = InventoryController()
+    pages = read_all_pages(inventory_controller, params)
+    item_ids = [item['id'] for page in pages for item in page['items']]
+    assert sorted(item_ids) == sorted(item['id'] for item in sharded_items + legacy_items)
+
+
+@pytest.mark.usefixtures('inventory_table')
+def test_legacy_partition_is_filtered(add_legacy_items, monkeypatch):
+    """A filter applies to the legacy partition like it does to the shards."""
+    monkeypatch.setenv('INVENTORY_LEGACY_PARTITION', 'true')
+    add_legacy_items('car', [{'make': 'Tesla' if index < 3 else 'Volvo', 'model': 'Model'} for index in range(10)])
+    inventory_controller = InventoryController()
+    inventory_controller.add_items('car', [{'make': 'Tesla', 'model': 'Model'} for _ in range(2)])
+
+    pages = read_all_pages(inventory_controller, {
+        'item_type': 'car',
+        'limit': 2,
+        'filter': {'make': {'equalsOr': ['Tesla']}},
+        'selection_set': SELECTION_SET,
+    })
+
+    assert [item['make'] for page in pages for item in page['items']] == ['Tesla'] * 5
+
+
+@pytest.mark.usefixtures('inventory_table')
+def test_count_only_reads_every_shard(add_legacy_items, monkeypatch):
+    """Without selected items, the matching items of every stream are counted."""
+    monkeypatch.setenv('INVENTORY_LEGACY_PARTITION', 'true')
+    add_legacy_items('book', [{'title': 'Dune', 'author': 'Frank Herbert'} for _ in range(4)])
+    inventory_controller = InventoryController()
+    inventory_controller.add_items('book', [{'title': 'Dune', 'author': 'Frank Herbert'} for _ in range(6)])
+
+    result = inventory_controller.get_items({'item_type': 'book', 'selection_set': ['resultCount']})
+
+    assert result['resultCount'] == 10
+    assert result['nextToken'] is None
+
+
+@pytest.mark.usefixtures('inventory_table')
+def test_count_only_honours_the_limit():
+    """Without a countBudget, a count-only query counts the items of a page of at most limit items."""
+    inventory_controller = InventoryController()
+    inventory_controller.add_items('car', [{'make': 'Tesla', 'model': 'Model'} for _ in range(12)])
+    selection_set = ['resultCount', 'nextToken']
+
+    pages = read_all_pages(inventory_controller, {'item_type': 'car', 'limit': 5, 'selection_set': selection_set})
+    assert [page['resultCount'] for page in pages] == [5, 5, 2]
+    assert all(page['items'] == [] for page in pages)
+
+    result = inventory_controller.get_items({
+        'item_type': 'car', 'limit': 5, 'countBudget': 100, 'selection_set': selection_set,
+    })
+    assert result['resultCount'] == 12
+
+
+@pytest.mark.usefixtures('inventory_table')
+def test_diagnostics_describe_the_page():
+    """The diagnostics hold the access path, the expressions and the sum of every query of the page."""
+    inventory_controller = InventoryController()
+    inventory_controller.add_items('car', [
+        {'make': 'Tesla' if index % 2 else 'Volvo', 'model': 'Model'} for index in range(10)
+    ])
+
+    result = inventory_controller.get_items({
+        'item_type': 'car',
+        'filter': {'make': {'equalsOr': ['Tesla']}},
+        'selection_set': ['items', 'items/make', 'diagnostics'],
+    })
+
+    diagnostics = result['diagnostics']
+    assert diagnostics['accessPath'] == 'TABLE'
+    assert diagnostics['streams'] == inventory_controller.partition_keys()
+    assert diagnostics['keyConditions'] == sorted(diagnostics['keyConditions'])
+    assert len(diagnostics['keyConditions']) == inventory_controller.shard_count
+    assert diagnostics['filterExpression'] == 'make = "Tesla"'
+    assert diagnostics['projectionExpression'] == 'make, SK'
+    assert (diagnostics['pages'], diagnostics['scannedCount'], diagnostics['count']) == (
+        inventory_controller.shard_count, 10, 5
+    )
+    assert result['items'] == [{'make': 'Tesla'}] * 5
@@ -0,0 +1,74 @@
+"""Tests for looking up items by id, with the ItemLoader of the InventoryController."""
+# Standard library imports
+# -
+
+# Related third party imports
+import pytest
+
+# Local application/library specific imports
+import lambda_handler
+from controllers.inventory_controller import InventoryController
+
+
+def get_by_ids(field_name: str, ids: list, selection_set: list) -> list:
+    """Resolve a ...ByIds field like AppSync invokes the Lambda function."""
+    return lambda_handler.handle_request({
+        'info': {'fieldName': field_name},
+        'arguments': {'ids': ids},
+        'selectionSetList': selection_set,
+    }, None)
+
+
+@pytest.mark.usefixtures('inventory_table')
+def test_items_in_request_order():
+    """Items are returned in the order of the ids, with None for unknown and invalid ids."""
+    cars = [
+        result['item'] for result in InventoryController().add_items('car', [
+            {'make': 'Tesla', 'model': f'Model {index}'} for index in range(5)
+        ])
+    ]
+    book = InventoryController().add_item('book', {'title': 'Dune', 'author': 'Frank Herbert'})
+    ids = [cars[3]['id'], cars[0]['id'], cars[3]['id'], book['id'], 'not-an-id']
+
+    items = get_by_ids('getCarsByIds', ids, ['id', 'model'])
+
+    assert items == [
+        {'id': cars[3]['id'], 'model': 'Model 3', '__typename': 'Car'},
+        {'id': cars[0]['id'], 'model': 'Model 0', '__typename': 'Car'},
+        {'id': cars[3]['id'], 'model': 'Model 3', '__typename': 'Car'},
+        None,
+        None,
+    ]
+
+
+@pytest.mark.usefixtures('inventory_table')
+def test_legacy_ids_are_loaded(add_legacy_items, monkeypatch):
+    """Items that are still in the legacy partition are found with INVENTORY_LEGACY_PARTITION."""
+    legacy_cars = add_legacy_items('car', [{'make': 'Volvo', 'model': 'XC40'}, {'make': 'Volvo', 'model': 'V60'}])
+    car = InventoryController().add_item('car', {'make': 'Tesla', 'model': 'Model 3'})
+    ids = [legacy_cars[0]['id'], car['id'], legacy_cars[1]['id']]
+
+    assert get_by_ids('getCarsByIds', ids, ['model']) == [None, {'model': 'Model 3', '__typename': 'Car'}, None]
+
+    monkeypatch.setenv('INVENTORY_LEGACY_PARTITION', 'true')
+    assert [item['model'] for item in get_by_ids('getCarsByIds', ids, ['model'])] == ['XC40', 'Model 3', 'V60']
+
+    item = lambda_handler.handle_request({
+        'info': {'fieldName': 'item'},
+        'arguments': {'id': legacy_cars[1]['id']},
+        'selectionSetList': ['id', 'itemType'],
+    }, None)
+    assert item == {'id': legacy_cars[1]['id'], 'itemType': 'car', '__typename': 'Car'}
+
+
+@pytest.mark.usefixtures('inventory_table')
+def test_item_in_both_partitions_is_returned_once(add_legacy_items, monkeypatch):
+    """An item that is being migrated is briefly stored in both partitions, but returned once."""
+    monkeypatch.setenv('INVENTORY_LEGACY_PARTITION', 'true')
+    legacy_car = add_legacy_items('car', [{'make': 'Volvo', 'model': 'XC40'}])[0]
+    inventory_controller = InventoryController()
+    inventory_controller.inventory_table.put_item(Item={
+        **legacy_car, 'PK': inventory_controller.shard_partition_key(legacy_car['id']),
+    })
+
+    assert [item['id'] for item in inventory_controller.batch_get_items([legacy_car['SK']])] == [legacy_car['id']]
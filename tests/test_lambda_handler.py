@@ -0,0 +1,103 @@
+"""Tests for the BatchInvoke requests of the Lambda handlers, which have a response for every event."""
+# Standard library imports
+# -
+
+# Related third party imports
+import pytest
+
+# Local application/library specific imports
+import lambda_handler
+from controllers import aws_clients
+from controllers.inventory_controller import InventoryController
+
+
+@pytest.fixture(name='rejected_make')
+def fixture_rejected_make(inventory_table, monkeypatch) -> str:
+    """Return a make that DynamoDB never processes: BatchWriteItem keeps returning it as unprocessed."""
+    rejected_make = 'Rejected'
+    resource = aws_clients.dynamodb_resource()
+    batch_write_item = resource.batch_write_item
+
+    def partial_batch_write_item(RequestItems):  # pylint: disable=invalid-name
+        requests = RequestItems[inventory_table.name]
+        rejected_requests = [request for request in requests if request['PutRequest']['Item']['make'] == rejected_make]
+        if len(rejected_requests) < len(requests):
+            batch_write_item(RequestItems={
+                inventory_table.name: [request for request in requests if request not in rejected_requests]
+            })
+        return {'UnprocessedItems': {inventory_table.name: rejected_requests} if rejected_requests else {}}
+
+    monkeypatch.setattr(resource, 'batch_write_item', partial_batch_write_item)
+    monkeypatch.setattr(InventoryController, 'BATCH_BACKOFF_BASE', 0)
+    return rejected_make
+
+
+def add_car_event(car: dict, selection_set: list) -> dict:
+    """Return the event of an addCar mutation."""
+    return {
+        'arguments': {'car': car},
+        'selectionSetList': ['success'] + ['car'] + [f'car/{attribute}' for attribute in selection_set],
+        'info': {'fieldName': 'addCar', 'parentTypeName': 'Mutation'},
+    }
+
+
+def get_cars_event(arguments: dict, selection_set: list) -> dict:
+    """Return the event of a getCars query."""
+    return {
+        'arguments': arguments,
+        'selectionSetList': ['items'] + [f'items/{attribute}' for attribute in selection_set] + ['resultCount'],
+        'info': {'fieldName': 'getCars', 'parentTypeName': 'Query'},
+    }
+
+
+def test_batch_add_items(rejected_make):
+    """A response for every event in the order of the events, and a failed event doesn't fail the others."""
+    events = [
+        add_car_event({'make': 'Tesla', 'model': 'Model 3'}, ['make']),
+        add_car_event({'make': rejected_make, 'model': 'XC40'}, ['make']),
+        add_car_event({'make': 'Volvo', 'model': 'XC40'}, ['id', 'model']),
+        add_car_event({'make': 'Kia', 'model': 'EV6'}, ['make', 'model']),
+    ]
+
+    responses = lambda_handler.handle_add_car(events, None)
+
+    assert [response['success'] for response in responses] == [True, False, True, True]
+    assert responses[0]['car'] == {'make': 'Tesla'}
+    assert responses[1]['error_type'] == 'RuntimeError'
+    assert sorted(responses[2]['car']) == ['id', 'model'] and responses[2]['car']['model'] == 'XC40'
+    assert responses[3]['car'] == {'make': 'Kia', 'model': 'EV6'}
+
+    result = InventoryController().get_items({'item_type': 'car', 'selection_set': ['items', 'items/make']})
+    assert sorted(item['make'] for item in result['items']) == ['Kia', 'Tesla', 'Volvo']
+
+
+@pytest.mark.usefixtures('inventory_table')
+def test_batch_get_items():
+    """A response for every event in the order of the events, and a failed event doesn't fail the others."""
+    InventoryController().add_items('car', [
+        {'make': 'Tesla', 'model': 'Model 3'},
+        {'make': 'Volvo', 'model': 'XC40'},
+        {'make': 'Tesla', 'model': 'Model Y'},
+    ])
+    events = [
+        get_cars_event({'filter': {'make': {'equalsOr': ['Tesla']}}}, ['model']),
+        get_cars_event({}, ['make']),
+        # addedAfter requires time-ordered ids, so this event fails
+        get_cars_event({'addedAfter': '2021-03-22T10:51:41.386Z'}, ['make']),
+        get_cars_event({'filter': {'make': {'equalsOr': ['Tesla']}}}, ['make', 'model']),
+        get_cars_event({'filter': {'make': {'equalsOr': ['Volvo']}}}, ['model']),
+    ]
+
+    responses = lambda_handler.handle_get_cars(events, None)
+
+    assert [response['success'] for response in responses] == [True, True, False, True, True]
+    assert sorted(item['model'] for item in responses[0]['items']) == ['Model 3', 'Model Y']
+    assert all(list(item) == ['model'] for item in responses[0]['items'])
+    assert sorted(item['make'] for item in responses[1]['items']) == ['Tesla', 'Tesla', 'Volvo']
+    assert responses[2]['error_type'] == 'ValueError'
+    assert 'INVENTORY_TIME_ORDERED_IDS' in responses[2]['error']
+    # The events with the same arguments share a single read, pruned to their own selection set
+    assert [item['model'] for item in responses[3]['items']] == [item['model'] for item in responses[0]['items']]
+    assert all(sorted(item) == ['make', 'model'] for item in responses[3]['items'])
+    assert responses[4]['items'] == [{'model': 'XC40'}]
+    assert [response.get('resultCount') for response in responses] == [2, 3, None, 2, 1]
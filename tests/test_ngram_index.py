@@ -0,0 +1,97 @@
+"""Tests for resolving contains-filters with the n-gram index."""
+# Standard library imports
+# -
+
+# Related third party imports
+import pytest
+
+# Local application/library specific imports
+from controllers import inventory_migrations
+from controllers.inventory_controller import InventoryController
+from controllers.ngram_index import item_matches_filter, page_candidates
+
+CONTAINS_QUERY = {
+    'item_type': 'car',
+    'filter': {'model': {'containsOr': ['del']}},
+    'selection_set': ['items', 'items/model', 'diagnostics', 'diagnostics/accessPath'],
+}
+
+
+@pytest.fixture
+def items_without_index_entries():
+    """Add items before the n-gram index was maintained, and a few items with index entries."""
+    InventoryController().add_items('car', [{'make': 'Tesla', 'model': f'Model {index}'} for index in range(3)])
+
+
+@pytest.mark.usefixtures('inventory_table', 'items_without_index_entries')
+def test_index_reads_are_disabled_by_default(monkeypatch):
+    """Maintaining the index doesn't use it: items without index entries are still found."""
+    monkeypatch.setenv('INVENTORY_NGRAM_INDEX', 'true')
+    inventory_controller = InventoryController()
+    inventory_controller.add_item('car', {'make': 'Tesla', 'model': 'Model Y'})
+
+    result = inventory_controller.get_items(CONTAINS_QUERY)
+
+    assert result['diagnostics']['accessPath'] == 'TABLE'
+    assert sorted(item['model'] for item in result['items']) == ['Model 0', 'Model 1', 'Model 2', 'Model Y']
+
+
+@pytest.mark.usefixtures('inventory_table', 'items_without_index_entries')
+def test_index_reads_after_the_backfill(monkeypatch):
+    """After the backfill, the index finds every item."""
+    monkeypatch.setenv('INVENTORY_NGRAM_INDEX', 'true')
+    monkeypatch.setenv('INVENTORY_NGRAM_INDEX_READS', 'true')
+    inventory_controller = InventoryController()
+    inventory_controller.add_item('car', {'make': 'Tesla', 'model': 'Model Y'})
+    inventory_migrations.backfill_ngram_index(inventory_controller)
+
+    result = inventory_controller.get_items(CONTAINS_QUERY)
+
+    assert result['diagnostics']['accessPath'] == 'NGRAM_INDEX'
+    assert sorted(item['model'] for item in result['items']) == ['Model 0', 'Model 1', 'Model 2', 'Model Y']
+
+
+@pytest.mark.usefixtures('inventory_table')
+def test_index_reads_require_the_index(monkeypatch):
+    """Without maintaining the index, it's never read."""
+    monkeypatch.setenv('INVENTORY_NGRAM_INDEX_READS', 'true')
+
+    assert not InventoryController().ngram_index_reads
+
+
+@pytest.mark.usefixtures('inventory_table')
+def test_index_reads_find_legacy_items(add_legacy_items, monkeypatch):
+    """The candidates of the index are also fetched from the legacy partition."""
+    monkeypatch.setenv('INVENTORY_LEGACY_PARTITION', 'true')
+    monkeypatch.setenv('INVENTORY_NGRAM_INDEX', 'true')
+    monkeypatch.setenv('INVENTORY_NGRAM_INDEX_READS', 'true')
+    add_legacy_items('car', [{'make': 'Tesla', 'model': 'Model 3'}, {'make': 'Volvo', 'model': 'XC40'}])
+    inventory_controller = InventoryController()
+    inventory_controller.add_item('car', {'make': 'Tesla', 'model': 'Model S'})
+    inventory_migrations.backfill_ngram_index(inventory_controller)
+
+    result = inventory_controller.get_items(CONTAINS_QUERY)
+
+    assert result['diagnostics']['accessPath'] == 'NGRAM_INDEX'
+    assert sorted(item['model'] for item in result['items']) == ['Model 3', 'Model S']
+
+
+def test_candidates_of_a_page():
+    """The candidates are limited to the time range, and a page continues after the cursor."""
+    candidates = ['CAR#1', 'CAR#2', 'CAR#3', 'CAR#4', 'CAR#5']
+
+    assert page_candidates(candidates, cursor='CAR#2') == ['CAR#3', 'CAR#4', 'CAR#5']
+    assert page_candidates(candidates, sort_key_range=('CAR#2', 'CAR#4')) == ['CAR#2', 'CAR#3', 'CAR#4']
+    assert page_candidates(candidates, cursor='CAR#4', sort_key_range=('CAR#2', 'CAR#5'), newest_first=True) == [
+        'CAR#3', 'CAR#2'
+    ]
+
+
+def test_candidates_are_verified_against_the_filter():
+    """An item with every n-gram of a term doesn't necessarily contain the term."""
+    contains_filter = {'model': {'containsAnd': ['abcab']}, 'make': {'notEquals': ['Volvo']}}
+
+    assert item_matches_filter({'make': 'Tesla', 'model': 'xabcabx'}, contains_filter)
+    # 'bcabc' contains the n-grams abc, bca and cab of 'abcab', but not 'abcab' itself
+    assert not item_matches_filter({'make': 'Tesla', 'model': 'bcabc'}, contains_filter)
+    assert not item_matches_filter({'make': 'Volvo', 'model': 'abcab'}, contains_filter)
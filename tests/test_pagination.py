@@ -0,0 +1,85 @@
+"""Tests for merging the streams of a page and encoding its cursors with the pagination module."""
+# Standard library imports
+# -
+
+# Related third party imports
+# -
+
+# Local application/library specific imports
+from controllers.pagination import (
+    decode_next_token,
+    encode_next_token,
+    merge_stream_responses,
+    project_items,
+    selected_item_attributes,
+)
+
+
+def stream_response(sort_keys: list, last_evaluated_key: str = None) -> dict:
+    """Return a query response with items that only have a sort key."""
+    response = {'Items': [{'SK': sort_key} for sort_key in sort_keys]}
+    if last_evaluated_key:
+        response['LastEvaluatedKey'] = {'PK': 'ITEM#0', 'SK': last_evaluated_key}
+    return response
+
+
+def test_merge_stops_at_the_smallest_last_evaluated_key():
+    """Items beyond a stream that hasn't been read completely are left for the next page."""
+    items, next_cursors = merge_stream_responses({
+        'ITEM#0': stream_response(['CAR#1', 'CAR#4'], last_evaluated_key='CAR#4'),
+        'ITEM#1': stream_response(['CAR#2', 'CAR#3', 'CAR#5']),
+    })
+
+    assert [item['SK'] for item in items] == ['CAR#1', 'CAR#2', 'CAR#3', 'CAR#4']
+    assert next_cursors == {'ITEM#0': 'CAR#4', 'ITEM#1': 'CAR#4'}
+
+
+def test_merge_deduplicates_and_stops_at_the_limit():
+    """An item returned by multiple streams is returned once, and a full page continues after its last item."""
+    items, next_cursors = merge_stream_responses({
+        'make=Tesla': stream_response(['CAR#1', 'CAR#3']),
+        'make=Volvo': stream_response(['CAR#1', 'CAR#2']),
+    }, limit=2)
+
+    assert [item['SK'] for item in items] == ['CAR#1', 'CAR#2']
+    assert next_cursors == {'make=Tesla': 'CAR#2'}
+
+
+def test_merge_newest_first():
+    """Streams read in descending order are merged from the largest sort key down."""
+    items, next_cursors = merge_stream_responses({
+        'ITEM#0': stream_response(['CAR#5', 'CAR#2'], last_evaluated_key='CAR#2'),
+        'ITEM#1': stream_response(['CAR#4', 'CAR#1']),
+    }, newest_first=True)
+
+    assert [item['SK'] for item in items] == ['CAR#5', 'CAR#4', 'CAR#2']
+    assert next_cursors == {'ITEM#0': 'CAR#2', 'ITEM#1': 'CAR#2'}
+
+
+def test_merge_of_completely_read_streams_has_no_cursors():
+    """Without a LastEvaluatedKey or limit, every item is returned and there's no next page."""
+    items, next_cursors = merge_stream_responses({
+        'ITEM#0': stream_response(['CAR#2']),
+        'ITEM#1': stream_response(['CAR#1']),
+    })
+
+    assert [item['SK'] for item in items] == ['CAR#1', 'CAR#2']
+    assert not next_cursors
+    assert encode_next_token(next_cursors) is None
+
+
+def test_next_token_round_trip():
+    """A nextToken decodes into the cursors it was encoded from."""
+    cursors = {'ITEM#0': 'CAR#4', 'make=Tesla': 'CAR#2'}
+
+    assert decode_next_token(encode_next_token(cursors)) == cursors
+
+
+def test_items_only_contain_the_selected_attributes():
+    """The sort key is projected for internal use, but only the selected attributes are returned."""
+    selection_set = ['resultCount', 'items', 'items/id', 'items/make', 'items/__typename']
+    attributes = selected_item_attributes(selection_set, ('__typename',))
+
+    assert attributes == ['id', 'make']
+    assert project_items([{'SK': 'CAR#1', 'id': '1', 'make': 'Tesla'}], attributes) == [{'id': '1', 'make': 'Tesla'}]
+    assert project_items([{'SK': 'CAR#1'}], None) == [{'SK': 'CAR#1'}]
@@ -0,0 +1,157 @@
+"""
+Tests for the CloudFormation template of the GraphqlPlaygroundStack.
+
+These tests synthesize the stack, so they need the CDK packages of setup.py (`pip install -e .`).
+They're skipped without them.
+"""
+# Standard library imports
+import os
+import sys
+
+# Related third party imports
+import pytest
+
+core = pytest.importorskip('aws_cdk.core')
+
+# The stack is imported the way app.py imports it, with the constructs in graphql_playground
+REPOSITORY_ROOT = os.path.dirname(os.path.dirname(os.path.realpath(__file__)))
+sys.path.insert(0, os.path.join(REPOSITORY_ROOT, 'graphql_playground'))
+
+# Local application/library specific imports
+import graphql_playground_stack  # noqa: E402 pylint: disable=wrong-import-position,import-error
+
+STACK_NAME = 'graphql-playground-test'
+
+
+@pytest.fixture(name='synthesize')
+def fixture_synthesize(monkeypatch):
+    """Return a function that synthesizes the stack, and returns its resources by logical id."""
+    # The Lambda code asset is a path relative to the repository root, like with `cdk synth`
+    monkeypatch.chdir(REPOSITORY_ROOT)
+    monkeypatch.setenv('USER_POOL_DOMAIN_PREFIX', 'graphql-playground-test')
+
+    def synth() -> dict:
+        app = core.App()
+        graphql_playground_stack.GraphqlPlaygroundStack(app, STACK_NAME)
+        return app.synth().get_stack_by_name(STACK_NAME).template['Resources']
+
+    return synth
+
+
+def resources_of_type(resources: dict, resource_type: str) -> dict:
+    """Return the resources of a CloudFormation type, by logical id."""
+    return {
+        logical_id: resource for logical_id, resource in resources.items() if resource['Type'] == resource_type
+    }
+
+
+def test_indexes_are_added_one_per_deployment(synthesize, monkeypatch):
+    """The table has no indexes by default, and an index for every indexed attribute."""
+    resources = synthesize()
+
+    table = next(iter(resources_of_type(resources, 'AWS::DynamoDB::Table').values()))
+    assert 'GlobalSecondaryIndexes' not in table['Properties']
+
+    monkeypatch.setattr(graphql_playground_stack, 'INDEXED_ATTRIBUTES', ['make'])
+    resources = synthesize()
+
+    table = next(iter(resources_of_type(resources, 'AWS::DynamoDB::Table').values()))
+    assert [index['IndexName'] for index in table['Properties']['GlobalSecondaryIndexes']] == ['make-index']
+
+
+def test_api_cache_is_disabled_by_default(synthesize):
+    """Without an API cache instance type, there's no cache and no resolver is cached."""
+    resources = synthesize()
+
+    assert not resources_of_type(resources, 'AWS::AppSync::ApiCache')
+    for resolver in resources_of_type(resources, 'AWS::AppSync::Resolver').values():
+        assert 'CachingConfig' not in resolver['Properties']
+    for function in resources_of_type(resources, 'AWS::Lambda::Function').values():
+        assert 'INVENTORY_API_CACHE_API_ID' not in function['Properties'].get('Environment', {}).get('Variables', {})
+
+
+def test_api_cache_when_enabled(synthesize, monkeypatch):
+    """With an API cache instance type, the cached fields are cached per scope for their TTL."""
+    monkeypatch.setattr(graphql_playground_stack, 'API_CACHE_INSTANCE_TYPE', 'SMALL')
+
+    resources = synthesize()
+
+    api_caches = resources_of_type(resources, 'AWS::AppSync::ApiCache')
+    assert len(api_caches) == 1
+    cache_id, api_cache = next(iter(api_caches.items()))
+    assert api_cache['Properties']['ApiCachingBehavior'] == 'PER_RESOLVER_CACHING'
+    assert api_cache['Properties']['Type'] == 'SMALL'
+
+    cached_resolvers = {
+        resolver['Properties']['FieldName']: resolver
+        for resolver in resources_of_type(resources, 'AWS::AppSync::Resolver').values()
+        if 'CachingConfig' in resolver['Properties']
+    }
+    assert sorted(cached_resolvers) == sorted(graphql_playground_stack.CACHED_FIELDS)
+    for field_name, resolver in cached_resolvers.items():
+        caching_config = resolver['Properties']['CachingConfig']
+        assert caching_config['Ttl'] == graphql_playground_stack.CACHED_FIELDS[field_name]['ttl']
+        assert '$context.identity.claims.scope' in caching_config['CachingKeys']
+        # A resolver can only be cached once the cache exists
+        assert cache_id in resolver['DependsOn']
+
+    # Adding items flushes the cache: the functions know the API, and the four that add items may flush it
+    for function in resources_of_type(resources, 'AWS::Lambda::Function').values():
+        if function['Properties']['Handler'].startswith('lambda_handler.'):
+            assert 'INVENTORY_API_CACHE_API_ID' in function['Properties']['Environment']['Variables']
+    flushing_policies = [
+        policy for policy in resources_of_type(resources, 'AWS::IAM::Policy').values()
+        if any(
+            statement['Action'] == 'appsync:FlushApiCache'
+            for statement in policy['Properties']['PolicyDocument']['Statement']
+        )
+    ]
+    assert len(flushing_policies) == 4
+
+
+def test_every_field_has_its_own_function_by_default(synthesize):
+    """Without the router, every field is resolved by its own Lambda function."""
+    resources = synthesize()
+
+    functions = resources_of_type(resources, 'AWS::Lambda::Function').values()
+    handlers = [function['Properties']['Handler'] for function in functions]
+    assert 'lambda_handler.handle_request' not in handlers
+    assert 'lambda_handler.handle_get_cars' in handlers
+
+
+def test_router_combines_the_function_settings(synthesize, monkeypatch):
+    """The router gets the largest memory size and the summed provisioned concurrency of the fields."""
+    monkeypatch.setattr(graphql_playground_stack, 'LAMBDA_ROUTER', True)
+    monkeypatch.setattr(graphql_playground_stack, 'FUNCTION_SETTINGS', {
+        'getCars': {'memory_size': 512, 'provisioned_concurrency': 2},
+        'getBooks': {'memory_size': 256, 'provisioned_concurrency': 1},
+    })
+
+    resources = synthesize()
+
+    functions = [
+        function for function in resources_of_type(resources, 'AWS::Lambda::Function').values()
+        if function['Properties']['Handler'].startswith('lambda_handler.')
+    ]
+    assert [function['Properties']['Handler'] for function in functions] == ['lambda_handler.handle_request']
+    assert functions[0]['Properties']['MemorySize'] == 512
+    aliases = resources_of_type(resources, 'AWS::Lambda::Alias').values()
+    assert [
+        alias['Properties']['ProvisionedConcurrencyConfig']['ProvisionedConcurrentExecutions'] for alias in aliases
+    ] == [3]
+
+
+def test_max_batch_size_enables_batch_invoke(synthesize, monkeypatch):
+    """A field with a maximum batch size is resolved with BatchInvoke requests."""
+    monkeypatch.setattr(graphql_playground_stack, 'FUNCTION_SETTINGS', {'item': {'max_batch_size': 10}})
+
+    resources = synthesize()
+
+    resolvers = {
+        resolver['Properties']['FieldName']: resolver['Properties']
+        for resolver in resources_of_type(resources, 'AWS::AppSync::Resolver').values()
+    }
+    assert resolvers['item']['MaxBatchSize'] == 10
+    assert '"BatchInvoke"' in resolvers['item']['RequestMappingTemplate']
+    assert 'MaxBatchSize' not in resolvers['getCars']
+    assert '"Invoke"' in resolvers['getCars']['RequestMappingTemplate']
@@ -0,0 +1,56 @@
+"""Tests for the time-ordered item ids (ULIDs) and the AWSDateTime parser."""
+# Standard library imports
+from datetime import datetime, timedelta, timezone
+
+# Related third party imports
+import pytest
+
+# Local application/library specific imports
+from controllers import time_ordered_ids
+
+
+@pytest.mark.parametrize('value, expected', [
+    ('2021-03-22T10:51:41.386Z', datetime(2021, 3, 22, 10, 51, 41, 386000, timezone.utc)),
+    ('2021-03-22T10:51:41.3Z', datetime(2021, 3, 22, 10, 51, 41, 300000, timezone.utc)),
+    ('2021-03-22T10:51:41.38Z', datetime(2021, 3, 22, 10, 51, 41, 380000, timezone.utc)),
+    ('2021-03-22T10:51:41.3861234Z', datetime(2021, 3, 22, 10, 51, 41, 386123, timezone.utc)),
+    ('2021-03-22T10:51:41.386123456Z', datetime(2021, 3, 22, 10, 51, 41, 386123, timezone.utc)),
+    ('2021-03-22T10:51:41Z', datetime(2021, 3, 22, 10, 51, 41, tzinfo=timezone.utc)),
+    ('2021-03-22T10:51Z', datetime(2021, 3, 22, 10, 51, tzinfo=timezone.utc)),
+    ('2021-03-22T12:51:41.386+02:00', datetime(2021, 3, 22, 12, 51, 41, 386000, timezone(timedelta(hours=2)))),
+    ('2021-03-22T05:21:41-05:30:00', datetime(2021, 3, 22, 5, 21, 41, tzinfo=timezone(timedelta(minutes=-330)))),
+])
+def test_parse_datetime(value, expected):
+    """Every AWSDateTime is parsed, whatever the number of fractional digits and the time zone."""
+    parsed = time_ordered_ids.parse_datetime(value)
+
+    assert parsed == expected
+    assert parsed.utcoffset() == expected.utcoffset()
+
+
+@pytest.mark.parametrize('value', ['2021-03-22', '2021-03-22T10:51:41', '2021-03-22T10:51:41.Z', 'yesterday'])
+def test_parse_invalid_datetime(value):
+    """A value without a time or a time zone isn't an AWSDateTime."""
+    with pytest.raises(ValueError, match='Invalid AWSDateTime'):
+        time_ordered_ids.parse_datetime(value)
+
+
+def test_ulids_sort_by_time():
+    """A later ULID sorts after an earlier one, and its timestamp is within the range of its time."""
+    earlier = datetime(2021, 3, 22, 10, 51, 41, 386000, timezone.utc)
+    later = earlier + timedelta(milliseconds=1)
+    earlier_ulid, later_ulid = time_ordered_ids.new_ulid(earlier), time_ordered_ids.new_ulid(later)
+
+    assert earlier_ulid < later_ulid
+    assert time_ordered_ids.is_ulid(earlier_ulid)
+    timestamp = time_ordered_ids.decode(earlier_ulid) >> time_ordered_ids.RANDOM_BITS
+    assert timestamp == time_ordered_ids.timestamp_ms(earlier)
+    lower, upper = time_ordered_ids.ulid_range(earlier - timedelta(milliseconds=1), later)
+    assert lower <= earlier_ulid <= upper < later_ulid
+
+
+def test_empty_ulid_range():
+    """There is no range of ids between two times less than two milliseconds apart."""
+    added_after = datetime(2021, 3, 22, 10, 51, 41, 386000, timezone.utc)
+
+    assert time_ordered_ids.ulid_range(added_after, added_after + timedelta(milliseconds=1)) is None
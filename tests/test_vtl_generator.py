@@ -0,0 +1,21 @@
+"""Tests for the generated mapping templates of the direct DynamoDB resolvers."""
+# Standard library imports
+import os
+import sys
+
+# Related third party imports
+# -
+
+# The generator is a tool of the repository, run from its root like `python tools/vtl_generator.py`
+REPOSITORY_ROOT = os.path.dirname(os.path.dirname(os.path.realpath(__file__)))
+sys.path.insert(0, os.path.join(REPOSITORY_ROOT, 'tools'))
+
+# Local application/library specific imports
+import vtl_generator  # noqa: E402 pylint: disable=wrong-import-position,import-error
+
+
+def test_templates_are_up_to_date():
+    """The committed templates equal the generated ones, so they match the InventoryController."""
+    for relative_path, template in vtl_generator.generate_templates().items():
+        with open(os.path.join(REPOSITORY_ROOT, 'graphql', relative_path), 'r', encoding='utf-8') as template_file:
+            assert template_file.read() == template, f'Regenerate {relative_path} with tools/vtl_generator.py'
@@ -0,0 +1,464 @@
+#!/usr/bin/env python3
+"""
+The vtl_generator module generates the mapping templates of the direct DynamoDB resolvers.
+
+A direct resolver answers getCars and getBooks without the Lambda function: an AppSync pipeline
+resolver queries every shard of the table with a DynamoDB data source and merges the results in
+VTL. The templates are generated from the InventoryController, so they use the same filter
+semantics (see expression_compiler.compile_filter_expression()), projection, sort key merge and
+nextToken format as the Lambda path. Compared to the Lambda path, a direct resolver:
+- always reads the shards of the table, not the attribute indexes or the n-gram index,
+- reads a single round per page instead of filling the page (like INVENTORY_FILL_PAGES=false),
+- returns at most MERGE_LIMIT items per page,
+- doesn't resolve totalCount and diagnostics (they're null),
+- ignores countBudget: without selected items, it counts the items of a page,
+- rejects the addedAfter, addedBefore and newestFirst arguments.
+
+AppSync only continues a query with its own encrypted nextToken, so a stream is continued with a
+key condition on the sort key instead of an ExclusiveStartKey. Only when a stream returned no
+matching items at all, its position is unknown and the AppSync nextToken is kept in the cursor.
+
+The generated templates contain placeholders for the deployment, which AppSyncDataSources fills
+in: {required_scopes}, {stream_keys} and {stream_key}. Regenerate the templates from the
+repository root after changing the filters or the InventoryController:
+python tools/vtl_generator.py
+"""
+# Standard library imports
+import argparse
+import json
+import os
+import sys
+
+# Related third party imports
+# -
+
+# Local application/library specific imports
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.realpath(__file__)), '..', 'playground_api'))
+from controllers.expression_compiler import FILTER_OPERATIONS  # noqa: E402 pylint: disable=wrong-import-position
+from controllers.inventory_controller import InventoryController  # noqa: E402 pylint: disable=wrong-import-position
+
+# AppSync evaluates at most 1000 iterations per #foreach, which limits the merged page size
+MERGE_LIMIT = 1000
+
+# The item types with a direct resolver, for getCars and getBooks
+DIRECT_ITEM_TYPES = ['car', 'book']
+
+HEADER = "## Generated by tools/vtl_generator.py from the InventoryController, don't edit it by hand.\n"
+
+# The request mapping template of the pipeline resolver. It checks the scopes, compiles the filter
+# and projection, decodes the nextToken and stores everything in the stash for the stream functions.
+GET_ITEMS_REQUEST_TEMPLATE = r"""
+#set($requiredScopes = ['{required_scopes}'])
+#set($userScopes = $context.identity.claims.get("scope").split(" "))
+
+#foreach ($requiredScope in $requiredScopes)
+    #if(!$userScopes.contains($requiredScope))
+        $utils.error("Scope '$requiredScope' is required")
+    #end
+#end
+
+## Time ranges and the newest first order are only resolved by the Lambda path
+#foreach($argument in ["addedAfter", "addedBefore"])
+    #if(!$util.isNull($context.args.get($argument)))
+        $util.error("The argument '$argument' isn't supported by the direct resolver", "UnsupportedArgument")
+    #end
+#end
+#if($context.args.newestFirst)
+    $util.error("The argument 'newestFirst' isn't supported by the direct resolver", "UnsupportedArgument")
+#end
+
+## The streams of the item type: a stream is a shard of the table, like 'ITEM#2'
+#set($streamKeys = [{stream_keys}])
+$util.qr($context.stash.put("sortKeyPrefix", "{sort_key_prefix}"))
+$util.qr($context.stash.put("sortKeyEnd", "{sort_key_end}"))
+
+## The cursor per stream, like decode_next_token() of controllers/pagination.py. Streams that have been
+## read completely are not part of the token. An empty cursor reads a stream from the start.
+#if($context.args.nextToken)
+    #set($cursors = $util.parseJson($util.base64Decode($context.args.nextToken)))
+#else
+    #set($cursors = {})
+    #foreach($streamKey in $streamKeys)
+        $util.qr($cursors.put($streamKey, ""))
+    #end
+#end
+$util.qr($context.stash.put("cursors", $cursors))
+$util.qr($context.stash.put("responses", {}))
+
+## When the client doesn't select any items, they're only counted in resultCount
+#set($countOnly = true)
+#set($selectionSet = [])
+#foreach($setItem in $context.info.selectionSetList)
+    #if($setItem == "items" || $setItem.startsWith("items/"))
+        #set($countOnly = false)
+    #end
+    #if($setItem.startsWith("items/"))
+        $util.qr($selectionSet.add($setItem.substring(6)))
+    #end
+#end
+$util.qr($context.stash.put("countOnly", $countOnly))
+$util.qr($context.stash.put("selectionSet", $selectionSet))
+
+## The ProjectionExpression, like compile_projection_expression(). The sort key is always
+## projected, because it's needed to merge the streams.
+#set($projectionNames = {})
+#set($projectionExpression = "")
+#set($hash = '#')
+#foreach($attribute in $selectionSet)
+    #set($namePlaceholder = "${hash}K$projectionNames.size()")
+    $util.qr($projectionNames.put($namePlaceholder, $attribute))
+    #set($projectionExpression = "${projectionExpression}${namePlaceholder}, ")
+#end
+#set($namePlaceholder = "${hash}K$projectionNames.size()")
+$util.qr($projectionNames.put($namePlaceholder, "SK"))
+#set($projectionExpression = "${projectionExpression}${namePlaceholder}")
+$util.qr($context.stash.put("projection", {
+    "expression": $projectionExpression,
+    "expressionNames": $projectionNames
+}))
+
+## The FilterExpression, like compile_filter_expression(). The attributes and operations are
+## compiled in the same (sorted) order, every distinct value gets one placeholder.
+#set($filterableAttributes = {filterable_attributes})
+#set($filterOperations = {filter_operations})
+#set($filter = $util.defaultIfNull($context.args.filter, {}))
+#set($filterNames = {})
+#set($filterValues = {})
+#set($valuePlaceholders = {})
+#set($filterExpression = "")
+#foreach($filterKey in $filterableAttributes)
+    #set($keyFilter = $filter.get($filterKey))
+    #if(!$util.isNull($keyFilter))
+        #set($namePlaceholder = "${hash}F$filterNames.size()")
+        #set($operationExpressions = [])
+        #foreach($filterOperation in $filterOperations)
+            #set($operationValues = $keyFilter.get($filterOperation.get(0)))
+            #if($util.isNull($operationValues))
+                #set($operationValues = [])
+            #end
+            #if(!$operationValues.isEmpty())
+                #set($conditions = [])
+                #set($seenValues = [])
+                #foreach($filterValue in $operationValues)
+                    #if(!$seenValues.contains($filterValue))
+                        $util.qr($seenValues.add($filterValue))
+                        #if(!$valuePlaceholders.containsKey($filterValue))
+                            #set($valuePlaceholder = ":f$valuePlaceholders.size()")
+                            $util.qr($valuePlaceholders.put($filterValue, $valuePlaceholder))
+                            $util.qr($filterValues.put($valuePlaceholder, $util.dynamodb.toDynamoDB($filterValue)))
+                        #end
+                        #set($condition = $filterOperation.get(1).replace("{name}", $namePlaceholder))
+                        $util.qr($conditions.add($condition.replace("{value}", $valuePlaceholders.get($filterValue))))
+                    #end
+                #end
+                #set($operationExpression = "")
+                #foreach($condition in $conditions)
+                    #if($operationExpression == "")
+                        #set($operationExpression = $condition)
+                    #else
+                        #set($operationExpression = "${operationExpression}${filterOperation.get(2)}${condition}")
+                    #end
+                #end
+                #if($conditions.size() > 1)
+                    #set($operationExpression = "(${operationExpression})")
+                #end
+                $util.qr($operationExpressions.add($operationExpression))
+            #end
+        #end
+        #if(!$operationExpressions.isEmpty())
+            $util.qr($filterNames.put($namePlaceholder, $filterKey))
+            #set($keyExpression = "")
+            #foreach($operationExpression in $operationExpressions)
+                #if($keyExpression == "")
+                    #set($keyExpression = $operationExpression)
+                #else
+                    #set($keyExpression = "${keyExpression} AND ${operationExpression}")
+                #end
+            #end
+            #if($operationExpressions.size() > 1)
+                #set($keyExpression = "(${keyExpression})")
+            #end
+            #if($filterExpression == "")
+                #set($filterExpression = $keyExpression)
+            #else
+                #set($filterExpression = "${filterExpression} AND ${keyExpression}")
+            #end
+        #end
+    #end
+#end
+#if($filterExpression != "")
+    $util.qr($context.stash.put("filter", {
+        "expression": $filterExpression,
+        "expressionNames": $filterNames,
+        "expressionValues": $filterValues
+    }))
+#end
+
+## Every stream is queried with the limit, and the merged page holds at most that many items.
+## When only counting, the items of the page are counted: countBudget isn't supported.
+#set($mergeLimit = {merge_limit})
+#if(!$util.isNull($context.args.limit))
+    #if($context.args.limit > 0)
+        $util.qr($context.stash.put("limit", $context.args.limit))
+        #if($context.args.limit < $mergeLimit)
+            #set($mergeLimit = $context.args.limit)
+        #end
+    #end
+#end
+$util.qr($context.stash.put("mergeLimit", $mergeLimit))
+{}
+"""
+
+# The request mapping template of the function that queries a single stream ({stream_key})
+QUERY_STREAM_REQUEST_TEMPLATE = r"""
+#set($cursor = $context.stash.cursors.get("{stream_key}"))
+#if($util.isNull($cursor))
+    ## This stream has been read completely
+    #return
+#end
+
+## Continue after the cursor (the last sort key returned from this stream). If the stream didn't
+## return any matching items yet, DynamoDB continues where it stopped reading with its nextToken.
+#if($util.isMap($cursor))
+    #set($after = $cursor.after)
+    #set($streamNextToken = $cursor.nextToken)
+#else
+    #set($after = $cursor)
+    #set($streamNextToken = "")
+#end
+
+#set($keyValues = {
+    ":pk": $util.dynamodb.toDynamoDB("{stream_key}")
+})
+#if($after == "")
+    #set($keyExpression = "(#PK = :pk AND begins_with(#SK, :prefix))")
+    $util.qr($keyValues.put(":prefix", $util.dynamodb.toDynamoDB($context.stash.sortKeyPrefix)))
+#else
+    ## The smallest sort key after the cursor is the cursor followed by a NUL character, and the
+    ## sort keys of the item type end before sortKeyEnd (e.g. 'CAR$', the character after '#').
+    #set($keyExpression = "(#PK = :pk AND #SK BETWEEN :after AND :end)")
+    #set($nul = $util.urlDecode("%00"))
+    $util.qr($keyValues.put(":after", $util.dynamodb.toDynamoDB("${after}${nul}")))
+    $util.qr($keyValues.put(":end", $util.dynamodb.toDynamoDB($context.stash.sortKeyEnd)))
+#end
+
+#set($query = {
+    "version": "2018-05-29",
+    "operation": "Query",
+    "query": {
+        "expression": $keyExpression,
+        "expressionNames": {"#PK": "PK", "#SK": "SK"},
+        "expressionValues": $keyValues
+    },
+    "projection": $context.stash.projection
+})
+#if(!$util.isNull($context.stash.filter))
+    $util.qr($query.put("filter", $context.stash.filter))
+#end
+#if(!$util.isNull($context.stash.limit))
+    $util.qr($query.put("limit", $context.stash.limit))
+#end
+#if($streamNextToken != "")
+    $util.qr($query.put("nextToken", $streamNextToken))
+#end
+$util.toJson($query)
+"""
+
+# The response mapping template of the function that queries a single stream ({stream_key})
+QUERY_STREAM_RESPONSE_TEMPLATE = r"""
+#if($context.error)
+    $util.error($context.error.message, $context.error.type)
+#end
+#set($response = {"items": $context.result.items})
+#if(!$util.isNull($context.result.nextToken))
+    $util.qr($response.put("nextToken", $context.result.nextToken))
+#end
+$util.qr($context.stash.responses.put("{stream_key}", $response))
+{}
+"""
+
+# The response mapping template of the pipeline resolver. It merges the streams like
+# merge_stream_responses() of controllers/pagination.py and encodes the cursors into the nextToken.
+GET_ITEMS_RESPONSE_TEMPLATE = r"""
+#set($responses = $context.stash.responses)
+
+## A stream with more items (a nextToken) has only been read up to its last returned item. If it
+## returned no items, it has only been read up to its cursor: DynamoDB stopped at an unknown key.
+#set($readUntil = "")
+#set($hasReadUntil = false)
+#foreach($streamKey in $responses.keySet())
+    #set($response = $responses.get($streamKey))
+    #if(!$util.isNull($response.nextToken))
+        #if($response.items.isEmpty())
+            #set($cursor = $context.stash.cursors.get($streamKey))
+            #if($util.isMap($cursor))
+                #set($position = $cursor.after)
+            #else
+                #set($position = $cursor)
+            #end
+        #else
+            #set($lastIndex = $response.items.size() - 1)
+            #set($position = $response.items.get($lastIndex).SK)
+        #end
+        #if(!$hasReadUntil || $position.compareTo($readUntil) < 0)
+            #set($readUntil = $position)
+            #set($hasReadUntil = true)
+        #end
+    #end
+#end
+
+## Merge the streams by sort key, up to $readUntil. Every iteration takes the smallest head item.
+#set($heads = {})
+#foreach($streamKey in $responses.keySet())
+    $util.qr($heads.put($streamKey, 0))
+#end
+#set($items = [])
+#set($lastSortKey = "")
+#set($done = false)
+#foreach($iteration in [1..$context.stash.mergeLimit])
+    #if(!$done)
+        #set($nextStreamKey = "")
+        #set($nextItem = {})
+        #foreach($streamKey in $heads.keySet())
+            #set($streamItems = $responses.get($streamKey).items)
+            #set($headIndex = $heads.get($streamKey))
+            #if($headIndex < $streamItems.size())
+                #set($candidate = $streamItems.get($headIndex))
+                #if($nextStreamKey == "")
+                    #set($nextStreamKey = $streamKey)
+                    #set($nextItem = $candidate)
+                #elseif($candidate.SK.compareTo($nextItem.SK) < 0)
+                    #set($nextStreamKey = $streamKey)
+                    #set($nextItem = $candidate)
+                #end
+            #end
+        #end
+        #if($nextStreamKey == "")
+            ## Every stream has been merged
+            #set($done = true)
+        #elseif($hasReadUntil && $nextItem.SK.compareTo($readUntil) > 0)
+            ## A stream with more items might still hold smaller sort keys
+            #set($done = true)
+        #else
+            #set($nextHeadIndex = $heads.get($nextStreamKey) + 1)
+            $util.qr($heads.put($nextStreamKey, $nextHeadIndex))
+            ## Skip the same item returned by multiple streams
+            #if($nextItem.SK != $lastSortKey)
+                $util.qr($items.add($nextItem))
+                #set($lastSortKey = $nextItem.SK)
+            #end
+        #end
+    #end
+#end
+
+## The page is full: continue after its last item. Otherwise continue after $readUntil.
+#if(!$done)
+    #set($cutoff = $lastSortKey)
+    #set($hasCutoff = true)
+#else
+    #set($cutoff = $readUntil)
+    #set($hasCutoff = $hasReadUntil)
+#end
+
+#set($nextCursors = {})
+#if($hasCutoff)
+    #foreach($streamKey in $responses.keySet())
+        #set($response = $responses.get($streamKey))
+        #if(!$util.isNull($response.nextToken) && $response.items.isEmpty())
+            ## Keep the cursor, and continue where DynamoDB stopped reading
+            #set($cursor = $context.stash.cursors.get($streamKey))
+            #if($util.isMap($cursor))
+                #set($after = $cursor.after)
+            #else
+                #set($after = $cursor)
+            #end
+            $util.qr($nextCursors.put($streamKey, {"after": $after, "nextToken": $response.nextToken}))
+        #else
+            #set($hasMoreItems = !$util.isNull($response.nextToken))
+            #foreach($item in $response.items)
+                #if($item.SK.compareTo($cutoff) > 0)
+                    #set($hasMoreItems = true)
+                #end
+            #end
+            #if($hasMoreItems)
+                $util.qr($nextCursors.put($streamKey, $cutoff))
+            #end
+        #end
+    #end
+#end
+
+## Only return the attributes the client selected
+#set($pageItems = [])
+#if(!$context.stash.countOnly)
+    #foreach($item in $items)
+        #set($pageItem = {})
+        #foreach($attribute in $context.stash.selectionSet)
+            #if($item.containsKey($attribute))
+                $util.qr($pageItem.put($attribute, $item.get($attribute)))
+            #end
+        #end
+        $util.qr($pageItems.add($pageItem))
+    #end
+#end
+
+#set($result = {
+    "items": $pageItems,
+    "resultCount": $items.size()
+})
+#if(!$nextCursors.isEmpty())
+    $util.qr($result.put("nextToken", $util.base64Encode($util.toJson($nextCursors))))
+#end
+$util.toJson($result)
+"""
+
+
+def generate_get_items_request_template(item_type: str) -> str:
+    """Generate the request mapping template of the pipeline resolver of an item type."""
+    sort_key_prefix = f'{item_type.upper()}#'
+    return HEADER + GET_ITEMS_REQUEST_TEMPLATE.lstrip('\n') \
+        .replace('{sort_key_prefix}', sort_key_prefix) \
+        .replace('{sort_key_end}', sort_key_prefix[:-1] + chr(ord('#') + 1)) \
+        .replace('{filterable_attributes}', json.dumps(sorted(InventoryController.FILTERABLE_ATTRIBUTES[item_type]))) \
+        .replace('{filter_operations}', json.dumps([
+            [filter_op, condition_template, join_operator]
+            for filter_op, (condition_template, join_operator) in sorted(FILTER_OPERATIONS.items())
+        ])) \
+        .replace('{merge_limit}', str(MERGE_LIMIT))
+
+
+def generate_templates() -> dict:
+    """Generate all templates of the direct resolvers, by their path relative to the graphql directory."""
+    templates = {
+        'request_mapping_templates/query_stream_direct.vtl': HEADER + QUERY_STREAM_REQUEST_TEMPLATE.lstrip('\n'),
+        'response_mapping_templates/query_stream_direct.vtl': HEADER + QUERY_STREAM_RESPONSE_TEMPLATE.lstrip('\n'),
+        'response_mapping_templates/get_items_direct.vtl': HEADER + GET_ITEMS_RESPONSE_TEMPLATE.lstrip('\n'),
+    }
+    for item_type in DIRECT_ITEM_TYPES:
+        # e.g. request_mapping_templates/get_cars_direct.vtl
+        templates[f'request_mapping_templates/get_{item_type}s_direct.vtl'] = generate_get_items_request_template(
+            item_type
+        )
+    return templates
+
+
+def write_templates(graphql_path: str) -> list:
+    """Write the templates into the graphql directory and return their paths."""
+    written_paths = []
+    for relative_path, template in generate_templates().items():
+        template_path = os.path.join(graphql_path, relative_path)
+        with open(template_path, 'w', encoding='utf-8') as template_file:
+            template_file.write(template)
+        written_paths.append(template_path)
+    return written_paths
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Generate the mapping templates of the direct DynamoDB resolvers.')
+    parser.add_argument(
+        '--graphql-path',
+        default=os.path.join(os.path.dirname(os.path.realpath(__file__)), '..', 'graphql'),
+        help='the directory with the request_mapping_templates and response_mapping_templates',
+    )
+    args = parser.parse_args()
+    for path in write_templates(args.graphql_path):
+        print(f'Wrote {os.path.normpath(path)}')